@@ -11,6 +11,7 @@ from .group_bill import StitchingInvoiceGroup, StitchingInvoiceGroupLine
 from .image import Image
 from .serial_counter import SerialCounter
 from .stitched_item import StitchedItem
+from .dat_import_job import DatImportJob, DatImportFile
 
 __all__ = [
     'Customer',
@@ -28,5 +29,7 @@ __all__ = [
     'StitchingInvoiceGroupLine',
     'Image',
     'SerialCounter',
-    'StitchedItem'
+    'StitchedItem',
+    'DatImportJob',
+    'DatImportFile'
 ]
@@ -5,6 +5,10 @@ from decimal import Decimal
 class CommissionSale(db.Model):
     """CommissionSale model for tracking individual commission sales"""
     __tablename__ = 'commission_sales'
+    # Keyset pagination of the list endpoint (newest first)
+    __table_args__ = (
+        db.Index('ix_commission_sales_sale_date_id', 'sale_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     invoice_line_id = db.Column(db.Integer, db.ForeignKey('invoice_lines.id'), nullable=False)
@@ -48,12 +52,7 @@ class CommissionSale(db.Model):
     @classmethod
     def generate_serial_number(cls):
         """Generate a unique serial number for commission sale"""
-        from app.models.serial_counter import SerialCounter
-        
-        counter = SerialCounter.get_or_create('CS')
-        serial_number = f"CS{datetime.now().strftime('%y%m%d')}{counter.last_value + 1:04d}"
-        counter.increment()
-        return serial_number
+        return cls.generate_bulk_serial_numbers(1)[0]
     
     @classmethod
     def generate_bulk_serial_numbers(cls, count):
@@ -63,33 +62,23 @@ class CommissionSale(db.Model):
         if count <= 0:
             return []
         
-        counter = SerialCounter.get_or_create('CS')
+        # Reserved in the caller's transaction, so the line lock is kept until commit
+        first = SerialCounter.reserve('CS', count)
         base_date = datetime.now().strftime('%y%m%d')
-        
-        serial_numbers = []
-        for i in range(count):
-            serial_number = f"CS{base_date}{counter.last_value + 1 + i:04d}"
-            serial_numbers.append(serial_number)
-        
-        # Increment counter by the total count
-        counter.last_value += count
-        db.session.commit()
-        
-        return serial_numbers
+        return [f"CS{base_date}{number:04d}" for number in range(first, first + count)]
     
     @classmethod
     def create_commission_sale(cls, invoice_line_id, yards_sold, sale_date, unit_price=None):
         """Create a new commission sale"""
         from app.models.invoice import InvoiceLine
         
-        # Get the invoice line
-        invoice_line = InvoiceLine.query.get(invoice_line_id)
+        # Get the invoice line, locked so concurrent sales cannot oversell it
+        invoice_line = InvoiceLine.query.filter_by(id=invoice_line_id).with_for_update().first()
         if not invoice_line:
             raise ValueError("Invoice line not found")
         
-        # Calculate pending yards (excluding existing commission sales)
-        existing_commission_yards = sum(cs.yards_sold for cs in invoice_line.commission_sales)
-        pending_yards = (invoice_line.yards_sent or 0) - (invoice_line.yards_consumed or 0) - existing_commission_yards
+        # Pending yards already exclude existing commission sales
+        pending_yards = invoice_line.refresh_pending_yards()
         
         if yards_sold > pending_yards:
             raise ValueError(f"Cannot sell {yards_sold} yards, only {pending_yards} yards available")
@@ -116,6 +105,7 @@ class CommissionSale(db.Model):
         )
         
         db.session.add(commission_sale)
+        invoice_line.add_commission_yards(yards_sold)
         return commission_sale
     
     @classmethod
@@ -142,15 +132,14 @@ class CommissionSale(db.Model):
                 errors.append(f"Line {line_id}: Yards sold must be greater than 0")
                 continue
             
-            # Get the invoice line
-            invoice_line = InvoiceLine.query.get(line_id)
+            # Get the invoice line, locked so concurrent sales cannot oversell it
+            invoice_line = InvoiceLine.query.filter_by(id=line_id).with_for_update().first()
             if not invoice_line:
                 errors.append(f"Line {line_id}: Invoice line not found")
                 continue
             
-            # Calculate pending yards (excluding existing commission sales)
-            existing_commission_yards = sum(cs.yards_sold for cs in invoice_line.commission_sales)
-            pending_yards = (invoice_line.yards_sent or 0) - (invoice_line.yards_consumed or 0) - existing_commission_yards
+            # Pending yards already exclude existing commission sales
+            pending_yards = invoice_line.refresh_pending_yards()
             
             if yards_sold > pending_yards:
                 errors.append(f"Line {line_id}: Cannot sell {yards_sold} yards, only {pending_yards} yards available")
@@ -199,6 +188,7 @@ class CommissionSale(db.Model):
             )
             
             db.session.add(commission_sale)
+            invoice_line.add_commission_yards(yards_sold)
             commission_sales.append(commission_sale)
         
         return commission_sales, total_commission
@@ -0,0 +1,159 @@
+from extensions import db
+from datetime import datetime
+import json
+
+class DatImportJob(db.Model):
+    """DatImportJob model for tracking background .DAT imports"""
+    __tablename__ = 'dat_import_jobs'
+
+    # Only the first errors are kept on the job; error_count has the full number
+    MAX_STORED_ERRORS = 500
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    stored_path = db.Column(db.String(500), nullable=False)
+    customer_ids = db.Column(db.Text)  # Comma-separated customer ID filter
+    chunk_size = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, completed, failed
+    lines_processed = db.Column(db.Integer, default=0)
+    imported_count = db.Column(db.Integer, default=0)
+    skipped_count = db.Column(db.Integer, default=0)
+    duplicate_count = db.Column(db.Integer, default=0)  # Lines skipped as already imported
+    already_imported = db.Column(db.Boolean, default=False)  # Whole file was imported before
+    error_count = db.Column(db.Integer, default=0)
+    errors_json = db.Column(db.Text)
+    last_committed_chunk = db.Column(db.Integer, default=-1)
+    worker_id = db.Column(db.String(64))
+    heartbeat_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<DatImportJob {self.id} {self.filename} {self.status}>'
+
+    def to_dict(self):
+        """Convert import job to dictionary"""
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'lines_processed': self.lines_processed or 0,
+            'imported_count': self.imported_count or 0,
+            'skipped_count': self.skipped_count or 0,
+            'duplicate_count': self.duplicate_count or 0,
+            'already_imported': bool(self.already_imported),
+            'error_count': self.error_count or 0,
+            'errors': self.get_errors(),
+            'last_committed_chunk': self.last_committed_chunk,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def get_selected_customer_ids(self):
+        """Get the customer ID filter as a list (None means all customers)"""
+        if not self.customer_ids:
+            return None
+        return [cid for cid in self.customer_ids.split(',') if cid]
+
+    def get_errors(self):
+        """Get stored errors as a list"""
+        try:
+            return json.loads(self.errors_json) if self.errors_json else []
+        except (TypeError, ValueError):
+            return []
+
+    def add_errors(self, errors):
+        """Record errors, keeping at most MAX_STORED_ERRORS messages"""
+        if not errors:
+            return
+        stored = self.get_errors()
+        room = self.MAX_STORED_ERRORS - len(stored)
+        if room > 0:
+            stored.extend(errors[:room])
+            self.errors_json = json.dumps(stored)
+        self.error_count = (self.error_count or 0) + len(errors)
+
+    @classmethod
+    def claim(cls, job_id, worker_id, stale_after):
+        """
+        Atomically mark a job as running for this worker. Queued jobs and running
+        jobs whose heartbeat is older than stale_after (worker died) can be claimed.
+        Returns True if this worker now owns the job.
+        """
+        now = datetime.utcnow()
+        claimed = cls.query.filter(
+            cls.id == job_id,
+            db.or_(
+                cls.status == 'queued',
+                db.and_(cls.status == 'running', db.or_(cls.heartbeat_at.is_(None), cls.heartbeat_at < now - stale_after))
+            )
+        ).update({'status': 'running', 'worker_id': worker_id, 'heartbeat_at': now}, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def is_abandoned(self, stale_after):
+        """True if a queued or running job has made no progress for stale_after"""
+        cutoff = datetime.utcnow() - stale_after
+        if self.status == 'queued':
+            return bool(self.created_at and self.created_at < cutoff)
+        if self.status == 'running':
+            return not self.heartbeat_at or self.heartbeat_at < cutoff
+        return False
+
+    @classmethod
+    def get_resumable(cls, stale_after):
+        """Get ids of queued jobs and running jobs abandoned by a dead worker"""
+        cutoff = datetime.utcnow() - stale_after
+        return [row[0] for row in db.session.query(cls.id).filter(
+            db.or_(
+                cls.status == 'queued',
+                db.and_(cls.status == 'running', db.or_(cls.heartbeat_at.is_(None), cls.heartbeat_at < cutoff))
+            )
+        ).order_by(cls.id).all()]
+
+
+class DatImportFile(db.Model):
+    """DatImportFile model recording the content hash of every fully imported .DAT file"""
+    __tablename__ = 'dat_import_files'
+
+    id = db.Column(db.Integer, primary_key=True)
+    file_hash = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 of the upload
+    filename = db.Column(db.String(255))
+    imported_count = db.Column(db.Integer, default=0)
+    duplicate_count = db.Column(db.Integer, default=0)
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DatImportFile {self.filename} {self.file_hash[:12]}>'
+
+    def to_dict(self):
+        """Convert imported file record to dictionary"""
+        return {
+            'id': self.id,
+            'file_hash': self.file_hash,
+            'filename': self.filename,
+            'imported_count': self.imported_count or 0,
+            'duplicate_count': self.duplicate_count or 0,
+            'imported_at': self.imported_at.isoformat() if self.imported_at else None
+        }
+
+    @classmethod
+    def get_by_hash(cls, file_hash):
+        """Get imported file record by content hash"""
+        return cls.query.filter_by(file_hash=file_hash).first()
+
+    @classmethod
+    def record(cls, file_hash, filename, imported_count=0, duplicate_count=0):
+        """Record a completed import of a file (no-op if the hash is already known)"""
+        imported_file = cls.get_by_hash(file_hash)
+        if not imported_file:
+            imported_file = cls(
+                file_hash=file_hash,
+                filename=filename,
+                imported_count=imported_count,
+                duplicate_count=duplicate_count
+            )
+            db.session.add(imported_file)
+        return imported_file
@@ -1,9 +1,41 @@
 from extensions import db
 from datetime import datetime
+import json
+
+SIZES = ["S", "M", "L", "XL", "XXL", "XXXL"]
+
+
+def _empty_size_totals():
+    return {sz: 0 for sz in SIZES}
+
+
+def _add_size_qty(size_totals, size_qty):
+    """Add the S..XXXL quantities of one record to size_totals; returns the pieces added"""
+    added = 0
+    for sz in size_totals:
+        try:
+            qty = int(float(size_qty.get(sz) or 0))
+        except (TypeError, ValueError):
+            continue
+        size_totals[sz] += qty
+        added += qty
+    return added
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
 
 class StitchingInvoiceGroup(db.Model):
     """StitchingInvoiceGroup model for storing group bill information"""
     __tablename__ = 'stitching_invoice_groups'
+    # Keyset pagination of the list endpoint (newest first)
+    __table_args__ = (
+        db.Index('ix_stitching_invoice_groups_created_at_id', 'created_at', 'id'),
+    )
+    
+    # Bump when the snapshot layout changes; snapshots in an older layout are rebuilt on read
+    SNAPSHOT_FORMAT = 1
     
     id = db.Column(db.Integer, primary_key=True)
     group_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -12,6 +44,12 @@ class StitchingInvoiceGroup(db.Model):
     invoice_date = db.Column(db.Date)
     stitching_comments = db.Column(db.Text)
     fabric_comments = db.Column(db.Text)
+    # Aggregates of the member records, built at creation and rebuilt after an invalidation.
+    # summary_json holds the list-view totals; snapshot_json the full per-record breakdown.
+    summary_json = db.Column(db.Text)
+    snapshot_json = db.deferred(db.Column(db.Text(length=16777215)))
+    snapshot_version = db.Column(db.Integer, default=0, nullable=False)  # Bumped on every rebuild and invalidation
+    snapshot_built_at = db.Column(db.DateTime)
     
     # Relationships
     group_lines = db.relationship('StitchingInvoiceGroupLine', backref='group', lazy=True, cascade='all, delete-orphan')
@@ -20,8 +58,8 @@ class StitchingInvoiceGroup(db.Model):
     def __repr__(self):
         return f'<StitchingInvoiceGroup {self.group_number}>'
     
-    def to_dict(self):
-        """Convert group bill to dictionary"""
+    def to_dict(self, line_count=None):
+        """Convert group bill to dictionary (pass line_count when it is already known to skip loading the lines)"""
         return {
             'id': self.id,
             'group_number': self.group_number,
@@ -31,43 +69,266 @@ class StitchingInvoiceGroup(db.Model):
             'invoice_date': self.invoice_date.isoformat() if self.invoice_date else None,
             'stitching_comments': self.stitching_comments,
             'fabric_comments': self.fabric_comments,
-            'line_count': len(self.group_lines)
+            'line_count': line_count if line_count is not None else len(self.group_lines)
         }
     
     def calculate_totals(self):
-        """Calculate totals for the group - FIXED: Now includes secondary fabrics"""
-        total_stitching_value = 0
+        """Get totals for the group (main and secondary fabrics) from the stored snapshot"""
+        summary = self.get_summary()
+        return {
+            'total_stitching_value': summary['total_stitching_value'],
+            'total_fabric_value': summary['total_fabric_value'],
+            'total_items': summary['total_items']
+        }
+    
+    def build_snapshot(self):
+        """Compute the group's aggregates and per-record breakdown from the member records"""
+        from app.models.stitching import StitchingInvoice, GarmentFabric, load_size_qty
+        from app.models.invoice import Invoice, InvoiceLine
+        from app.models.packing_list import PackingListLine
+        
+        # All records of the group with their fabrics and packing lists, loaded in a fixed number of queries
+        stitching_invoices = StitchingInvoice.query.join(
+            StitchingInvoiceGroupLine, StitchingInvoiceGroupLine.stitching_invoice_id == StitchingInvoice.id
+        ).filter(
+            StitchingInvoiceGroupLine.group_id == self.id
+        ).options(
+            db.selectinload(StitchingInvoice.invoice_line).selectinload(InvoiceLine.invoice).selectinload(Invoice.customer),
+            db.selectinload(StitchingInvoice.packing_list_lines).selectinload(PackingListLine.packing_list),
+            db.selectinload(StitchingInvoice.garment_fabrics).selectinload(GarmentFabric.invoice_line).selectinload(InvoiceLine.invoice),
+            db.selectinload(StitchingInvoice.lining_fabrics)
+        ).order_by(StitchingInvoice.id).all()
+        
+        records = []
+        packing_lists = {}
+        total_fabric_used = 0
         total_fabric_value = 0
+        total_stitching_value = 0
         total_items = 0
+        size_totals = _empty_size_totals()
+        item_names = []
+        fabric_invoice_numbers = []
         
-        for line in self.group_lines:
-            stitching_invoice = line.stitching_invoice
-            if stitching_invoice:
-                total_stitching_value += float(stitching_invoice.total_value or 0)
-                
-                # Calculate fabric value - FIXED: Include both main and secondary fabrics
-                fabric_value = 0
-                
-                # Main fabric value
-                if stitching_invoice.invoice_line and stitching_invoice.yard_consumed:
-                    fabric_value += float(stitching_invoice.invoice_line.unit_price * stitching_invoice.yard_consumed)
-                
-                # Secondary fabrics value from garment_fabrics table
-                for garment_fabric in stitching_invoice.garment_fabrics:
-                    fabric_value += float(garment_fabric.total_fabric_cost or 0)
-                
-                total_fabric_value += fabric_value
-                
-                # Calculate total items
-                size_qty = stitching_invoice.get_size_qty()
-                total_items += sum(size_qty.values())
+        for stitching_invoice in stitching_invoices:
+            invoice_line = stitching_invoice.invoice_line
+            invoice = invoice_line.invoice if invoice_line else None
+            packing_list_line = stitching_invoice.packing_list_lines[0] if stitching_invoice.packing_list_lines else None
+            packing_list = packing_list_line.packing_list if packing_list_line else None
+            size_qty = load_size_qty(stitching_invoice.size_qty_json)
+            
+            garment_fabrics = []
+            for fabric in stitching_invoice.garment_fabrics:
+                fabric_dict = fabric.to_dict()
+                fabric_dict['pending_yards'] = float(fabric_dict['pending_yards'] or 0)
+                fabric_invoice = fabric.invoice_line.invoice if fabric.invoice_line else None
+                fabric_dict['fabric_invoice_number'] = fabric_invoice.invoice_number if fabric_invoice else None
+                fabric_dict['beta_tax_invoice_number'] = fabric_invoice.tax_invoice_number if fabric_invoice else None
+                fabric_dict['delivery_note'] = fabric.invoice_line.delivery_note if fabric.invoice_line else None
+                garment_fabrics.append(fabric_dict)
+            
+            record = {
+                'id': stitching_invoice.id,
+                'stitching_invoice_number': stitching_invoice.stitching_invoice_number,
+                'stitched_item': stitching_invoice.stitched_item,
+                'item_name': stitching_invoice.item_name,
+                'invoice_line_id': invoice_line.id if invoice_line else None,
+                'fabric_name': invoice_line.item_name if invoice_line else None,
+                'color': invoice_line.color if invoice_line else None,
+                'beta_tax_invoice_number': invoice.tax_invoice_number if invoice else None,
+                'fabric_invoice_number': invoice.invoice_number if invoice else None,
+                'delivery_note': invoice_line.delivery_note if invoice_line else None,
+                'customer': invoice.customer.short_name if invoice and invoice.customer else None,
+                'fabric_unit_price': float(invoice_line.unit_price or 0) if invoice_line else 0,
+                'yard_consumed': float(stitching_invoice.yard_consumed) if stitching_invoice.yard_consumed else 0,
+                'price': float(stitching_invoice.price) if stitching_invoice.price else 0,
+                'total_value': float(stitching_invoice.total_value) if stitching_invoice.total_value else 0,
+                'add_vat': bool(stitching_invoice.add_vat),
+                'image_id': stitching_invoice.image_id,
+                'size_qty_json': stitching_invoice.size_qty_json,
+                'size_qty': size_qty,
+                'created_at': _isoformat(stitching_invoice.created_at),
+                'packing_list_serial': packing_list.packing_list_serial if packing_list else None,
+                'pl_created_at': _isoformat(packing_list.created_at) if packing_list else None,
+                'pl_delivery_date': _isoformat(packing_list.delivery_date) if packing_list else None,
+                'tax_invoice_number': packing_list.tax_invoice_number if packing_list else None,
+                'garment_fabrics': garment_fabrics,
+                'lining_fabrics': [lining.to_dict() for lining in stitching_invoice.lining_fabrics]
+            }
+            records.append(record)
+            
+            # Group records by packing list
+            pl_serial = record['packing_list_serial'] or 'No PL'
+            if pl_serial not in packing_lists:
+                packing_lists[pl_serial] = {
+                    'fabric_used': 0,
+                    'fabric_value': 0,
+                    'stitching_value': 0,
+                    'total_items': 0,
+                    'size_totals': _empty_size_totals(),
+                    'created_at': record['pl_created_at']
+                }
+            
+            # Main fabric plus secondary fabrics
+            yards_consumed = record['yard_consumed']
+            record_fabric_value = yards_consumed * record['fabric_unit_price']
+            record_fabric_value += sum(fabric['total_fabric_cost'] for fabric in garment_fabrics)
+            stitching_value = record['total_value']
+            
+            total_fabric_used += yards_consumed
+            total_fabric_value += record_fabric_value
+            total_stitching_value += stitching_value
+            
+            packing_lists[pl_serial]['fabric_used'] += yards_consumed
+            packing_lists[pl_serial]['fabric_value'] += record_fabric_value
+            packing_lists[pl_serial]['stitching_value'] += stitching_value
+            
+            _add_size_qty(size_totals, size_qty)
+            pl_items = _add_size_qty(packing_lists[pl_serial]['size_totals'], size_qty)
+            total_items += pl_items
+            packing_lists[pl_serial]['total_items'] += pl_items
+            
+            if record['item_name'] and record['item_name'] not in item_names:
+                item_names.append(record['item_name'])
+            if record['fabric_invoice_number'] and record['fabric_invoice_number'] not in fabric_invoice_numbers:
+                fabric_invoice_numbers.append(record['fabric_invoice_number'])
         
         return {
-            'total_stitching_value': total_stitching_value,
+            'format': self.SNAPSHOT_FORMAT,
+            'line_count': len(records),
+            'total_fabric_used': total_fabric_used,
             'total_fabric_value': total_fabric_value,
-            'total_items': total_items
+            'total_stitching_value': total_stitching_value,
+            'total_items': total_items,
+            'size_totals': size_totals,
+            'item_names': item_names,
+            'fabric_invoice_numbers': fabric_invoice_numbers,
+            'packing_lists': packing_lists,
+            'individual_records': records
         }
     
+    def refresh_snapshot(self):
+        """
+        Rebuild and store the snapshot (caller commits). The write only lands if no invalidation
+        happened since this group was loaded, so a stale rebuild never overwrites a newer change.
+        Returns the snapshot either way.
+        """
+        seen_version = self.snapshot_version or 0
+        snapshot = self.build_snapshot()
+        snapshot['snapshot_version'] = seen_version + 1
+        summary = {key: value for key, value in snapshot.items() if key not in ('packing_lists', 'individual_records')}
+        type(self).query.filter(
+            type(self).id == self.id,
+            type(self).snapshot_version == seen_version
+        ).update({
+            'summary_json': json.dumps(summary),
+            'snapshot_json': json.dumps(snapshot),
+            'snapshot_version': seen_version + 1,
+            'snapshot_built_at': datetime.utcnow()
+        }, synchronize_session=False)
+        return snapshot
+    
+    def _load_stored(self, value):
+        try:
+            stored = json.loads(value) if value else None
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(stored, dict) or stored.get('format') != self.SNAPSHOT_FORMAT:
+            return None
+        return stored
+    
+    def get_snapshot(self):
+        """Get the full snapshot (totals, per-packing-list breakdown and individual_records), rebuilding it if stale"""
+        snapshot = self._load_stored(self.snapshot_json)
+        return snapshot if snapshot is not None else self.refresh_snapshot()
+    
+    def get_summary(self):
+        """Get the list-view totals from the snapshot, rebuilding it if stale"""
+        summary = self._load_stored(self.summary_json)
+        if summary is None:
+            snapshot = self.refresh_snapshot()
+            summary = {key: value for key, value in snapshot.items() if key not in ('packing_lists', 'individual_records')}
+        return summary
+    
+    @classmethod
+    def invalidate_snapshots(cls, group_ids):
+        """Mark group snapshots stale so they are rebuilt on the next read (caller commits)"""
+        group_ids = {group_id for group_id in group_ids if group_id}
+        if not group_ids:
+            return 0
+        return cls.query.filter(cls.id.in_(group_ids)).update({
+            'summary_json': None,
+            'snapshot_json': None,
+            'snapshot_version': cls.snapshot_version + 1
+        }, synchronize_session=False)
+    
+    @classmethod
+    def invalidate_snapshots_for_records(cls, stitching_invoice_ids):
+        """Invalidate the snapshots of the groups containing any of the stitching records"""
+        stitching_invoice_ids = list(stitching_invoice_ids)
+        if not stitching_invoice_ids:
+            return 0
+        group_ids = db.session.query(StitchingInvoiceGroupLine.group_id).filter(
+            StitchingInvoiceGroupLine.stitching_invoice_id.in_(stitching_invoice_ids)
+        ).distinct().all()
+        return cls.invalidate_snapshots(row[0] for row in group_ids)
+    
+    @classmethod
+    def invalidate_snapshots_for_invoice_lines(cls, invoice_line_ids):
+        """Invalidate the snapshots of groups with records using the invoice lines as main or secondary fabric"""
+        from app.models.stitching import StitchingInvoice, GarmentFabric
+        invoice_line_ids = list(invoice_line_ids)
+        if not invoice_line_ids:
+            return 0
+        record_ids = db.session.query(StitchingInvoice.id).filter(
+            StitchingInvoice.invoice_line_id.in_(invoice_line_ids)
+        ).union(
+            db.session.query(GarmentFabric.stitching_invoice_id).filter(GarmentFabric.fabric_invoice_line_id.in_(invoice_line_ids))
+        ).all()
+        return cls.invalidate_snapshots_for_records(row[0] for row in record_ids)
+    
+    @classmethod
+    def invalidate_snapshots_for_invoices(cls, invoice_ids):
+        """Invalidate the snapshots of groups with records made from lines of the invoices"""
+        from app.models.invoice import InvoiceLine
+        invoice_ids = list(invoice_ids)
+        if not invoice_ids:
+            return 0
+        line_ids = db.session.query(InvoiceLine.id).filter(InvoiceLine.invoice_id.in_(invoice_ids)).all()
+        return cls.invalidate_snapshots_for_invoice_lines(row[0] for row in line_ids)
+    
+    @classmethod
+    def invalidate_snapshots_for_packing_lists(cls, packing_list_ids):
+        """Invalidate the snapshots of groups with records on any of the packing lists"""
+        from app.models.packing_list import PackingListLine
+        packing_list_ids = list(packing_list_ids)
+        if not packing_list_ids:
+            return 0
+        record_ids = db.session.query(PackingListLine.stitching_invoice_id).filter(
+            PackingListLine.packing_list_id.in_(packing_list_ids)
+        ).all()
+        return cls.invalidate_snapshots_for_records(row[0] for row in record_ids)
+    
+    @classmethod
+    def invalidate_snapshots_for_customer(cls, customer_id):
+        """Invalidate the snapshots of a customer's group bills (the records show the customer name)"""
+        group_ids = db.session.query(cls.id).filter(cls.customer_id == customer_id).all()
+        return cls.invalidate_snapshots(row[0] for row in group_ids)
+    
+    @classmethod
+    def rebuild_snapshots(cls, batch_size=100):
+        """Rebuild every group bill snapshot; returns the number of groups"""
+        last_id = 0
+        count = 0
+        while True:
+            group_bills = cls.query.filter(cls.id > last_id).order_by(cls.id).limit(batch_size).all()
+            if not group_bills:
+                return count
+            for group_bill in group_bills:
+                group_bill.refresh_snapshot()
+            db.session.flush()
+            last_id = group_bills[-1].id
+            count += len(group_bills)
+    
     @classmethod
     def get_by_group_number(cls, group_number):
         """Get group bill by group number"""
@@ -111,7 +372,7 @@ class StitchingInvoiceGroupLine(db.Model):
             'fabric_unit_price': float(self.stitching_invoice.invoice_line.unit_price) if self.stitching_invoice and self.stitching_invoice.invoice_line else 0,
             'fabric_value': fabric_value,  # FIXED: Now includes secondary fabrics
             'size_qty': self.stitching_invoice.get_size_qty() if self.stitching_invoice else {},
-            'total_qty': sum(self.stitching_invoice.get_size_qty().values()) if self.stitching_invoice else 0,
+            'total_qty': (self.stitching_invoice.total_qty or 0) if self.stitching_invoice else 0,
             'price': float(self.stitching_invoice.price) if self.stitching_invoice else 0,
             'total_value': float(self.stitching_invoice.total_value) if self.stitching_invoice else 0,
             'created_at': self.stitching_invoice.created_at.isoformat() if self.stitching_invoice and self.stitching_invoice.created_at else None
@@ -1,6 +1,5 @@
 from extensions import db
 from datetime import datetime
-import os
 
 class Image(db.Model):
     """Image model for storing garment images"""
@@ -9,6 +8,8 @@ class Image(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     file_path = db.Column(db.String(255), nullable=False)  # Now stores S3 key
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    variants = db.Column(db.String(100))  # Comma-separated pre-sized copies stored next to the original
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the original; identical uploads reuse the row
     
     # Relationships
     stitching_invoices = db.relationship('StitchingInvoice', backref='image', lazy=True)
@@ -23,7 +24,8 @@ class Image(db.Model):
             'file_path': self.file_path,
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
             'filename': self.file_path.split('/')[-1] if self.file_path else None,
-            'image_url': self.get_image_url()
+            'image_url': self.get_image_url(),
+            'variants': self.get_variants()
         }
     
     @classmethod
@@ -31,8 +33,34 @@ class Image(db.Model):
         """Get image by file path (S3 key)"""
         return cls.query.filter_by(file_path=file_path).first()
     
+    @classmethod
+    def get_by_content_hash(cls, content_hash):
+        """Get the (oldest) image with this content"""
+        return cls.query.filter_by(content_hash=content_hash).order_by(cls.id).first()
+    
+    @classmethod
+    def is_file_shared(cls, file_path, image_id):
+        """True if another image row points at the same storage object"""
+        return db.session.query(cls.id).filter(cls.file_path == file_path, cls.id != image_id).first() is not None
+    
+    def get_variants(self):
+        """Names of the stored variants (see image_variant_service.IMAGE_VARIANTS)"""
+        return [variant for variant in (self.variants or '').split(',') if variant]
+    
+    @staticmethod
+    def variant_file_path(file_path, variants, size='original', webp=False):
+        """Storage key to serve for a size, falling back to the original if the variant is missing"""
+        from app.services.image_variant_service import variant_path
+        if size == 'original' or not file_path:
+            return file_path
+        available = [variant for variant in (variants or '').split(',') if variant]
+        for variant in ([f"{size}_webp"] if webp else []) + [size]:
+            if variant in available:
+                return variant_path(file_path, variant)
+        return file_path
+    
     def get_image_url(self):
-        """Get the image URL for storage service"""
+        """Get the image URL for storage service (a presigned S3 URL in redirect mode, otherwise string formatting)"""
         if self.file_path:
             from app.services.storage_service_factory import StorageServiceFactory
             try:
@@ -44,30 +72,39 @@ class Image(db.Model):
         return None
     
     def get_image_path_for_pdf(self):
-        """Get image path suitable for PDF generation"""
+        """Get image path suitable for PDF generation: the PDF variant if stored (S3 objects come from the shared image cache)"""
         if self.file_path:
             from app.services.storage_service_factory import StorageServiceFactory
+            from app.services.image_cache_service import get_cached_file
             try:
                 storage_service = StorageServiceFactory.get_storage_service()
-                
-                # For local storage, return the direct path
-                if hasattr(storage_service, 'base_path'):
-                    # Local storage service
-                    full_path = storage_service.base_path / self.file_path
-                    if full_path.exists():
-                        return str(full_path)
-                
-                # For S3 storage, download to temp location
-                temp_dir = '/tmp'
-                os.makedirs(temp_dir, exist_ok=True)
-                temp_file_path = os.path.join(temp_dir, f"temp_image_{self.id}_{os.path.basename(self.file_path)}")
-                
-                # Download from storage to temp location
-                if storage_service.download_file(self.file_path, temp_file_path):
-                    return temp_file_path
-                else:
-                    return None
+                return get_cached_file(storage_service, self.variant_file_path(self.file_path, self.variants, 'pdf'))
             except Exception as e:
                 print(f"Error getting image path for PDF: {e}")
                 return None
         return None
+    
+    @classmethod
+    def get_image_paths_for_pdf(cls, image_ids):
+        """Get {image id: local path} for PDF generation, fetching all images concurrently before layout"""
+        from app.services.image_cache_service import prefetch_files
+        image_ids = list({image_id for image_id in image_ids if image_id})
+        if not image_ids:
+            return {}
+        # Embed the pre-sized PDF variant where there is one
+        file_paths = {
+            image_id: cls.variant_file_path(file_path, variants, 'pdf')
+            for image_id, file_path, variants in db.session.query(
+                cls.id, cls.file_path, cls.variants
+            ).filter(cls.id.in_(image_ids))
+        }
+        try:
+            local_paths = prefetch_files(file_paths.values())
+        except Exception as e:
+            print(f"Error getting image paths for PDF: {e}")
+            return {}
+        return {
+            image_id: local_paths.get(file_path)
+            for image_id, file_path in file_paths.items()
+            if local_paths.get(file_path)
+        }
@@ -1,9 +1,15 @@
 from extensions import db
 from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import text
 
 class Invoice(db.Model):
     """Invoice model for storing fabric invoice headers"""
     __tablename__ = 'invoices'
+    # Keyset pagination of the list endpoint (newest first)
+    __table_args__ = (
+        db.Index('ix_invoices_invoice_date_id', 'invoice_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(32), nullable=False)
@@ -65,7 +71,13 @@ class InvoiceLine(db.Model):
     yards_sent = db.Column(db.Numeric(10, 2), default=0)
     yards_consumed = db.Column(db.Numeric(10, 2), default=0)
     
-    # Commission sales are now tracked in separate CommissionSale model
+    # Commission sales are now tracked in separate CommissionSale model.
+    # Stock counters are stored so stock filters are an indexed range scan;
+    # keep them in sync with refresh_pending_yards/add_commission_yards
+    commission_yards_total = db.Column(db.Numeric(10, 2), default=0)
+    pending_yards = db.Column(db.Numeric(10, 2), default=0, index=True)
+    # SHA-256 fingerprint of the .DAT source line, so re-imports skip it (NULL for manual lines)
+    source_fingerprint = db.Column(db.String(64), unique=True)
     
     # Relationships
     stitching_invoices = db.relationship('StitchingInvoice', backref='invoice_line', lazy=True)
@@ -90,19 +102,26 @@ class InvoiceLine(db.Model):
             'delivery_note': self.delivery_note,
             'yards_sent': float(self.yards_sent) if self.yards_sent else 0,
             'yards_consumed': float(self.yards_consumed) if self.yards_consumed else 0,
-            'pending_yards': float(self.pending_yards),
+            'pending_yards': float(self.pending_yards or 0),
             'total_value': float(self.unit_price * self.yards_sent) if self.unit_price and self.yards_sent else 0,
-            'total_commission_yards': sum(float(cs.yards_sold) for cs in self.commission_sales),
+            'total_commission_yards': float(self.commission_yards_total or 0),
             'total_commission_amount': sum(float(cs.commission_amount) for cs in self.commission_sales),
             'commission_sales_count': len(self.commission_sales)
         }
     
-    @property
-    def pending_yards(self):
-        """Calculate pending yards (excluding commission sales)"""
-        total_commission_yards = sum(cs.yards_sold for cs in self.commission_sales)
-        consumed = (self.yards_consumed or 0) + total_commission_yards
-        return (self.yards_sent or 0) - consumed
+    def refresh_pending_yards(self):
+        """Recompute stored pending yards (sent minus consumed minus commission sales)"""
+        self.pending_yards = (
+            Decimal(str(self.yards_sent or 0))
+            - Decimal(str(self.yards_consumed or 0))
+            - Decimal(str(self.commission_yards_total or 0))
+        )
+        return self.pending_yards
+    
+    def add_commission_yards(self, yards):
+        """Add (or, with a negative value, revert) commission yards and refresh pending yards"""
+        self.commission_yards_total = Decimal(str(self.commission_yards_total or 0)) + Decimal(str(yards))
+        return self.refresh_pending_yards()
     
     @property
     def total_value(self):
@@ -113,9 +132,24 @@ class InvoiceLine(db.Model):
     def get_available_fabrics(cls):
         """Get all invoice lines with pending yards > 0"""
         return cls.query.filter(
-            cls.yards_sent > cls.yards_consumed
+            cls.pending_yards > 0
         ).order_by(cls.invoice_id.desc()).all()
     
+    @classmethod
+    def rebuild_stock_counters(cls):
+        """Recompute commission_yards_total and pending_yards for every line from source rows"""
+        result = db.session.execute(text("""
+            UPDATE invoice_lines l
+            LEFT JOIN (
+                SELECT invoice_line_id, SUM(yards_sold) AS commission_yards
+                FROM commission_sales
+                GROUP BY invoice_line_id
+            ) cs ON cs.invoice_line_id = l.id
+            SET l.commission_yards_total = COALESCE(cs.commission_yards, 0),
+                l.pending_yards = COALESCE(l.yards_sent, 0) - COALESCE(l.yards_consumed, 0) - COALESCE(cs.commission_yards, 0)
+        """))
+        return result.rowcount
+    
     @classmethod
     def get_by_item_name(cls, item_name):
         """Get invoice lines by item name"""
@@ -4,6 +4,10 @@ from datetime import datetime
 class PackingList(db.Model):
     """PackingList model for storing packing list information"""
     __tablename__ = 'packing_lists'
+    # Keyset pagination of the list endpoint (newest first)
+    __table_args__ = (
+        db.Index('ix_packing_lists_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     packing_list_serial = db.Column(db.String(50), unique=True, nullable=False)
@@ -51,8 +55,7 @@ class PackingList(db.Model):
         
         total_items = 0
         for line in self.packing_list_lines:
-            size_qty = line.stitching_invoice.get_size_qty()
-            total_items += sum(size_qty.values())
+            total_items += line.stitching_invoice.total_qty or 0
         
         self.total_items = total_items
         return self.total_records, self.total_items
@@ -100,7 +103,7 @@ class PackingListLine(db.Model):
             'fabric_value': float(self.stitching_invoice.invoice_line.unit_price * self.stitching_invoice.yard_consumed) if self.stitching_invoice and self.stitching_invoice.invoice_line and self.stitching_invoice.yard_consumed else 0,
             'size_qty': self.stitching_invoice.get_size_qty() if self.stitching_invoice else {},
             'size_qty_json': self.stitching_invoice.size_qty_json if self.stitching_invoice else None,
-            'total_qty': sum(self.stitching_invoice.get_size_qty().values()) if self.stitching_invoice else 0,
+            'total_qty': (self.stitching_invoice.total_qty or 0) if self.stitching_invoice else 0,
             'price': float(self.stitching_invoice.price) if self.stitching_invoice else 0,
             'total_value': float(self.stitching_invoice.total_value) if self.stitching_invoice else 0,
             'billing_group_id': self.stitching_invoice.billing_group_id if self.stitching_invoice else None,
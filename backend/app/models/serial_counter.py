@@ -1,31 +1,45 @@
 from extensions import db
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 
 class SerialCounter(db.Model):
     """SerialCounter model for managing serial number sequences"""
     __tablename__ = 'serial_counters'
+    __table_args__ = (
+        db.UniqueConstraint('serial_type', 'period', name='uq_serial_counters_type_period'),
+    )
+    
+    # serial_type: (period format, serial format); numbering restarts every period
+    SERIAL_FORMATS = {
+        'ST': ('%m%y', 'ST/{period}/{number:03d}'),      # ST/MMYY/XXX
+        'GB': ('%m%y', 'GB/{period}/{number:03d}'),      # GB/MMYY/XXX
+        'PL': ('%y%m%d', 'PL{period}{number:02d}'),      # PLYYMMDDXX
+        'GBN': ('%y%m%d', 'GBN{period}{number:02d}'),    # GBNYYMMDDXX
+    }
     
     id = db.Column(db.Integer, primary_key=True)
-    serial_type = db.Column(db.String(10), unique=True, nullable=False)  # ST, GB, PL, GBN
+    serial_type = db.Column(db.String(10), nullable=False)  # ST, GB, PL, GBN, CS
+    period = db.Column(db.String(10), nullable=False, default='')  # MMYY / YYMMDD, '' for running counters
     last_value = db.Column(db.Integer, default=0)
     
     def __repr__(self):
-        return f'<SerialCounter {self.serial_type}: {self.last_value}>'
+        return f'<SerialCounter {self.serial_type}/{self.period}: {self.last_value}>'
     
     def to_dict(self):
         """Convert serial counter to dictionary"""
         return {
             'id': self.id,
             'serial_type': self.serial_type,
+            'period': self.period,
             'last_value': self.last_value
         }
     
     @classmethod
-    def get_or_create(cls, serial_type):
-        """Get or create a serial counter for the given type"""
-        counter = cls.query.filter_by(serial_type=serial_type).first()
+    def get_or_create(cls, serial_type, period=''):
+        """Get or create a serial counter for the given type and period"""
+        counter = cls.query.filter_by(serial_type=serial_type, period=period).first()
         if not counter:
-            counter = cls(serial_type=serial_type, last_value=0)
+            counter = cls(serial_type=serial_type, period=period, last_value=0)
             db.session.add(counter)
             db.session.commit()
         return counter
@@ -39,84 +53,96 @@ class SerialCounter(db.Model):
     @classmethod
     def get_next_counter(cls, serial_type):
         """Get the next counter value for a serial type"""
-        counter = cls.get_or_create(serial_type)
-        return counter.increment()
+        value = cls.reserve(serial_type)
+        db.session.commit()
+        return value
     
     @classmethod
-    def generate_serial_number(cls, serial_type):
-        """Generate a serial number for the given type"""
-        now = datetime.now()
-        
-        if serial_type == "ST":
-            # ST/MMYY/XXX format
-            mm_yy = now.strftime('%m%y')
-            pattern = f"ST/{mm_yy}/%"
-            format_string = f"ST/{mm_yy}/{{:03d}}"
-            return cls._get_next_number("stitching_invoices", "stitching_invoice_number", pattern, format_string)
-        
-        elif serial_type == "GB":
-            # GB/MMYY/XXX format
-            mm_yy = now.strftime('%m%y')
-            pattern = f"GB/{mm_yy}/%"
-            format_string = f"GB/{mm_yy}/{{:03d}}"
-            return cls._get_next_number("stitching_invoice_groups", "group_number", pattern, format_string)
+    def reserve(cls, serial_type, count=1, period=''):
+        """
+        Atomically reserve count consecutive values and return the first one.
         
-        elif serial_type == "PL":
-            # PLYYMMDDXX format
-            date_str = now.strftime('%y%m%d')
-            pattern = f"PL{date_str}%"
-            format_string = f"PL{date_str}{{:02d}}"
-            return cls._get_next_number("packing_lists", "packing_list_serial", pattern, format_string)
-        
-        elif serial_type == "GBN":
-            # GBNYYMMDDXX format
-            date_str = now.strftime('%y%m%d')
-            pattern = f"GBN{date_str}%"
-            format_string = f"GBN{date_str}{{:02d}}"
-            return cls._get_next_number("stitching_invoice_groups", "group_number", pattern, format_string)
+        The counter row is bumped with a single UPDATE, which holds its row lock
+        until the caller commits, so concurrent requests never get the same value
+        and a rolled back request gives its values back. Does not commit.
+        """
+        if count <= 0:
+            raise ValueError("count must be positive")
         
-        else:
+        table = cls.__table__
+        where = db.and_(table.c.serial_type == serial_type, table.c.period == period)
+        bumped = db.session.execute(
+            table.update().where(where).values(last_value=table.c.last_value + count)
+        ).rowcount
+        if not bumped:
+            cls._create_counter(serial_type, period)
+            db.session.execute(
+                table.update().where(where).values(last_value=table.c.last_value + count)
+            )
+        last_value = db.session.execute(db.select(table.c.last_value).where(where)).scalar_one()
+        return last_value - count + 1
+    
+    @classmethod
+    def _create_counter(cls, serial_type, period):
+        """Insert the counter row for a new period, starting after any serial already in use"""
+        try:
+            with db.session.begin_nested():
+                db.session.execute(cls.__table__.insert().values(
+                    serial_type=serial_type,
+                    period=period,
+                    last_value=cls._find_last_number(serial_type, period)
+                ))
+        except IntegrityError:
+            # Another request created it first
+            pass
+    
+    @classmethod
+    def generate_serial_number(cls, serial_type):
+        """Generate a serial number for the given type"""
+        return cls.generate_serial_numbers(serial_type, 1)[0]
+    
+    @classmethod
+    def generate_serial_numbers(cls, serial_type, count):
+        """Reserve count sequential serial numbers of the given type for the current period"""
+        if serial_type not in cls.SERIAL_FORMATS:
             raise ValueError(f"Unknown serial type: {serial_type}")
+        if count <= 0:
+            return []
+        
+        period_format, serial_format = cls.SERIAL_FORMATS[serial_type]
+        period = datetime.now().strftime(period_format)
+        first = cls.reserve(serial_type, count, period)
+        return [serial_format.format(period=period, number=number) for number in range(first, first + count)]
     
     @classmethod
-    def _get_next_number(cls, table_name, column_name, pattern, format_string):
-        """Find the next available number for a given pattern"""
-        # Get all existing serials for this pattern
-        if table_name == "stitching_invoices":
+    def _find_last_number(cls, serial_type, period):
+        """Highest number already used for a type and period (0 if none).
+        
+        Only runs when a period's counter row is first created, so serials
+        issued before counters were kept per period are never handed out again.
+        """
+        if serial_type not in cls.SERIAL_FORMATS:
+            return 0
+        
+        if serial_type == "ST":
             from app.models.stitching import StitchingInvoice
-            existing_serials = db.session.query(getattr(StitchingInvoice, column_name)).filter(
-                getattr(StitchingInvoice, column_name).like(pattern)
-            ).all()
-        elif table_name == "stitching_invoice_groups":
-            from app.models.group_bill import StitchingInvoiceGroup
-            existing_serials = db.session.query(getattr(StitchingInvoiceGroup, column_name)).filter(
-                getattr(StitchingInvoiceGroup, column_name).like(pattern)
-            ).all()
-        elif table_name == "packing_lists":
+            column = StitchingInvoice.stitching_invoice_number
+        elif serial_type == "PL":
             from app.models.packing_list import PackingList
-            existing_serials = db.session.query(getattr(PackingList, column_name)).filter(
-                getattr(PackingList, column_name).like(pattern)
-            ).all()
+            column = PackingList.packing_list_serial
         else:
-            raise ValueError(f"Unknown table: {table_name}")
+            from app.models.group_bill import StitchingInvoiceGroup
+            column = StitchingInvoiceGroup.group_number
+        
+        prefix = cls.SERIAL_FORMATS[serial_type][1].split('{number')[0].format(period=period)
+        existing_serials = db.session.query(column).filter(column.like(f"{prefix}%")).all()
         
         # Extract numeric parts
         numbers = []
         for (serial,) in existing_serials:
-            if serial:
-                try:
-                    # Extract the numeric part based on the pattern
-                    if pattern.startswith("ST/") or pattern.startswith("GB/"):
-                        # ST/MMYY/XXX or GB/MMYY/XXX format
-                        numeric_part = int(serial.split('/')[-1])
-                    else:
-                        # PLYYMMDDXX or GBNYYMMDDXX format
-                        numeric_part = int(serial[-2:])
-                    numbers.append(numeric_part)
-                except (ValueError, IndexError):
-                    continue
-        
-        # Find next number (start from 1 if no existing numbers)
-        next_number = 1 if not numbers else max(numbers) + 1
+            try:
+                numbers.append(int(serial[len(prefix):]))
+            except (TypeError, ValueError):
+                continue
         
-        return format_string.format(next_number)
+        return max(numbers) if numbers else 0
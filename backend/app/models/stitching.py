@@ -1,10 +1,39 @@
 from extensions import db
 from datetime import datetime
+import ast
 import json
 
+def load_size_qty(size_qty_json):
+    """Parse a stored size_qty_json value into a size -> quantity dictionary ({} if unreadable)"""
+    if not size_qty_json:
+        return {}
+    try:
+        size_qty = json.loads(size_qty_json)
+    except (json.JSONDecodeError, TypeError):
+        # Older records were saved as Python dict literals ("{'S': 10}")
+        try:
+            size_qty = ast.literal_eval(size_qty_json)
+        except (ValueError, SyntaxError, TypeError):
+            return {}
+    return size_qty if isinstance(size_qty, dict) else {}
+
+def sum_size_qty(size_qty):
+    """Total pieces in a size -> quantity dictionary, ignoring non-numeric values"""
+    total = 0
+    for qty in (size_qty or {}).values():
+        try:
+            total += int(float(qty or 0))
+        except (TypeError, ValueError):
+            continue
+    return total
+
 class StitchingInvoice(db.Model):
     """StitchingInvoice model for storing stitching records"""
     __tablename__ = 'stitching_invoices'
+    # Keyset pagination of the list endpoint (newest first)
+    __table_args__ = (
+        db.Index('ix_stitching_invoices_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     stitching_invoice_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -12,6 +41,7 @@ class StitchingInvoice(db.Model):
     yard_consumed = db.Column(db.Numeric(10, 2), default=0)
     stitched_item = db.Column(db.String(255), nullable=False)
     size_qty_json = db.Column(db.Text)  # JSON string for size quantities
+    total_qty = db.Column(db.Integer, default=0, index=True)  # Sum of size_qty_json, kept by set_size_qty
     price = db.Column(db.Numeric(10, 2), default=0)
     total_value = db.Column(db.Numeric(12, 2), default=0)
     add_vat = db.Column(db.Boolean, default=False)
@@ -20,8 +50,12 @@ class StitchingInvoice(db.Model):
     image_id = db.Column(db.Integer, db.ForeignKey('images.id'))
     billing_group_id = db.Column(db.Integer, db.ForeignKey('stitching_invoice_groups.id'))
     total_lining_cost = db.Column(db.Numeric(12, 2), default=0)
-    total_fabric_cost = db.Column(db.Numeric(12, 2), default=0)
+    total_fabric_cost = db.Column(db.Numeric(12, 2), default=0)  # Secondary (garment) fabrics only
     stitching_cost = db.Column(db.Numeric(10, 2), default=0)  # New field for stitching cost
+    # Garment cost components, kept by refresh_costs()
+    main_fabric_cost = db.Column(db.Numeric(12, 2), default=0)  # yard_consumed x main invoice line unit price
+    sewing_cost_per_piece = db.Column(db.Numeric(10, 2), default=0)  # price, plus 7% VAT if add_vat
+    cost_per_piece = db.Column(db.Numeric(12, 4), default=0)  # All fabric costs / total_qty + sewing
     
     # Relationships
     garment_fabrics = db.relationship('GarmentFabric', backref='stitching_invoice', lazy=True, cascade='all, delete-orphan')
@@ -52,6 +86,7 @@ class StitchingInvoice(db.Model):
             'stitched_item': self.stitched_item,
             'size_qty': self.get_size_qty(),
             'size_qty_json': self.size_qty_json,  # Add the raw JSON string
+            'total_qty': self.total_qty or 0,
             'price': float(self.price) if self.price else 0,
             'total_value': float(self.total_value) if self.total_value else 0,
             'add_vat': self.add_vat,
@@ -63,6 +98,9 @@ class StitchingInvoice(db.Model):
             'total_lining_cost': float(self.total_lining_cost) if self.total_lining_cost else 0,
             'total_fabric_cost': float(self.total_fabric_cost) if self.total_fabric_cost else 0,
             'stitching_cost': float(self.stitching_cost) if self.stitching_cost else 0,
+            'main_fabric_cost': float(self.main_fabric_cost) if self.main_fabric_cost else 0,
+            'sewing_cost_per_piece': float(self.sewing_cost_per_piece) if self.sewing_cost_per_piece else 0,
+            'cost_per_piece': float(self.cost_per_piece) if self.cost_per_piece else 0,
             'fabric_name': self.invoice_line.item_name if self.invoice_line else None,
             'color': self.invoice_line.color if self.invoice_line else None,
             'customer_name': self.invoice_line.invoice.customer.short_name if self.invoice_line and self.invoice_line.invoice else None,
@@ -77,20 +115,17 @@ class StitchingInvoice(db.Model):
     def get_size_qty(self):
         """Get size quantities as dictionary"""
         if self.size_qty_json:
-            try:
-                return json.loads(self.size_qty_json)
-            except (json.JSONDecodeError, TypeError):
-                return {}
+            return load_size_qty(self.size_qty_json)
         return {}
     
     def set_size_qty(self, size_qty_dict):
-        """Set size quantities from dictionary"""
+        """Set size quantities from dictionary and keep total_qty in step"""
         self.size_qty_json = json.dumps(size_qty_dict)
+        self.total_qty = sum_size_qty(size_qty_dict)
     
     def calculate_total(self):
         """Calculate total value including VAT if applicable"""
-        total_qty = sum(self.get_size_qty().values())
-        base_total = self.price * total_qty
+        base_total = self.price * (self.total_qty or 0)
         
         if self.add_vat:
             self.total_value = base_total * 1.07  # Add 7% VAT
@@ -99,11 +134,87 @@ class StitchingInvoice(db.Model):
         
         return self.total_value
     
+    def refresh_costs(self):
+        """Recompute the stored garment cost components from the fabrics, linings and price"""
+        main_unit_price = self.invoice_line.unit_price if self.invoice_line else 0
+        self.main_fabric_cost = float(self.yard_consumed or 0) * float(main_unit_price or 0)
+        self.total_fabric_cost = sum(float(fabric.total_fabric_cost or 0) for fabric in self.garment_fabrics)
+        self.total_lining_cost = sum(float(lining.total_cost or 0) for lining in self.lining_fabrics)
+        
+        sewing_price = float(self.price or 0)
+        self.sewing_cost_per_piece = sewing_price * 1.07 if self.add_vat else sewing_price
+        
+        total_qty = self.total_qty or 0
+        if total_qty > 0:
+            self.cost_per_piece = self.fabric_cost_total() / total_qty + float(self.sewing_cost_per_piece)
+        else:
+            self.cost_per_piece = 0
+        return self.cost_per_piece
+    
+    def fabric_cost_total(self):
+        """Main, secondary and lining fabric cost of the whole record"""
+        return float(self.main_fabric_cost or 0) + float(self.total_fabric_cost or 0) + float(self.total_lining_cost or 0)
+    
+    def cost_breakdown(self, total_qty=None):
+        """Per-piece cost split from the stored components (total_qty defaults to the stored total)"""
+        total_qty = total_qty if total_qty is not None else (self.total_qty or 0)
+        sewing = float(self.sewing_cost_per_piece or 0)
+        fabric = self.fabric_cost_total() / total_qty if total_qty else 0
+        return {
+            'main_fabric_cost': float(self.main_fabric_cost or 0),
+            'multi_fabric_cost': float(self.total_fabric_cost or 0),
+            'lining_cost': float(self.total_lining_cost or 0),
+            'fabric_cost_per_piece': fabric,
+            'sewing_cost_per_piece': sewing,
+            'cost_per_piece': fabric + sewing if total_qty else 0
+        }
+    
+    @classmethod
+    def refresh_costs_for_invoice_line(cls, invoice_line_id):
+        """Refresh costs of the records using an invoice line as main fabric (after its unit price changed)"""
+        records = cls.query.filter_by(invoice_line_id=invoice_line_id).all()
+        for record in records:
+            record.refresh_costs()
+        return len(records)
+    
+    @classmethod
+    def rebuild_costs(cls, batch_size=500):
+        """Recompute the stored cost components of every record; returns the number of records"""
+        last_id = 0
+        count = 0
+        while True:
+            records = cls.query.filter(cls.id > last_id).options(
+                db.selectinload(cls.invoice_line),
+                db.selectinload(cls.garment_fabrics),
+                db.selectinload(cls.lining_fabrics)
+            ).order_by(cls.id).limit(batch_size).all()
+            if not records:
+                return count
+            for record in records:
+                record.refresh_costs()
+            db.session.flush()
+            last_id = records[-1].id
+            count += len(records)
+    
     @classmethod
     def get_by_serial_number(cls, serial_number):
         """Get stitching invoice by serial number"""
         return cls.query.filter_by(stitching_invoice_number=serial_number).first()
     
+    @classmethod
+    def rebuild_total_qty(cls, batch_size=1000):
+        """Recompute total_qty for every record from size_qty_json; returns the number of records"""
+        update = cls.__table__.update().where(cls.__table__.c.id == db.bindparam('record_id')).values(
+            total_qty=db.bindparam('new_total_qty')
+        )
+        rows = db.session.query(cls.id, cls.size_qty_json).order_by(cls.id).all()
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(update, [
+                {'record_id': record_id, 'new_total_qty': sum_size_qty(load_size_qty(size_qty_json))}
+                for record_id, size_qty_json in rows[start:start + batch_size]
+            ])
+        return len(rows)
+    
     @classmethod
     def get_unbilled(cls):
         """Get all unbilled stitching invoices"""
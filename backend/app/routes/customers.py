@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app.models.customer import Customer
 from app.models.customer_id_mapping import CustomerIdMapping
+from app.models.group_bill import StitchingInvoiceGroup
 from main import db
 import json
 import os
@@ -105,6 +106,7 @@ def update_customer(customer_id):
         # Update fields
         if 'short_name' in data:
             customer.short_name = data['short_name']
+            StitchingInvoiceGroup.invalidate_snapshots_for_customer(customer.id)
         if 'full_name' in data:
             customer.full_name = data['full_name']
         if 'registration_date' in data:
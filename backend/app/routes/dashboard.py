@@ -136,63 +136,11 @@ def get_dashboard_summary():
         print(f"DEBUG: Direct commission: {direct_commission}")
         
         # Calculate stitching profit (based on packing list delivery dates)
-        # Calculate total quantity from size_qty_json
+        # Quantities come from the stored stitching_invoices.total_qty column
         stitching_query = text(f"""
             SELECT 
-                COALESCE(SUM(si.price * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                )), 0) as stitching_revenue,
-                COALESCE(SUM(si.stitching_cost * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                )), 0) as stitching_cost
+                COALESCE(SUM(si.price * si.total_qty), 0) as stitching_revenue,
+                COALESCE(SUM(si.stitching_cost * si.total_qty), 0) as stitching_cost
             FROM packing_lists pl
             JOIN packing_list_lines pll ON pl.id = pll.packing_list_id
             JOIN stitching_invoices si ON pll.stitching_invoice_id = si.id
@@ -293,33 +241,7 @@ def get_dashboard_summary():
         production_where = " AND ".join(production_conditions) if production_conditions else "1=1"
         
         production_query = text(f"""
-            SELECT COALESCE(SUM(
-                CASE 
-                    WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                    AND JSON_VALID(si.size_qty_json) = 1
-                    THEN (
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                        COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                    )
-                    ELSE 0 
-                END
-            ), 0) as total_items
+            SELECT COALESCE(SUM(si.total_qty), 0) as total_items
             FROM stitching_invoices si
             LEFT JOIN invoice_lines il ON si.invoice_line_id = il.id
             LEFT JOIN invoices i ON il.invoice_id = i.id
@@ -422,60 +344,8 @@ def get_revenue_trends():
             SELECT 
                 DATE(pl.delivery_date) as date,
                 COALESCE(SUM(il.yards_sent * il.unit_price * :commission_rate), 0) as fabric_commission,
-                COALESCE(SUM(si.price * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                )), 0) as stitching_revenue,
-                COALESCE(SUM(si.stitching_cost * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                )), 0) as stitching_cost
+                COALESCE(SUM(si.price * si.total_qty), 0) as stitching_revenue,
+                COALESCE(SUM(si.stitching_cost * si.total_qty), 0) as stitching_cost
             FROM stitching_invoices si
             JOIN invoice_lines il ON si.invoice_line_id = il.id
             JOIN invoices i ON il.invoice_id = i.id
@@ -601,60 +471,8 @@ def get_top_customers():
             SELECT 
                 c.short_name,
                 COALESCE(SUM(il.yards_sent * il.unit_price * :commission_rate), 0) as fabric_commission,
-                COALESCE(SUM(si.price * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                )), 0) as stitching_revenue,
-                COALESCE(SUM(si.stitching_cost * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                )), 0) as stitching_cost
+                COALESCE(SUM(si.price * si.total_qty), 0) as stitching_revenue,
+                COALESCE(SUM(si.stitching_cost * si.total_qty), 0) as stitching_cost
             FROM stitching_invoices si
             JOIN invoice_lines il ON si.invoice_line_id = il.id
             JOIN invoices i ON il.invoice_id = i.id
@@ -779,23 +597,14 @@ def get_fabric_consumption():
             SELECT 
                 si.stitched_item,
                 SUM(COALESCE(si.yard_consumed, 0)) as total_yards,
-                SUM(
-                    COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                    COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                    COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                    COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                    COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                    COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0)
-                ) as total_quantity
+                SUM(si.total_qty) as total_quantity
             FROM stitching_invoices si
             JOIN packing_list_lines pll ON si.id = pll.stitching_invoice_id
             JOIN packing_lists pl ON pll.packing_list_id = pl.id
             LEFT JOIN invoice_lines il ON si.invoice_line_id = il.id
             LEFT JOIN customers c ON pl.customer_id = c.id
             WHERE si.yard_consumed > 0
-            AND si.size_qty_json IS NOT NULL
-            AND si.size_qty_json != ''
-            AND JSON_VALID(si.size_qty_json) = 1
+            AND si.total_qty > 0
             AND pl.delivery_date IS NOT NULL
             AND {where_clause}
             GROUP BY si.stitched_item
@@ -860,33 +669,7 @@ def get_production_overview():
         query = text(f"""
             SELECT 
                 si.stitched_item,
-                SUM(
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                ) as total_quantity
+                SUM(si.total_qty) as total_quantity
             FROM stitching_invoices si
             JOIN invoice_lines il ON si.invoice_line_id = il.id
             JOIN invoices i ON il.invoice_id = i.id
@@ -946,18 +729,11 @@ def get_stock_status():
         query = text(f"""
             SELECT 
                 COALESCE(il.delivered_location, 'Unknown') as location,
-                SUM(il.yards_sent - COALESCE(il.yards_consumed, 0) - COALESCE(commission_yards, 0)) as pending_yards
+                SUM(il.pending_yards) as pending_yards
             FROM invoice_lines il
             JOIN invoices i ON il.invoice_id = i.id
             JOIN customers c ON i.customer_id = c.id
-            LEFT JOIN (
-                SELECT 
-                    invoice_line_id,
-                    SUM(yards_sold) as commission_yards
-                FROM commission_sales
-                GROUP BY invoice_line_id
-            ) cs ON il.id = cs.invoice_line_id
-            WHERE (il.yards_sent - COALESCE(il.yards_consumed, 0) - COALESCE(commission_yards, 0)) > 0
+            WHERE il.pending_yards > 0
             AND {where_clause}
             GROUP BY il.delivered_location
             HAVING pending_yards > 0
@@ -1020,33 +796,7 @@ def get_production_rate():
         query = text(f"""
             SELECT 
                 DATE(pl.delivery_date) as date,
-                SUM(
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                ) as items_produced
+                SUM(si.total_qty) as items_produced
             FROM stitching_invoices si
             JOIN invoice_lines il ON si.invoice_line_id = il.id
             JOIN invoices i ON il.invoice_id = i.id
@@ -1118,60 +868,8 @@ def get_earnings_breakdown():
         stitching_query = text(f"""
             SELECT 
                 COALESCE(SUM(il.yards_sent * il.unit_price * :commission_rate), 0) as fabric_commission,
-                COALESCE(SUM(si.price * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                )), 0) as stitching_revenue,
-                COALESCE(SUM(si.stitching_cost * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                )), 0) as stitching_cost
+                COALESCE(SUM(si.price * si.total_qty), 0) as stitching_revenue,
+                COALESCE(SUM(si.stitching_cost * si.total_qty), 0) as stitching_cost
             FROM stitching_invoices si
             JOIN invoice_lines il ON si.invoice_line_id = il.id
             JOIN invoices i ON il.invoice_id = i.id
@@ -1273,60 +971,8 @@ def get_earnings_by_customer():
             SELECT 
                 c.short_name,
                 COALESCE(SUM(il.yards_sent * il.unit_price * :commission_rate), 0) as fabric_commission,
-                COALESCE(SUM(si.price * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                )), 0) as stitching_revenue,
-                COALESCE(SUM(si.stitching_cost * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                )), 0) as stitching_cost
+                COALESCE(SUM(si.price * si.total_qty), 0) as stitching_revenue,
+                COALESCE(SUM(si.stitching_cost * si.total_qty), 0) as stitching_cost
             FROM stitching_invoices si
             JOIN invoice_lines il ON si.invoice_line_id = il.id
             JOIN invoices i ON il.invoice_id = i.id
@@ -1659,61 +1305,9 @@ def debug_stitching():
             SELECT 
                 si.id,
                 si.stitched_item,
-                si.price * (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                ) as total_value,
+                si.price * si.total_qty as total_value,
                 si.stitching_cost,
-                (
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                ) as total_qty,
+                si.total_qty as total_qty,
                 si.price,
                 pl.delivery_date,
                 c.short_name as customer_name
@@ -1789,87 +1383,9 @@ def get_profit_margin_by_garment():
         query = text(f"""
             SELECT 
                 si.stitched_item,
-                SUM(
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                ) as total_quantity,
-                SUM(
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END * si.price
-                ) as total_revenue,
-                SUM(
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END * si.stitching_cost
-                ) as total_cost,
+                SUM(si.total_qty) as total_quantity,
+                SUM(si.total_qty * si.price) as total_revenue,
+                SUM(si.total_qty * si.stitching_cost) as total_cost,
                 SUM(COALESCE(si.yard_consumed, 0) * COALESCE(il.unit_price, 0)) as fabric_cost
             FROM packing_lists pl
             JOIN packing_list_lines pll ON pl.id = pll.packing_list_id
@@ -1931,60 +1447,8 @@ def get_profitability_trend():
         query = text(f"""
             SELECT 
                 DATE_FORMAT(pl.delivery_date, '%Y-%m') as month,
-                SUM(
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END * si.price
-                ) as revenue,
-                SUM(
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END * si.stitching_cost
-                ) as stitching_cost,
+                SUM(si.total_qty * si.price) as revenue,
+                SUM(si.total_qty * si.stitching_cost) as stitching_cost,
                 SUM(COALESCE(si.yard_consumed, 0) * COALESCE(il.unit_price, 0)) as fabric_cost
             FROM packing_lists pl
             JOIN packing_list_lines pll ON pl.id = pll.packing_list_id
@@ -2048,87 +1512,9 @@ def get_customer_profitability():
             SELECT 
                 c.short_name as customer_name,
                 COUNT(DISTINCT pl.id) as order_count,
-                SUM(
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END
-                ) as total_quantity,
-                SUM(
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END * si.price
-                ) as total_revenue,
-                SUM(
-                    CASE 
-                        WHEN si.size_qty_json IS NOT NULL AND si.size_qty_json != '' 
-                        AND JSON_VALID(si.size_qty_json) = 1
-                        THEN (
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.S'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.M'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.L'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XXXL'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.XS'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."2XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."3XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."4XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."5XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."6XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."7XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."8XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."9XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$."10XL"'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.ONE_SIZE'), 0) + 
-                            COALESCE(JSON_EXTRACT(si.size_qty_json, '$.UNISEX'), 0)
-                        )
-                        ELSE 0 
-                    END * si.stitching_cost
-                ) as total_stitching_cost,
+                SUM(si.total_qty) as total_quantity,
+                SUM(si.total_qty * si.price) as total_revenue,
+                SUM(si.total_qty * si.stitching_cost) as total_stitching_cost,
                 SUM(COALESCE(si.yard_consumed, 0) * COALESCE(il.unit_price, 0)) as total_fabric_cost
             FROM packing_lists pl
             JOIN packing_list_lines pll ON pl.id = pll.packing_list_id
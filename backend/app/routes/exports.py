@@ -0,0 +1,153 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from app.models.packing_list import PackingList
+from app.models.group_bill import StitchingInvoiceGroup
+from app.models.customer import Customer
+from app.routes.packing_lists import packing_list_pdf_key, packing_list_pdf_name
+from app.routes.group_bills import group_bill_pdf_key
+from app.services.pdf_render_service import iter_renders
+from datetime import datetime
+import zipfile
+from extensions import db
+
+exports_bp = Blueprint('exports', __name__)
+
+DOCUMENT_TYPES = ('packing_list', 'stitching_fee', 'fabric_used')
+
+
+class _ZipStream:
+    """Write-only file for zipfile that hands each written chunk to the response generator"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parse_multi_value(value):
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    if not value or not str(value).strip():
+        return []
+    return [v.strip() for v in str(value).split(',') if v.strip()]
+
+
+def _parse_date(value, field):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Invalid {field} format, expected YYYY-MM-DD')
+
+
+def _filtered(query, model, customers, date_from, date_to):
+    """Customer (short names) and creation date filters, as on the list pages"""
+    if customers:
+        query = query.join(Customer, model.customer_id == Customer.id).filter(Customer.short_name.in_(customers))
+    if date_from:
+        query = query.filter(db.func.date(model.created_at) >= date_from)
+    if date_to:
+        query = query.filter(db.func.date(model.created_at) <= date_to)
+    return query.order_by(model.created_at, model.id)
+
+
+def _safe_name(name):
+    return str(name).replace('/', '_').replace('\\', '_')
+
+
+def _export_documents(document_types, customers, date_from, date_to, show_cost, apply_withholding_tax):
+    """(kind, target_id, flag, key, name) of every PDF to export; keys are computed as they are consumed"""
+    if 'packing_list' in document_types:
+        packing_list_ids = [row[0] for row in _filtered(
+            db.session.query(PackingList.id), PackingList, customers, date_from, date_to
+        )]
+        for packing_list_id in packing_list_ids:
+            packing_list, key = packing_list_pdf_key(packing_list_id, show_cost)
+            if packing_list:
+                name = f"packing_lists/{_safe_name(packing_list_pdf_name(packing_list, show_cost))}"
+                yield 'packing_list', packing_list_id, show_cost, key, name
+
+    group_kinds = [kind for kind in ('stitching_fee', 'fabric_used') if kind in document_types]
+    if group_kinds:
+        group_ids = [row[0] for row in _filtered(
+            db.session.query(StitchingInvoiceGroup.id), StitchingInvoiceGroup, customers, date_from, date_to
+        )]
+        for group_id in group_ids:
+            group_bill = StitchingInvoiceGroup.query.get(group_id)
+            if not group_bill:
+                continue
+            for kind in group_kinds:
+                flag = apply_withholding_tax if kind == 'stitching_fee' else False
+                suffix = 'stitching' if kind == 'stitching_fee' else 'fabric'
+                key = group_bill_pdf_key(group_bill, kind, flag)
+                yield kind, group_id, flag, key, f"group_bills/{_safe_name(group_bill.group_number)}_{suffix}.pdf"
+            db.session.commit()  # Keep the snapshot if it was rebuilt
+
+
+@exports_bp.route('/pdfs', methods=['POST'])
+def export_pdfs():
+    """
+    Stream a ZIP of packing list and group bill PDFs matching a filter:
+    {date_from, date_to, customer, document_types, show_cost, apply_withholding_tax}.
+    Cached PDFs are added straight away and missing ones are rendered on the PDF process pool
+    and added as each finishes; failures are listed in export_errors.txt at the end.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        document_types = _parse_multi_value(data.get('document_types')) or list(DOCUMENT_TYPES)
+        unknown = [t for t in document_types if t not in DOCUMENT_TYPES]
+        if unknown:
+            return jsonify({'error': f"Unknown document types: {', '.join(unknown)}. Use {', '.join(DOCUMENT_TYPES)}"}), 400
+        customers = _parse_multi_value(data.get('customer'))
+        date_from = _parse_date(data.get('date_from'), 'date_from')
+        date_to = _parse_date(data.get('date_to'), 'date_to')
+        show_cost = bool(data.get('show_cost', False))
+        apply_withholding_tax = bool(data.get('apply_withholding_tax', True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        stream = _ZipStream()
+        errors = []
+        try:
+            with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+                documents = _export_documents(document_types, customers, date_from, date_to, show_cost, apply_withholding_tax)
+                for document, path, error in iter_renders(documents):
+                    name = document[4]
+                    if path:
+                        try:
+                            archive.write(path, name)
+                        except OSError as e:
+                            error = str(e)
+                    if error:
+                        errors.append(f"{name}: {error}")
+                    yield stream.pop()
+                if errors:
+                    archive.writestr('export_errors.txt', '\n'.join(errors) + '\n')
+            yield stream.pop()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ PDF export failed: {e}")
+            raise
+
+    filename = f"pdf_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
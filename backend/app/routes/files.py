@@ -1,12 +1,17 @@
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import FileStorage
 import os
-from datetime import datetime
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from main import db
-from app.models.invoice import Invoice, InvoiceLine
-from app.models.customer import Customer
-from app.models.customer_id_mapping import CustomerIdMapping
+from app.models.dat_import_job import DatImportJob, DatImportFile
 from app.services.storage_service_factory import StorageServiceFactory
+from app.services.dat_import_service import (
+    DatImportService, iter_dat_lines, hash_upload, DEFAULT_CHUNK_SIZE, STREAMABLE_EXTENSIONS
+)
 import traceback
 
 files_bp = Blueprint('files', __name__)
@@ -95,8 +100,9 @@ def import_dat_file():
         if file.filename == '':
             return {'error': 'No file selected'}, 400
         
-        if not file.filename.lower().endswith('.dat'):
-            return {'error': 'File must be a .DAT file'}, 400
+        filename = file.filename.lower()
+        if not filename.endswith(STREAMABLE_EXTENSIONS):
+            return {'error': 'File must be a .DAT, .DAT.GZ or .ZIP file'}, 400
         
         # Get customer filter if provided
         customer_ids_filter = request.form.get('customer_ids', '').strip()
@@ -104,216 +110,267 @@ def import_dat_file():
         if customer_ids_filter:
             selected_customer_ids = [cid.strip() for cid in customer_ids_filter.split(',') if cid.strip()]
         
+        # Compressed uploads are always streamed; plain .DAT files on request
+        stream = request.form.get('stream', 'false').lower() == 'true' or not filename.endswith('.dat')
+        try:
+            chunk_size = max(1, int(request.form.get('chunk_size', current_app.config.get('DAT_IMPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))))
+            resume_from_chunk = max(0, int(request.form.get('resume_from_chunk', 0)))
+        except ValueError:
+            return {'error': 'chunk_size and resume_from_chunk must be integers'}, 400
+        
+        # A dry run writes nothing and returns a diff, so it always runs synchronously
+        dry_run = request.form.get('dry_run', 'false').lower() == 'true'
+        
+        # By default the import runs as a background job; poll /import-jobs/<id>
+        if not dry_run and request.form.get('background', 'true').lower() == 'true':
+            job = create_import_job(file, selected_customer_ids, chunk_size)
+            return jsonify({'job_id': job.id, 'status': job.status}), 202
+        
         # Read and process the file
-        result = import_dat_file_core(file, selected_customer_ids)
+        result = import_dat_file_core(
+            file, selected_customer_ids, stream=stream,
+            chunk_size=chunk_size, resume_from_chunk=resume_from_chunk, dry_run=dry_run
+        )
         
         return jsonify(result)
         
     except Exception as e:
+        db.session.rollback()
         return {'error': str(e)}, 500
 
-def import_dat_file_core(file, selected_customer_ids=None):
+@files_bp.route('/import-jobs/<int:job_id>', methods=['GET'])
+def get_import_job(job_id):
+    """Get progress of a background .DAT import job"""
+    try:
+        job = DatImportJob.query.get(job_id)
+        if not job:
+            return {'error': 'Import job not found'}, 404
+        # Pick up the job here if the worker that owned it has died
+        if job.is_abandoned(_stale_after()):
+            _submit_import_job(job.id)
+        return jsonify(job.to_dict())
+    except Exception as e:
+        return {'error': str(e)}, 500
+
+@files_bp.route('/import-jobs/<int:job_id>/retry', methods=['POST'])
+def retry_import_job(job_id):
+    """Retry a failed import job from its last committed chunk"""
+    try:
+        job = DatImportJob.query.get(job_id)
+        if not job:
+            return {'error': 'Import job not found'}, 404
+        if job.status != 'failed':
+            return {'error': f'Only failed jobs can be retried (job is {job.status})'}, 400
+        if not os.path.exists(job.stored_path):
+            return {'error': 'Uploaded file is no longer available, please upload it again'}, 400
+        job.status = 'queued'
+        job.finished_at = None
+        db.session.commit()
+        _submit_import_job(job.id)
+        return jsonify(job.to_dict()), 202
+    except Exception as e:
+        db.session.rollback()
+        return {'error': str(e)}, 500
+
+def import_dat_file_core(file, selected_customer_ids=None, stream=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                         resume_from_chunk=0, progress_callback=None, dry_run=False):
     """
     Import a .DAT file into the database. Optionally filter by customer IDs.
     Returns a dict with summary, errors, imported_count, skipped_count.
+    
+    With stream=True the upload (.DAT, .DAT.GZ or ZIP of .DAT files) is read line
+    by line and committed every chunk_size lines; the result adds per-chunk
+    progress and the chunk to resume from after a failure.
+    
+    Re-imports are idempotent: a file whose content hash was fully imported
+    before is skipped outright, and lines already imported (by fingerprint)
+    are skipped and counted in duplicate_count.
+    
+    With dry_run=True nothing is written; the result carries a 'diff' of the
+    customers, invoices and lines the import would create.
     """
-    summary = []
-    errors = []
-    imported_count = 0
-    skipped_count = 0
+    importer = DatImportService(selected_customer_ids, dry_run=dry_run)
+    file_hash = hash_upload(file)
+    
+    imported_file = DatImportFile.get_by_hash(file_hash)
+    if imported_file:
+        importer.summary.append(f"File already imported as {imported_file.filename} on {imported_file.imported_at:%Y-%m-%d %H:%M}")
+        importer.completed = True
+        result = importer.stream_result(file.filename) if stream else importer.result(file.filename)
+        result['already_imported'] = True
+        return result
+    
+    if stream:
+        try:
+            importer.import_stream(
+                iter_dat_lines(file), chunk_size=chunk_size,
+                resume_from_chunk=resume_from_chunk, progress_callback=progress_callback
+            )
+            # A resumed run does not see the skips of replayed chunks, so only full runs count
+            if importer.completed and resume_from_chunk == 0 and not dry_run:
+                _record_imported_file(importer, file_hash, file.filename)
+        except Exception as e:
+            # Unreadable archive or stream error; committed chunks are kept
+            db.session.rollback()
+            importer.errors.append(f"General error: {str(e)}")
+        print(f"✅ DAT stream import: {importer.imported_count} lines imported, {importer.skipped_count} skipped, {len(importer.errors)} errors")
+        return importer.stream_result(file.filename)
     
     try:
         # Read file content
         content = file.read().decode('utf-8', errors='replace')
         lines = content.split('\n')
         
-        invoice_line_counts = {}
-        
-        for idx, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-            
-            parts = [p.strip() for p in line.split(';')]
-            if len(parts) < 14:
-                errors.append(f"Line {idx+1}: Invalid format (expected 14 fields, got {len(parts)})")
-                continue
-            
-            # Map fields from .DAT file (exactly like old Qt app)
-            tax = parts[0]
-            short_name = parts[1]
-            customer_id = parts[2]
-            date_raw = parts[3]
-            invoice_number = parts[4]
-            currency = parts[5]
-            item_code = parts[6]
-            item_details = parts[7]
-            fabric_amount = parts[8]
-            price_per_unit = parts[9]
-            # total_value = parts[10]  # Don't parse total_value from file (like old Qt app)
-            description = parts[11]
-            vat = parts[12]
-            # parts[13] is unused
-            
-            # Convert the padded customer ID from .dat file to regular format (like old Qt app)
-            # .dat file has customer ID as 8-digit padded (e.g., "00000328")
-            # User enters regular format (e.g., "328")
-            try:
-                # Remove leading zeros and convert to integer, then back to string
-                customer_id_normalized = str(int(customer_id))
-            except ValueError:
-                # If conversion fails, use original customer_id
-                customer_id_normalized = customer_id
-            
-            # Check if customer ID is in selected list (if filtering is active)
-            if selected_customer_ids and customer_id_normalized not in selected_customer_ids:
-                skipped_count += 1
-                continue
-            
-            # Check if this customer ID exists in the customer ID mapping table (user-entered IDs only)
-            existing_mapping = CustomerIdMapping.get_by_customer_id(customer_id_normalized)
-            if not existing_mapping:
-                print(f"⏭️  Skipping customer ID {customer_id_normalized} - not in user's customer ID list")
-                skipped_count += 1
-                continue
-            
-            # Parse date (YYYYMMDD to YYYY-MM-DD) - like old Qt app
-            invoice_date = None
-            if date_raw and len(date_raw) == 8:
-                try:
-                    invoice_date = f"{date_raw[:4]}-{date_raw[4:6]}-{date_raw[6:]}"
-                    invoice_date = datetime.strptime(invoice_date, '%Y-%m-%d')
-                except Exception:
-                    invoice_date = None
-            
-            # Calculate total value from price × quantity (like old Qt app)
-            try:
-                fabric_qty = float(fabric_amount or 0)
-                unit_price = float(price_per_unit or 0)
-                calculated_total_value = fabric_qty * unit_price
-            except (ValueError, TypeError):
-                calculated_total_value = 0.0
-                errors.append(f"Line {idx+1}: Could not calculate total value from fabric_amount={fabric_amount}, price_per_unit={price_per_unit}")
-                continue
-            
-            # Ensure customer exists (like old Qt app)
-            print(f"🔍 Processing customer: ID={customer_id_normalized}, Name={short_name}")
-            
-            # Check for existing customer by customer_id first
-            customer = Customer.query.filter_by(customer_id=customer_id_normalized).first()
-            if not customer:
-                # Check for existing customer by short_name
-                customer = Customer.query.filter_by(short_name=short_name).first()
-                if customer:
-                    print(f"⚠️  Found customer with same name but different ID: {customer.customer_id} vs {customer_id_normalized}")
-                    # Update the customer_id to match the .dat file
-                    customer.customer_id = customer_id_normalized
-                    db.session.flush()
-                    print(f"✅ Updated customer ID: {customer.id}, CustomerID={customer.customer_id}, Name={customer.short_name}")
-                else:
-                    print(f"➕ Creating new customer: ID={customer_id_normalized}, Name={short_name}")
-                    customer = Customer(
-                        customer_id=customer_id_normalized,
-                        short_name=short_name,
-                        full_name=short_name,
-                        registration_date=datetime.now(),
-                        is_active=True
-                    )
-                    db.session.add(customer)
-                    db.session.flush()
-                    print(f"✅ Customer created with ID: {customer.id}")
-            else:
-                print(f"📋 Found existing customer: ID={customer.id}, CustomerID={customer.customer_id}, Name={customer.short_name}")
-            
-            # Update customer ID mapping with short name (only for user-entered IDs)
-            existing_mapping = CustomerIdMapping.get_by_customer_id(customer_id_normalized)
-            if existing_mapping and not existing_mapping.short_name:
-                # Only update if the short name is empty (first time seeing this customer)
-                existing_mapping.short_name = short_name
-                existing_mapping.updated_at = datetime.utcnow()
-                print(f"✅ Updated short name for customer ID {customer_id_normalized}: {short_name}")
-            
-            # Handle duplicate invoice numbers by adding line numbers (like old Qt app)
-            if invoice_number in invoice_line_counts:
-                invoice_line_counts[invoice_number] += 1
-            else:
-                invoice_line_counts[invoice_number] = 1
-            
-            modified_invoice_number = f"{invoice_number}-{invoice_line_counts[invoice_number]:02d}"
-            
-            # Insert or update invoice (like old Qt app)
-            invoice = Invoice.query.filter_by(
-                invoice_number=modified_invoice_number,
-                customer_id=customer.id
-            ).first()
-            
-            if not invoice:
-                invoice = Invoice(
-                    invoice_number=modified_invoice_number,
-                    customer_id=customer.id,
-                    invoice_date=invoice_date,
-                    total_amount=calculated_total_value,
-                    status='open',
-                    tax_invoice_number=None  # Tax invoice number should be empty/null, not from .dat file
-                )
-                db.session.add(invoice)
-                db.session.flush()
-            
-            # Extract color and delivery note from item_details (robust handling like old Qt app)
-            details_parts = [p.strip() for p in item_details.split('/') if p.strip()]
-            color = details_parts[1] if len(details_parts) > 1 else ''
-            delivery_note = ''
-            if len(details_parts) > 2:
-                if details_parts[2] == '0' and len(details_parts) > 3:
-                    delivery_note = details_parts[3]
-                else:
-                    delivery_note = details_parts[2]
-            
-            # Insert invoice line (like old Qt app)
-            try:
-                invoice_line = InvoiceLine(
-                    invoice_id=invoice.id,
-                    item_name=item_code,
-                    quantity=float(fabric_amount or 0),
-                    unit_price=float(price_per_unit or 0),
-                    delivered_location=None,
-                    is_defective=False,
-                    color=color,
-                    delivery_note=delivery_note,
-                    yards_sent=float(fabric_amount or 0),
-                    yards_consumed=0.0
-                )
-                db.session.add(invoice_line)
-                imported_count += 1
-                
-            except Exception as e:
-                errors.append(f"Line {idx+1}: DB error: {e}")
-                continue
-        
+        importer.import_lines((idx + 1, line) for idx, line in enumerate(lines))
+        if dry_run:
+            db.session.rollback()
+            print(f"🔍 DAT dry run: {importer.diff['new_line_count']} lines would be imported, {importer.skipped_count} skipped, {len(importer.errors)} errors")
+            return importer.result(file.filename)
+        _record_imported_file(importer, file_hash, file.filename)
         db.session.commit()
+        print(f"✅ DAT import: {importer.imported_count} lines imported, {importer.skipped_count} skipped, {len(importer.errors)} errors")
         
-        # Verify customer data was saved
-        print("🔍 Verifying customer data after import...")
-        all_customers = Customer.query.all()
-        print(f"📊 Total customers in database: {len(all_customers)}")
-        for cust in all_customers:
-            print(f"   - ID: {cust.id}, CustomerID: {cust.customer_id}, Name: {cust.short_name}")
-        
-        return {
-            'imported_count': imported_count,
-            'skipped_count': skipped_count,
-            'errors': errors,
-            'summary': summary,
-            'file_path': file.filename
-        }
+        return importer.result(file.filename)
         
     except Exception as e:
         db.session.rollback()
-        errors.append(f"General error: {str(e)}")
+        errors = importer.errors + [f"General error: {str(e)}"]
         return {
             'imported_count': 0,
             'skipped_count': 0,
             'errors': errors,
-            'summary': summary,
+            'summary': importer.summary,
             'file_path': file.filename
         }
+
+def _record_imported_file(importer, file_hash, filename):
+    """
+    Remember the file hash, but only when every line was imported or already present:
+    lines skipped by the customer filter or with errors may be imported by a later upload
+    """
+    if importer.errors or importer.skipped_count != importer.duplicate_count:
+        return
+    DatImportFile.record(file_hash, filename, importer.imported_count, importer.duplicate_count)
+    db.session.commit()
+
+
+# ===== BACKGROUND IMPORT JOBS =====
+
+_import_executor = None
+_import_executor_lock = threading.Lock()
+_import_jobs_resumed = False
+# Identifies this process when claiming jobs
+_worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _get_import_executor():
+    """Bounded per-process pool for import jobs, created on first use"""
+    global _import_executor
+    with _import_executor_lock:
+        if _import_executor is None:
+            _import_executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('DAT_IMPORT_WORKERS', 2),
+                thread_name_prefix='dat-import'
+            )
+        return _import_executor
+
+
+def _stale_after():
+    return timedelta(seconds=current_app.config.get('DAT_IMPORT_JOB_STALE_SECONDS', 600))
+
+
+def create_import_job(file, selected_customer_ids, chunk_size):
+    """Persist the upload and a job row, then queue the import"""
+    import_dir = os.path.join(current_app.config.get('UPLOAD_FOLDER', 'static/uploads'), 'dat_imports')
+    os.makedirs(import_dir, exist_ok=True)
+    stored_path = os.path.join(import_dir, f"{uuid.uuid4().hex}_{secure_filename(file.filename)}")
+    file.save(stored_path)
+    
+    job = DatImportJob(
+        filename=file.filename,
+        stored_path=stored_path,
+        customer_ids=','.join(selected_customer_ids) if selected_customer_ids else None,
+        chunk_size=chunk_size,
+        status='queued',
+        errors_json='[]'
+    )
+    db.session.add(job)
+    db.session.commit()
+    _submit_import_job(job.id)
+    return job
+
+
+def _submit_import_job(job_id):
+    app = current_app._get_current_object()
+    _get_import_executor().submit(_run_import_job, app, job_id)
+
+
+def _resume_import_jobs():
+    """Queue jobs left behind by a restarted worker (each job is claimed by one process)"""
+    global _import_jobs_resumed
+    try:
+        for job_id in DatImportJob.get_resumable(_stale_after()):
+            _submit_import_job(job_id)
+        _import_jobs_resumed = True
+    except Exception as e:
+        print(f"⚠️ Could not resume DAT import jobs: {e}")
+
+
+@files_bp.before_app_request
+def _resume_import_jobs_once():
+    if not _import_jobs_resumed:
+        _resume_import_jobs()
+
+
+def _run_import_job(app, job_id):
+    """Run one import job in a pool thread, streaming from the stored upload"""
+    with app.app_context():
+        if not DatImportJob.claim(job_id, _worker_id, _stale_after()):
+            return  # Another worker owns it or it already finished
+        job = DatImportJob.query.get(job_id)
+        if not job.started_at:
+            job.started_at = datetime.utcnow()
+            db.session.commit()
+        print(f"🚀 DAT import job {job.id} started ({job.filename}, from chunk {job.last_committed_chunk + 1})")
+        
+        reported_errors = [0]
+        
+        def on_chunk(importer, progress):
+            job.lines_processed = progress['lines_processed']
+            job.imported_count = (job.imported_count or 0) + progress['imported_count']
+            job.skipped_count = (job.skipped_count or 0) + progress['skipped_count']
+            job.duplicate_count = (job.duplicate_count or 0) + progress['duplicate_count']
+            job.add_errors(progress['errors'])
+            job.last_committed_chunk = progress['chunk']
+            job.heartbeat_at = datetime.utcnow()
+            db.session.commit()
+            reported_errors[0] = len(importer.errors)
+        
+        try:
+            with open(job.stored_path, 'rb') as stream:
+                result = import_dat_file_core(
+                    FileStorage(stream=stream, filename=job.filename),
+                    job.get_selected_customer_ids(),
+                    stream=True,
+                    chunk_size=job.chunk_size,
+                    resume_from_chunk=job.last_committed_chunk + 1,
+                    progress_callback=on_chunk
+                )
+            job.add_errors(result['errors'][reported_errors[0]:])
+            job.lines_processed = result['lines_processed']
+            job.already_imported = result.get('already_imported', False)
+            job.status = 'completed' if result['completed'] else 'failed'
+        except Exception as e:
+            db.session.rollback()
+            job = DatImportJob.query.get(job_id)
+            job.add_errors([f"General error: {str(e)}"])
+            job.status = 'failed'
+        
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        if job.status == 'completed':
+            try:
+                os.remove(job.stored_path)
+            except OSError:
+                pass
+        print(f"✅ DAT import job {job.id} {job.status}: {job.imported_count} imported, {job.skipped_count} skipped, {job.error_count} errors")
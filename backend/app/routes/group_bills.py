@@ -4,6 +4,12 @@ from app.models.stitching import StitchingInvoice
 from app.models.packing_list import PackingList, PackingListLine
 from app.models.customer import Customer
 from app.models.serial_counter import SerialCounter
+from app.services.pdf_render_service import (
+    pdf_cache_key, submit_render, discard_renders, pdf_download_response
+)
+from app.utils.pagination import (
+    InvalidCursor, get_pagination_args, apply_keyset, keyset_page
+)
 from datetime import datetime, date
 import json
 import os
@@ -23,15 +29,24 @@ def _parse_multi_value(param):
     return [v.strip() for v in str(param).split(',') if v.strip()]
 
 
+def _group_member_ids(group_id):
+    """Subquery of the stitching record ids in a group bill"""
+    return db.select(StitchingInvoiceGroupLine.stitching_invoice_id).where(
+        StitchingInvoiceGroupLine.group_id == group_id
+    )
+
+
 @group_bills_bp.route('/', methods=['GET'])
 def get_group_bills():
-    """Get all group bills with optional filters. Supports server-side pagination (limit/offset)."""
+    """Get all group bills with optional filters. Supports server-side pagination (limit/offset,
+    or keyset pagination with cursor ordered by (created_at, id))."""
     try:
         customer = request.args.get('customer')
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
         limit = min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
         offset = max(0, int(request.args.get('offset', 0)))
+        cursor_mode, cursor_key, include_total = get_pagination_args(request.args)
 
         query = StitchingInvoiceGroup.query.join(Customer)
         vals = _parse_multi_value(customer)
@@ -51,30 +66,56 @@ def get_group_bills():
                 query = query.filter(db.func.date(StitchingInvoiceGroup.created_at) <= date_to_obj)
             except ValueError:
                 pass
-        query = query.order_by(StitchingInvoiceGroup.created_at.desc())
-        group_bills = query.all()
-        total = len(group_bills)
-        group_bills = group_bills[offset:offset + limit]
+        next_cursor = None
+        total = query.count() if not cursor_mode or include_total else None
+        page_query = query.options(db.selectinload(StitchingInvoiceGroup.customer))
+        if cursor_mode:
+            group_bills, next_cursor = keyset_page(
+                apply_keyset(page_query, StitchingInvoiceGroup.created_at, StitchingInvoiceGroup.id, cursor_key), limit,
+                lambda bill: (bill.created_at, bill.id)
+            )
+        else:
+            group_bills = page_query.order_by(
+                StitchingInvoiceGroup.created_at.desc(), StitchingInvoiceGroup.id.desc()
+            ).limit(limit).offset(offset).all()
 
+        # Totals come from the snapshot stored on each bill; stale snapshots are rebuilt here.
+        # The per-record breakdown is served by /<id>/details when a bill is expanded
         result = []
         for group_bill in group_bills:
-            group_dict = group_bill.to_dict()
-            
-            # Add detailed structure for multi-level display
-            details = get_group_bill_details(group_bill.id)
-            group_dict['details'] = details
-            
-            # FIXED: Use details totals instead of model totals to include secondary fabrics
-            group_dict['total_fabric_value'] = details.get('total_fabric_value', 0)
-            group_dict['total_stitching_value'] = details.get('total_stitching_value', 0)
-            group_dict['total_items'] = details.get('total_items', 0)
-            
+            summary = group_bill.get_summary()
+            group_dict = group_bill.to_dict(line_count=summary['line_count'])
+            group_dict['details'] = summary
+            group_dict['total_fabric_value'] = summary['total_fabric_value']
+            group_dict['total_stitching_value'] = summary['total_stitching_value']
+            group_dict['total_items'] = summary['total_items']
             result.append(group_dict)
-        return jsonify({'items': result, 'total': total})
+        db.session.commit()
+        response = {'items': result, 'total': total}
+        if cursor_mode:
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@group_bills_bp.route('/<int:group_id>/details', methods=['GET'])
+def get_group_bill_details_endpoint(group_id):
+    """Get the per-record breakdown of one group bill (loaded when its row is expanded)"""
+    try:
+        group_bill = StitchingInvoiceGroup.query.get(group_id)
+        if not group_bill:
+            return jsonify({'error': 'Group bill not found'}), 404
+        snapshot = group_bill.get_snapshot()
+        db.session.commit()
+        return jsonify(snapshot)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @group_bills_bp.route('/filter-options', methods=['GET'])
 def get_group_bills_filter_options():
     """Return distinct values for filter dropdowns (group bills and commission sales). Used for server-side loading."""
@@ -132,37 +173,42 @@ def create_group_bill():
         db.session.add(group_bill)
         db.session.flush()  # Get the group_id
         
-        # Get all stitching records from the selected packing lists
-        stitching_ids = []
-        for packing_list_id in packing_list_ids:
-            packing_list_lines = PackingListLine.query.filter_by(packing_list_id=packing_list_id).all()
-            for line in packing_list_lines:
-                if line.stitching_invoice_id:
-                    stitching_ids.append(line.stitching_invoice_id)
-        
-        # Create group lines and update stitching invoices
-        for stitching_id in stitching_ids:
-            group_line = StitchingInvoiceGroupLine(
-                group_id=group_bill.id,
-                stitching_invoice_id=stitching_id
+        # Add every stitching record on the selected packing lists with one INSERT ... SELECT
+        db.session.execute(
+            StitchingInvoiceGroupLine.__table__.insert().from_select(
+                ['group_id', 'stitching_invoice_id'],
+                db.select(db.literal(group_bill.id), PackingListLine.stitching_invoice_id).where(
+                    PackingListLine.packing_list_id.in_(packing_list_ids),
+                    PackingListLine.stitching_invoice_id.isnot(None)
+                ).distinct()
             )
-            db.session.add(group_line)
-            
-            # Update stitching invoice to mark it as grouped
-            stitching_invoice = StitchingInvoice.query.get(stitching_id)
-            if stitching_invoice:
-                stitching_invoice.billing_group_id = group_bill.id
+        )
+        
+        # Mark them as grouped with one bulk UPDATE
+        StitchingInvoice.query.filter(
+            StitchingInvoice.id.in_(_group_member_ids(group_bill.id))
+        ).update({'billing_group_id': group_bill.id}, synchronize_session=False)
+        
+        # Store the aggregates once; views and PDFs read them from the snapshot
+        db.session.flush()
+        group_bill.refresh_snapshot()
         
         db.session.commit()
         
-        # Generate PDFs
-        generate_stitching_fee_pdf(group_bill.id, apply_withholding_tax)
-        generate_fabric_used_pdf(group_bill.id)
+        # Render the PDFs in the background
+        pdf_renders = {
+            'stitching': submit_render(
+                'stitching_fee', group_bill.id, apply_withholding_tax,
+                group_bill_pdf_key(group_bill, 'stitching_fee', apply_withholding_tax)
+            ),
+            'fabric': submit_render('fabric_used', group_bill.id, False, group_bill_pdf_key(group_bill, 'fabric_used'))
+        }
         
         return jsonify({
             'success': True,
             'message': f'Group bill {group_number} created successfully',
-            'group_bill': group_bill.to_dict()
+            'group_bill': group_bill.to_dict(),
+            'pdf_renders': pdf_renders
         })
         
     except Exception as e:
@@ -179,24 +225,23 @@ def delete_group_bill(group_id):
         
         group_number = group_bill.group_number
         
-        # Get all stitching records in this group
-        stitching_ids = [line.stitching_invoice_id for line in group_bill.group_lines]
+        # Ungroup the stitching records and drop the group lines with one statement each
+        StitchingInvoice.query.filter(
+            StitchingInvoice.id.in_(_group_member_ids(group_id))
+        ).update({'billing_group_id': None}, synchronize_session=False)
+        StitchingInvoiceGroupLine.query.filter_by(group_id=group_id).delete(synchronize_session=False)
         
-        # Update stitching invoices to remove billing_group_id
-        for stitching_id in stitching_ids:
-            stitching_invoice = StitchingInvoice.query.get(stitching_id)
-            if stitching_invoice:
-                stitching_invoice.billing_group_id = None
+        # Delete group bill from database
+        db.session.delete(group_bill)
+        db.session.commit()
         
-        # Delete group bill PDF files
+        # Delete group bill PDF files (after the commit so no locks are held meanwhile)
         safe_group_number = group_number.replace('/', '_').replace('\\', '_')
         group_dir = os.path.join('group_bills', safe_group_number)
         if os.path.exists(group_dir):
             shutil.rmtree(group_dir)
-        
-        # Delete group bill from database
-        db.session.delete(group_bill)
-        db.session.commit()
+        discard_renders('stitching_fee', group_id)
+        discard_renders('fabric_used', group_id)
         
         return jsonify({
             'success': True,
@@ -209,38 +254,39 @@ def delete_group_bill(group_id):
 
 @group_bills_bp.route('/<int:group_id>/stitching-pdf', methods=['GET'])
 def get_stitching_pdf(group_id):
-    """Generate and return stitching fee PDF for a group bill"""
+    """Return the stitching fee PDF of a group bill from the PDF cache, queueing a render when its inputs changed"""
     try:
         group_bill = StitchingInvoiceGroup.query.get(group_id)
         if not group_bill:
             return jsonify({'error': 'Group bill not found'}), 404
         
-        # Generate PDF
-        pdf_path = generate_stitching_fee_pdf(group_id, request.args.get('apply_withholding_tax', 'true').lower() == 'true')
+        apply_withholding_tax = request.args.get('apply_withholding_tax', 'true').lower() == 'true'
+        pdf_key = group_bill_pdf_key(group_bill, 'stitching_fee', apply_withholding_tax)
+        db.session.commit()  # Keep the snapshot if it was rebuilt
         
-        if os.path.exists(pdf_path):
-            return send_file(pdf_path, as_attachment=True, download_name=f"{group_bill.group_number}_stitching.pdf")
-        else:
-            return jsonify({'error': 'PDF generation failed'}), 500
+        return pdf_download_response(
+            'stitching_fee', group_id, apply_withholding_tax, pdf_key,
+            f"{group_bill.group_number}_stitching.pdf"
+        )
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @group_bills_bp.route('/<int:group_id>/fabric-pdf', methods=['GET'])
 def get_fabric_pdf(group_id):
-    """Generate and return fabric used PDF for a group bill"""
+    """Return the fabric used PDF of a group bill from the PDF cache, queueing a render when its inputs changed"""
     try:
         group_bill = StitchingInvoiceGroup.query.get(group_id)
         if not group_bill:
             return jsonify({'error': 'Group bill not found'}), 404
         
-        # Generate PDF
-        pdf_path = generate_fabric_used_pdf(group_id)
+        pdf_key = group_bill_pdf_key(group_bill, 'fabric_used')
+        db.session.commit()  # Keep the snapshot if it was rebuilt
         
-        if os.path.exists(pdf_path):
-            return send_file(pdf_path, as_attachment=True, download_name=f"{group_bill.group_number}_fabric.pdf")
-        else:
-            return jsonify({'error': 'PDF generation failed'}), 500
+        return pdf_download_response(
+            'fabric_used', group_id, False, pdf_key,
+            f"{group_bill.group_number}_fabric.pdf"
+        )
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -249,61 +295,53 @@ def generate_serial_number(prefix):
     """Generate a unique serial number with the given prefix"""
     return SerialCounter.generate_serial_number(prefix)
 
-def generate_stitching_fee_pdf(group_id, apply_withholding_tax=False):
+def group_bill_pdf_key(group_bill, kind, flag=False):
+    """PDF cache key of a group bill PDF ('stitching_fee' or 'fabric_used'): its header and snapshot records"""
+    records = group_bill.get_snapshot()['individual_records']
+    inputs = {
+        'group_number': group_bill.group_number,
+        'invoice_date': group_bill.invoice_date,
+        'created_at': group_bill.created_at,
+        'customer': group_bill.customer.short_name if group_bill.customer else None,
+        'comments': group_bill.stitching_comments if kind == 'stitching_fee' else group_bill.fabric_comments,
+        'records': records
+    }
+    return pdf_cache_key(kind, flag, inputs, [record['image_id'] for record in records])
+
+def generate_stitching_fee_pdf(group_id, apply_withholding_tax=False, output_path=None):
     """Generate stitching fee PDF for a group bill with packing list style - single column layout"""
     group_bill = StitchingInvoiceGroup.query.get(group_id)
     if not group_bill:
         raise ValueError("Group bill not found")
     
-    # Get all stitching records in this group
+    # Records come from the group's stored snapshot
+    records = group_bill.get_snapshot()['individual_records']
     lines = []
-    for group_line in group_bill.group_lines:
-        stitching_invoice = group_line.stitching_invoice
-        if stitching_invoice:
-            line_data = {
-                'id': stitching_invoice.id,
-                'stitching_invoice_number': stitching_invoice.stitching_invoice_number,
-                'stitched_item': stitching_invoice.stitched_item,
-                'fabric_name': stitching_invoice.item_name,
-                'color': stitching_invoice.invoice_line.color if stitching_invoice.invoice_line else '',
-                'price': float(stitching_invoice.price or 0),
-                'total_value': float(stitching_invoice.total_value or 0),
-                'add_vat': stitching_invoice.add_vat,
-                'size_qty': stitching_invoice.get_size_qty(),
-                'image_id': stitching_invoice.image_id,
-                'packing_list_serial': None,
-                'pl_created_at': None,
-                'pl_delivery_date': None,
-                'pl_tax_invoice_number': None
-            }
-            
-            # Get packing list information
-            packing_list_line = PackingListLine.query.filter_by(stitching_invoice_id=stitching_invoice.id).first()
-            if packing_list_line and packing_list_line.packing_list:
-                line_data['packing_list_serial'] = packing_list_line.packing_list.packing_list_serial
-                line_data['pl_created_at'] = packing_list_line.packing_list.created_at
-                line_data['pl_delivery_date'] = packing_list_line.packing_list.delivery_date
-                line_data['pl_tax_invoice_number'] = packing_list_line.packing_list.tax_invoice_number
-            
-            lines.append(line_data)
-    
-    # Fetch image paths for all image_ids
-    image_map = {}
-    image_ids = [line['image_id'] for line in lines if line.get('image_id')]
-    if image_ids:
-        from app.models.image import Image
-        images = Image.query.filter(Image.id.in_(image_ids)).all()
-        for image in images:
-            image_map[image.id] = image.get_image_path_for_pdf()
-    
-    # Fetch lining fabrics for all stitching invoices in this group
     lining_fabrics = []
-    stitching_ids = [line['id'] for line in lines]
-    if stitching_ids:
-        from app.models.stitching import LiningFabric
-        lining_fabrics = LiningFabric.query.filter(
-            LiningFabric.stitching_invoice_id.in_(stitching_ids)
-        ).all()
+    for record in records:
+        lines.append({
+            'id': record['id'],
+            'stitching_invoice_number': record['stitching_invoice_number'],
+            'stitched_item': record['stitched_item'],
+            'fabric_name': record['item_name'],
+            'color': record['color'] or '',
+            'price': record['price'],
+            'total_value': record['total_value'],
+            'add_vat': record['add_vat'],
+            'size_qty': record['size_qty'],
+            'image_id': record['image_id'],
+            'secondary_fabrics': record['garment_fabrics'],
+            'packing_list_serial': record['packing_list_serial'],
+            'pl_created_at': record['pl_created_at'],
+            'pl_delivery_date': record['pl_delivery_date'],
+            'pl_tax_invoice_number': record['tax_invoice_number']
+        })
+        for lining in record['lining_fabrics']:
+            lining_fabrics.append(dict(lining, stitching_invoice_number=record['stitching_invoice_number']))
+    
+    # Fetch all images concurrently (through the shared image cache) before layout
+    from app.models.image import Image
+    image_map = Image.get_image_paths_for_pdf([line.get('image_id') for line in lines])
     
     # Create PDF with portrait orientation for single column
     pdf = FPDF('P', 'mm', 'A4')
@@ -544,14 +582,7 @@ def generate_stitching_fee_pdf(group_id, apply_withholding_tax=False):
             pdf.cell(col_widths[2] - 2, 8, fabric_text, 0, 0, 'C')
 
             # Add secondary fabrics below primary fabric but above serial (10% smaller, italic)
-            stitching = StitchingInvoice.query.get(group_line['id'])
-            secondary_fabrics = []
-            if stitching and stitching.garment_fabrics:
-                for garment_fabric in stitching.garment_fabrics:
-                    if garment_fabric.invoice_line:
-                        fabric_name = garment_fabric.invoice_line.item_name or ''
-                        if fabric_name:
-                            secondary_fabrics.append(fabric_name)
+            secondary_fabrics = [fabric['fabric_name'] for fabric in group_line['secondary_fabrics'] if fabric.get('fabric_name')]
 
             # Serial number below secondary fabrics
             serial_y = row_y + 9
@@ -580,13 +611,8 @@ def generate_stitching_fee_pdf(group_id, apply_withholding_tax=False):
             pdf.cell(col_widths[3] - 2, 8, color_text, 0, 0, 'C')
 
             # Add secondary fabric colors aligned with secondary fabric names
-            if stitching and stitching.garment_fabrics:
-                secondary_colors = []
-                for garment_fabric in stitching.garment_fabrics:
-                    if garment_fabric.invoice_line:
-                        color = garment_fabric.invoice_line.color or ''
-                        if color:
-                            secondary_colors.append(color)
+            if group_line['secondary_fabrics']:
+                secondary_colors = [fabric['color'] for fabric in group_line['secondary_fabrics'] if fabric.get('color')]
 
                 if secondary_colors:
                     pdf.set_font("Arial", 'I', 6.3)  # 10% smaller than 7, italic
@@ -805,14 +831,14 @@ def generate_stitching_fee_pdf(group_id, apply_withholding_tax=False):
             row_y = lining_start_y + 10 + (i * row_height)  # Changed from +9 to +10 for 2mm gap after header
             
             pdf.set_xy(margin + 5, row_y)
-            pdf.cell(lining_col_widths[0], 3, str(lf.stitching_invoice.stitching_invoice_number or ''), ln=0, align='C')
-            pdf.cell(lining_col_widths[1], 3, str(lf.lining_name or ''), ln=0, align='C')
-            pdf.cell(lining_col_widths[2], 3, f"{float(lf.consumption_yards or 0):.2f} yards", ln=0, align='C')
-            pdf.cell(lining_col_widths[3], 3, f"{float(lf.unit_price or 0):.2f} THB", ln=0, align='C')
-            pdf.cell(lining_col_widths[4], 3, f"{float(lf.total_cost or 0):,.2f} THB", ln=1, align='C')
+            pdf.cell(lining_col_widths[0], 3, str(lf['stitching_invoice_number'] or ''), ln=0, align='C')
+            pdf.cell(lining_col_widths[1], 3, str(lf['lining_name'] or ''), ln=0, align='C')
+            pdf.cell(lining_col_widths[2], 3, f"{float(lf['consumption_yards'] or 0):.2f} yards", ln=0, align='C')
+            pdf.cell(lining_col_widths[3], 3, f"{float(lf['unit_price'] or 0):.2f} THB", ln=0, align='C')
+            pdf.cell(lining_col_widths[4], 3, f"{float(lf['total_cost'] or 0):,.2f} THB", ln=1, align='C')
         
         # Calculate lining totals
-        lining_total = sum(float(lf.total_cost or 0) for lf in lining_fabrics)
+        lining_total = sum(float(lf['total_cost'] or 0) for lf in lining_fabrics)
         
         # Lining summary
         if lining_total > 0:
@@ -865,97 +891,68 @@ def generate_stitching_fee_pdf(group_id, apply_withholding_tax=False):
     # Footer removed as requested
     
     # Save PDF
-    safe_group_number = group_bill.group_number.replace('/', '_').replace('\\', '_')
-    group_dir = os.path.join('group_bills', safe_group_number)
-    os.makedirs(group_dir, exist_ok=True)
-    
-    pdf_path = os.path.join(group_dir, f"{group_bill.group_number}_stitching.pdf")
+    pdf_path = output_path
+    if not pdf_path:
+        safe_group_number = group_bill.group_number.replace('/', '_').replace('\\', '_')
+        group_dir = os.path.join('group_bills', safe_group_number)
+        os.makedirs(group_dir, exist_ok=True)
+        pdf_path = os.path.join(group_dir, f"{group_bill.group_number}_stitching.pdf")
     pdf.output(pdf_path)
     
     return pdf_path
 
-def generate_fabric_used_pdf(group_id):
+def generate_fabric_used_pdf(group_id, output_path=None):
     """Generate fabric used PDF for a group bill with packing list style - single column layout"""
     group_bill = StitchingInvoiceGroup.query.get(group_id)
     if not group_bill:
         raise ValueError("Group bill not found")
     
-    # Get all stitching records in this group with fabric information
+    # Records come from the group's stored snapshot
     lines = []
-    for group_line in group_bill.group_lines:
-        stitching_invoice = group_line.stitching_invoice
-        if stitching_invoice:
-            # Primary fabric from invoice line
-            if stitching_invoice.invoice_line:
-                primary_fabric = {
-                    'stitching_invoice_number': stitching_invoice.stitching_invoice_number,
-                    'stitched_item': stitching_invoice.stitched_item,
-                    'fabric_name': stitching_invoice.invoice_line.item_name,
-                    'color': stitching_invoice.invoice_line.color,
-                    'yards_consumed': float(stitching_invoice.yard_consumed or 0),
-                    'unit_price': float(stitching_invoice.invoice_line.unit_price or 0),
-                    'total_value': float(stitching_invoice.yard_consumed or 0) * float(stitching_invoice.invoice_line.unit_price or 0),
-                    'fabric_tax_invoice_number': stitching_invoice.invoice_line.invoice.tax_invoice_number if stitching_invoice.invoice_line.invoice else None,
-                    'fabric_invoice_number': stitching_invoice.invoice_line.invoice.invoice_number if stitching_invoice.invoice_line.invoice else None,
-                    'delivery_note': stitching_invoice.invoice_line.delivery_note if stitching_invoice.invoice_line else None,
-                    'packing_list_serial': None,
-                    'pl_created_at': None,
-                    'pl_delivery_date': None,
-                    'pl_tax_invoice_number': None,
-                    'image_id': stitching_invoice.image_id,
-                    'is_primary': True
-                }
-                
-                # Get packing list information
-                packing_list_line = PackingListLine.query.filter_by(stitching_invoice_id=stitching_invoice.id).first()
-                if packing_list_line and packing_list_line.packing_list:
-                    primary_fabric['packing_list_serial'] = packing_list_line.packing_list.packing_list_serial
-                    primary_fabric['pl_created_at'] = packing_list_line.packing_list.created_at
-                    primary_fabric['pl_delivery_date'] = packing_list_line.packing_list.delivery_date
-                    primary_fabric['pl_tax_invoice_number'] = packing_list_line.packing_list.tax_invoice_number
-                
-                lines.append(primary_fabric)
-            
-            # Secondary fabrics from GarmentFabric model
-            for garment_fabric in stitching_invoice.garment_fabrics:
-                if garment_fabric.invoice_line:
-                    secondary_fabric = {
-                        'stitching_invoice_number': stitching_invoice.stitching_invoice_number,
-                        'stitched_item': stitching_invoice.stitched_item,
-                        'fabric_name': garment_fabric.invoice_line.item_name,
-                        'color': garment_fabric.invoice_line.color,
-                        'yards_consumed': float(garment_fabric.consumption_yards or 0),
-                        'unit_price': float(garment_fabric.unit_price or 0),
-                        'total_value': float(garment_fabric.total_fabric_cost or 0),
-                        'fabric_tax_invoice_number': garment_fabric.invoice_line.invoice.tax_invoice_number if garment_fabric.invoice_line.invoice else None,
-                        'fabric_invoice_number': garment_fabric.invoice_line.invoice.invoice_number if garment_fabric.invoice_line.invoice else None,
-                        'delivery_note': garment_fabric.invoice_line.delivery_note if garment_fabric.invoice_line else None,
-                        'packing_list_serial': None,
-                        'pl_created_at': None,
-                        'pl_delivery_date': None,
-                        'pl_tax_invoice_number': None,
-                        'image_id': stitching_invoice.image_id,
-                        'is_primary': False
-                    }
-                    
-                    # Get packing list information
-                    packing_list_line = PackingListLine.query.filter_by(stitching_invoice_id=stitching_invoice.id).first()
-                    if packing_list_line and packing_list_line.packing_list:
-                        secondary_fabric['packing_list_serial'] = packing_list_line.packing_list.packing_list_serial
-                        secondary_fabric['pl_created_at'] = packing_list_line.packing_list.created_at
-                        secondary_fabric['pl_delivery_date'] = packing_list_line.packing_list.delivery_date
-                        secondary_fabric['pl_tax_invoice_number'] = packing_list_line.packing_list.tax_invoice_number
-                    
-                    lines.append(secondary_fabric)
-    
-    # Fetch image paths for all image_ids
-    image_map = {}
-    image_ids = [line.get('image_id') for line in lines if line.get('image_id')]
-    if image_ids:
-        from app.models.image import Image
-        images = Image.query.filter(Image.id.in_(image_ids)).all()
-        for image in images:
-            image_map[image.id] = image.get_image_path_for_pdf()
+    for record in group_bill.get_snapshot()['individual_records']:
+        packing_list_info = {
+            'packing_list_serial': record['packing_list_serial'],
+            'pl_created_at': record['pl_created_at'],
+            'pl_delivery_date': record['pl_delivery_date'],
+            'pl_tax_invoice_number': record['tax_invoice_number'],
+            'image_id': record['image_id']
+        }
+        
+        # Primary fabric from invoice line
+        if record['invoice_line_id']:
+            lines.append(dict(packing_list_info,
+                stitching_invoice_number=record['stitching_invoice_number'],
+                stitched_item=record['stitched_item'],
+                fabric_name=record['fabric_name'],
+                color=record['color'],
+                yards_consumed=record['yard_consumed'],
+                unit_price=record['fabric_unit_price'],
+                total_value=record['yard_consumed'] * record['fabric_unit_price'],
+                fabric_tax_invoice_number=record['beta_tax_invoice_number'],
+                fabric_invoice_number=record['fabric_invoice_number'],
+                delivery_note=record['delivery_note'],
+                is_primary=True
+            ))
+        
+        # Secondary fabrics from GarmentFabric model
+        for garment_fabric in record['garment_fabrics']:
+            lines.append(dict(packing_list_info,
+                stitching_invoice_number=record['stitching_invoice_number'],
+                stitched_item=record['stitched_item'],
+                fabric_name=garment_fabric['fabric_name'],
+                color=garment_fabric['color'],
+                yards_consumed=garment_fabric['consumption_yards'],
+                unit_price=garment_fabric['unit_price'],
+                total_value=garment_fabric['total_fabric_cost'],
+                fabric_tax_invoice_number=garment_fabric['beta_tax_invoice_number'],
+                fabric_invoice_number=garment_fabric['fabric_invoice_number'],
+                delivery_note=garment_fabric['delivery_note'],
+                is_primary=False
+            ))
+    
+    # Fetch all images concurrently (through the shared image cache) before layout
+    from app.models.image import Image
+    image_map = Image.get_image_paths_for_pdf([line.get('image_id') for line in lines])
     
     # Create PDF with portrait orientation for single column
     pdf = FPDF('P', 'mm', 'A4')
@@ -1301,11 +1298,12 @@ def generate_fabric_used_pdf(group_id):
     # Footer removed as requested
     
     # Save PDF
-    safe_group_number = group_bill.group_number.replace('/', '_').replace('\\', '_')
-    group_dir = os.path.join('group_bills', safe_group_number)
-    os.makedirs(group_dir, exist_ok=True)
-    
-    pdf_path = os.path.join(group_dir, f"{group_bill.group_number}_fabric.pdf")
+    pdf_path = output_path
+    if not pdf_path:
+        safe_group_number = group_bill.group_number.replace('/', '_').replace('\\', '_')
+        group_dir = os.path.join('group_bills', safe_group_number)
+        os.makedirs(group_dir, exist_ok=True)
+        pdf_path = os.path.join(group_dir, f"{group_bill.group_number}_fabric.pdf")
     pdf.output(pdf_path)
     
     return pdf_path
@@ -1341,142 +1339,11 @@ def wrap_text(text, max_width):
     
     return lines
 
-def get_group_bill_details(group_id):
-    """Get detailed structure for group bill multi-level display"""
-    try:
-        # Get the group bill
-        group_bill = StitchingInvoiceGroup.query.get(group_id)
-        if not group_bill:
-            print(f"Group bill {group_id} not found")
-            return {
-                'total_fabric_used': 0,
-                'total_fabric_value': 0,
-                'total_stitching_value': 0,
-                'total_items': 0,
-                'size_totals': {"S": 0, "M": 0, "L": 0, "XL": 0, "XXL": 0, "XXXL": 0},
-                'packing_lists': {},
-                'individual_records': []
-            }
-        
-        print(f"Found group bill {group_bill.group_number} with {len(group_bill.group_lines)} lines")
-        
-        # Get all stitching records for this group using ORM
-        records = []
-        for group_line in group_bill.group_lines:
-            stitching_invoice = group_line.stitching_invoice
-            if stitching_invoice:
-                # Get packing list information
-                packing_list_line = PackingListLine.query.filter_by(stitching_invoice_id=stitching_invoice.id).first()
-                packing_list = packing_list_line.packing_list if packing_list_line else None
-                
-                record_dict = {
-                    'id': stitching_invoice.id,
-                    'stitching_invoice_number': stitching_invoice.stitching_invoice_number,
-                    'stitched_item': stitching_invoice.stitched_item,
-                    'item_name': stitching_invoice.item_name,
-                    'color': stitching_invoice.invoice_line.color if stitching_invoice.invoice_line else None,
-                    'beta_tax_invoice_number': stitching_invoice.invoice_line.invoice.tax_invoice_number if stitching_invoice.invoice_line and stitching_invoice.invoice_line.invoice else None,
-                    'fabric_invoice_number': stitching_invoice.invoice_line.invoice.invoice_number if stitching_invoice.invoice_line and stitching_invoice.invoice_line.invoice else None,
-                    'delivery_note': stitching_invoice.invoice_line.delivery_note if stitching_invoice.invoice_line else None,
-                    'customer': stitching_invoice.invoice_line.invoice.customer.short_name if stitching_invoice.invoice_line and stitching_invoice.invoice_line.invoice and stitching_invoice.invoice_line.invoice.customer else None,
-                    'fabric_unit_price': float(stitching_invoice.invoice_line.unit_price) if stitching_invoice.invoice_line else 0,
-                    'yard_consumed': float(stitching_invoice.yard_consumed) if stitching_invoice.yard_consumed else 0,
-                    'price': float(stitching_invoice.price) if stitching_invoice.price else 0,
-                    'total_value': float(stitching_invoice.total_value) if stitching_invoice.total_value else 0,
-                    'size_qty_json': stitching_invoice.size_qty_json,
-                    'created_at': stitching_invoice.created_at,
-                    'packing_list_serial': packing_list.packing_list_serial if packing_list else None,
-                    'pl_created_at': packing_list.created_at if packing_list else None,
-                    'pl_delivery_date': packing_list.delivery_date if packing_list else None,
-                    'tax_invoice_number': packing_list.tax_invoice_number if packing_list else None,
-                    'garment_fabrics': [fabric.to_dict() for fabric in stitching_invoice.garment_fabrics],
-                    'lining_fabrics': [lining.to_dict() for lining in stitching_invoice.lining_fabrics]
-                }
-                records.append(record_dict)
-        
-        print(f"Processed {len(records)} records")
-        
-        # Group records by packing list
-        packing_lists = {}
-        total_fabric_used = 0
-        total_fabric_value = 0
-        total_stitching_value = 0
-        total_items = 0
-        size_totals = {"S": 0, "M": 0, "L": 0, "XL": 0, "XXL": 0, "XXXL": 0}
-        
-        for rec in records:
-            pl_serial = rec.get('packing_list_serial') or 'No PL'
-            if pl_serial not in packing_lists:
-                packing_lists[pl_serial] = {
-                    'fabric_used': 0,
-                    'fabric_value': 0,
-                    'stitching_value': 0,
-                    'total_items': 0,
-                    'size_totals': {"S": 0, "M": 0, "L": 0, "XL": 0, "XXL": 0, "XXXL": 0},
-                    'created_at': rec.get('pl_created_at')
-                }
-            
-            yards_consumed = rec.get('yard_consumed') or 0
-            fabric_cost = rec.get('fabric_unit_price') or 0
-            fabric_value = fabric_cost * yards_consumed
-            
-            # FIXED: Add secondary fabric values
-            secondary_fabric_value = 0
-            for garment_fabric in rec.get('garment_fabrics', []):
-                secondary_fabric_value += float(garment_fabric.get('total_fabric_cost', 0))
-            
-            record_fabric_value = fabric_value + secondary_fabric_value
-            print(f"DEBUG: Main fabric value: {fabric_value}, Secondary fabric value: {secondary_fabric_value}, Total: {record_fabric_value}")
-            print(f"DEBUG: garment_fabrics count: {len(rec.get('garment_fabrics', []))}")
-            stitching_value = rec.get('total_value') or 0
-            
-            total_fabric_used += yards_consumed
-            total_fabric_value += record_fabric_value
-            total_stitching_value += stitching_value
-            
-            packing_lists[pl_serial]['fabric_used'] += yards_consumed
-            packing_lists[pl_serial]['fabric_value'] += record_fabric_value
-            packing_lists[pl_serial]['stitching_value'] += stitching_value
-            
-            try:
-                size_qty = eval(rec.get('size_qty_json')) if rec.get('size_qty_json') else {}
-            except Exception:
-                size_qty = {}
-            
-            for sz in size_totals:
-                size_totals[sz] += size_qty.get(sz, 0)
-                packing_lists[pl_serial]['size_totals'][sz] += size_qty.get(sz, 0)
-            
-            pl_items = sum(size_qty.get(sz, 0) for sz in ["S", "M", "L", "XL", "XXL", "XXXL"])
-            total_items += pl_items
-            packing_lists[pl_serial]['total_items'] += pl_items
-        
-        return {
-            'total_fabric_used': total_fabric_used,
-            'total_fabric_value': total_fabric_value,
-            'total_stitching_value': total_stitching_value,
-            'total_items': total_items,
-            'size_totals': size_totals,
-            'packing_lists': packing_lists,
-            'individual_records': records
-        }
-        
-    except Exception as e:
-        print(f"Error getting group bill details: {e}")
-        return {
-            'total_fabric_used': 0,
-            'total_fabric_value': 0,
-            'total_stitching_value': 0,
-            'total_items': 0,
-            'size_totals': {"S": 0, "M": 0, "L": 0, "XL": 0, "XXL": 0, "XXXL": 0},
-            'packing_lists': {},
-            'individual_records': []
-        }
-
 
 @group_bills_bp.route('/commission-sales', methods=['GET'])
 def get_commission_sales():
-    """Get all commission sales. Supports server-side pagination (limit/offset)."""
+    """Get all commission sales. Supports server-side pagination (limit/offset,
+    or keyset pagination with cursor ordered by (sale_date, id))."""
     try:
         from app.models.commission_sale import CommissionSale
 
@@ -1485,6 +1352,7 @@ def get_commission_sales():
         date_to = request.args.get('date_to')
         limit = min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
         offset = max(0, int(request.args.get('offset', 0)))
+        cursor_mode, cursor_key, include_total = get_pagination_args(request.args)
 
         query = CommissionSale.query
         vals = _parse_multi_value(customer)
@@ -1504,9 +1372,17 @@ def get_commission_sales():
                 query = query.filter(CommissionSale.sale_date <= date_to_obj)
             except ValueError:
                 pass
-        commission_sales = query.order_by(CommissionSale.sale_date.desc()).all()
-        total = len(commission_sales)
-        commission_sales = commission_sales[offset:offset + limit]
+        next_cursor = None
+        if cursor_mode:
+            total = query.count() if include_total else None
+            commission_sales, next_cursor = keyset_page(
+                apply_keyset(query, CommissionSale.sale_date, CommissionSale.id, cursor_key), limit,
+                lambda sale: (sale.sale_date, sale.id)
+            )
+        else:
+            commission_sales = query.order_by(CommissionSale.sale_date.desc()).all()
+            total = len(commission_sales)
+            commission_sales = commission_sales[offset:offset + limit]
 
         result = []
         for sale in commission_sales:
@@ -1526,6 +1402,11 @@ def get_commission_sales():
                 'delivered_location': sale.delivered_location
             }
             result.append(sale_dict)
-        return jsonify({'items': result, 'total': total})
+        response = {'items': result, 'total': total}
+        if cursor_mode:
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
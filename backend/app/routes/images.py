@@ -1,11 +1,17 @@
 import os
 import shutil
-from datetime import datetime
+import hashlib
+import mimetypes
+from datetime import datetime, timezone
 from flask import Blueprint, request, jsonify, current_app
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 from extensions import db
 from app.models.image import Image
 from app.services.storage_service_factory import StorageServiceFactory
+from app.services.image_cache_service import get_cached_file, evict_cached_files
+from app.services.image_variant_service import IMAGE_SIZES, create_variants, delete_variants
+from app.services.image_dedup_service import start_dedup_job, get_dedup_status
 
 # Create Blueprint
 images_bp = Blueprint('images', __name__)
@@ -14,6 +20,9 @@ images_bp = Blueprint('images', __name__)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Served images check the image cache size at most this often per process
+IMAGE_CACHE_EVICTION_INTERVAL = 60
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and \
@@ -55,13 +64,34 @@ def upload_image():
             # Read file data
             file_data = file.read()
             
-            # Upload to S3 storage service
-            storage_result = storage_service.upload_image(file_data, storage_filename, file.content_type)
+            # The same photo uploaded again reuses the stored image (no upload, no new row)
+            content_hash = hashlib.sha256(file_data).hexdigest()
+            existing = Image.get_by_content_hash(content_hash)
+            if existing:
+                return jsonify({
+                    'success': True,
+                    'message': 'Image already uploaded',
+                    'deduplicated': True,
+                    'image_id': existing.id,
+                    'file_path': existing.file_path,
+                    'filename': existing.file_path.split('/')[-1],
+                    'size': len(file_data),
+                    'variants': existing.get_variants(),
+                    'file_url': existing.get_image_url()
+                })
+            
+            # Upload to S3 storage service, keyed by content
+            storage_result = storage_service.upload_image(file_data, storage_filename, file.content_type, content_hash=content_hash)
+            
+            # Pre-sized copies for list pages and PDFs (the original is kept as uploaded)
+            variants = create_variants(storage_service, storage_result['file_path'], file_data)
             
             # Save to database
             image = Image(
                 file_path=storage_result['file_path'],  # This is now the S3 key
-                uploaded_at=datetime.utcnow()
+                uploaded_at=datetime.utcnow(),
+                variants=','.join(variants) or None,
+                content_hash=content_hash
             )
             
             db.session.add(image)
@@ -71,10 +101,12 @@ def upload_image():
             response_data = {
                 'success': True,
                 'message': 'Image uploaded successfully',
+                'deduplicated': False,
                 'image_id': image.id,
                 'file_path': storage_result['file_path'],
                 'filename': storage_result['filename'],
                 'size': storage_result['size'],
+                'variants': variants,
                 'file_url': storage_result.get('s3_url') or storage_result.get('local_url')
             }
             
@@ -99,43 +131,78 @@ def get_image(image_id):
     except Exception as e:
         return jsonify({'error': f'Error retrieving image: {str(e)}'}), 500
 
+def _image_etag(image, file_path):
+    """Stable validator for a served file: a storage key always holds the same content"""
+    return hashlib.sha256(f"{image.id}:{file_path}".encode('utf-8')).hexdigest()[:32]
+
+def _image_not_modified(image, etag):
+    """True if the client's copy is current (If-None-Match, or If-Modified-Since without it)"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and image.uploaded_at:
+        uploaded_at = image.uploaded_at.replace(microsecond=0, tzinfo=timezone.utc)
+        return uploaded_at <= request.if_modified_since
+    return False
+
+def _cache_headers(response, image, etag):
+    response.set_etag(etag)
+    if image.uploaded_at:
+        response.last_modified = image.uploaded_at.replace(tzinfo=timezone.utc)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('IMAGE_SERVE_MAX_AGE', 30 * 24 * 3600)
+    # Thumbnails may be WebP or JPEG depending on the Accept header
+    response.vary.add('Accept')
+    return response
+
 @images_bp.route('/serve/<int:image_id>', methods=['GET'])
 def serve_image(image_id):
-    """Serve image file directly"""
+    """
+    Serve image file directly, with cache validators (S3 objects come from the shared image cache),
+    or redirect to a presigned S3 URL when S3_PRESIGNED_URLS is on.
+    ?size=thumb|pdf serves the pre-sized variant (WebP thumbnails for browsers that accept them)
+    and falls back to the original for images without variants.
+    """
     try:
-        from flask import send_file, abort
+        from flask import send_file, abort, redirect
+        
+        size = request.args.get('size', 'original')
+        if size not in IMAGE_SIZES:
+            abort(400, description=f"size must be one of {', '.join(IMAGE_SIZES)}")
         
         image = Image.query.get(image_id)
         if not image:
             abort(404)
         
-        # Get storage service
+        webp = 'image/webp' in request.accept_mimetypes.values()
+        file_path = Image.variant_file_path(image.file_path, image.variants, size, webp=webp)
+        
+        # Answer revalidations before touching storage
+        etag = _image_etag(image, file_path)
+        if _image_not_modified(image, etag):
+            return _cache_headers(current_app.response_class(status=304), image, etag)
+        
         storage_service = StorageServiceFactory.get_storage_service()
+        if getattr(storage_service, 'presigned_urls', False):
+            # Redirect mode: the client fetches the object from S3
+            response = redirect(storage_service.generate_presigned_url(file_path), 302)
+            response.cache_control.private = True
+            response.cache_control.max_age = storage_service.presigned_url_expires // 4
+            response.vary.add('Accept')
+            return response
         
-        # For local storage, serve directly from file system
-        if hasattr(storage_service, 'base_path'):
-            # Local storage service
-            file_path = storage_service.base_path / image.file_path
-            if file_path.exists():
-                return send_file(str(file_path), mimetype='image/jpeg')
-            else:
-                abort(404)
-        
-        # For S3 storage, download to temp and serve
-        else:
-            import tempfile
-            import os
-            
-            # Create temporary file
-            temp_dir = tempfile.gettempdir()
-            temp_file_path = os.path.join(temp_dir, f"temp_image_{image_id}_{os.path.basename(image.file_path)}")
-            
-            # Download from S3 to temp location
-            if storage_service.download_file(image.file_path, temp_file_path):
-                return send_file(temp_file_path, mimetype='image/jpeg')
-            else:
-                abort(404)
+        local_path = get_cached_file(storage_service, file_path)
+        if not local_path:
+            abort(404)
+        if not hasattr(storage_service, 'base_path'):
+            evict_cached_files(min_interval=IMAGE_CACHE_EVICTION_INTERVAL)
+        
+        mimetype = mimetypes.guess_type(file_path)[0] or 'image/jpeg'
+        response = send_file(local_path, mimetype=mimetype, etag=False, conditional=False)
+        return _cache_headers(response, image, etag)
                 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error serving image {image_id}: {e}")
         abort(500)
@@ -148,22 +215,44 @@ def delete_image(image_id):
         if not image:
             return jsonify({'error': 'Image not found'}), 404
         
-        # Delete from storage service
-        try:
-            storage_service = StorageServiceFactory.get_storage_service()
-            storage_service.delete_file(image.file_path)  # file_path is now storage key
-        except Exception as e:
-            print(f"Error deleting from storage: {e}")
+        # Identical uploads share one image, so it may still be in use
+        if image.stitching_invoices:
+            return jsonify({'error': f'Image is used by {len(image.stitching_invoices)} stitching records'}), 409
+        
+        file_path, variants = image.file_path, image.get_variants()
+        file_shared = Image.is_file_shared(file_path, image.id)
         
         # Delete from database
         db.session.delete(image)
         db.session.commit()
         
+        # Delete from storage service, unless another image row still points at the object
+        if not file_shared:
+            try:
+                storage_service = StorageServiceFactory.get_storage_service()
+                storage_service.delete_file(file_path)  # file_path is now storage key
+                delete_variants(storage_service, file_path, variants)
+            except Exception as e:
+                print(f"Error deleting from storage: {e}")
+        
         return jsonify({'success': True, 'message': 'Image deleted successfully'})
         
     except Exception as e:
         return jsonify({'error': f'Error deleting image: {str(e)}'}), 500
 
+@images_bp.route('/dedup', methods=['POST'])
+def start_image_dedup():
+    """Start the background job merging images with identical content; poll GET /dedup"""
+    try:
+        return jsonify(start_dedup_job()), 202
+    except Exception as e:
+        return jsonify({'error': f'Error starting image dedup: {str(e)}'}), 500
+
+@images_bp.route('/dedup', methods=['GET'])
+def get_image_dedup():
+    """Progress of the image merge job started by this worker"""
+    return jsonify(get_dedup_status())
+
 @images_bp.route('/list', methods=['GET'])
 def list_files():
     """List all files in storage"""
@@ -188,8 +277,9 @@ def storage_status():
         storage_service = StorageServiceFactory.get_storage_service()
         
         status = {
-            'available': storage_service.is_available(),
+            'available': storage_info['s3_available'] if storage_info['selected_service'] == 'S3' else storage_info['local_available'],
             'service_type': storage_info['selected_service'],
+            'checked_at': storage_info['checked_at'],
             's3_configured': storage_info['s3_configured'],
             's3_available': storage_info['s3_available'],
             'local_available': storage_info['local_available'],
@@ -3,8 +3,13 @@ from app.models.invoice import Invoice, InvoiceLine
 from app.models.customer import Customer
 from app.models.delivery_location import DeliveryLocation
 from app.models.commission_sale import CommissionSale
+from app.models.stitching import StitchingInvoice
+from app.models.group_bill import StitchingInvoiceGroup
+from app.utils.pagination import (
+    InvalidCursor, get_pagination_args, apply_keyset, keyset_page
+)
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, contains_eager
 from sqlalchemy import or_, and_
 from datetime import datetime
 import traceback
@@ -52,7 +57,8 @@ def count_invoices():
 
 @invoices_bp.route('/', methods=['GET'])
 def get_invoices():
-    """Get all invoices with line items and customer information. Supports server-side filtering and pagination."""
+    """Get all invoices with line items and customer information. Supports server-side filtering and
+    pagination (limit/offset, or keyset pagination with cursor ordered by (invoice_date, id))."""
     try:
         # Get query parameters for filtering
         customer_filter = request.args.get('customer')
@@ -66,11 +72,12 @@ def get_invoices():
         stock_status = request.args.get('stock_status', 'inStock')
         limit = min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
         offset = max(0, int(request.args.get('offset', 0)))
+        cursor_mode, cursor_key, include_total = get_pagination_args(request.args)
 
-        # Build query
-        query = db.session.query(InvoiceLine).join(Invoice).join(Customer).options(
-            db.joinedload(InvoiceLine.commission_sales)
-        )
+        # Build query (stock status uses the stored pending_yards counter)
+        query = db.session.query(InvoiceLine).join(
+            Invoice, InvoiceLine.invoice_id == Invoice.id
+        ).join(Customer, Invoice.customer_id == Customer.id)
 
         # Multi-value filters (comma-separated): use IN; single value: ilike
         vals = _parse_multi_value(customer_filter)
@@ -130,22 +137,47 @@ def get_invoices():
             except (ValueError, IndexError):
                 pass
         
-        # Execute query
-        invoice_lines = query.all()
-
-        # Filter based on stock status (in-memory)
+        # Filter based on stock status (in SQL)
         if stock_status == 'inStock':
-            invoice_lines = [line for line in invoice_lines if (line.yards_sent or 0) > ((line.yards_consumed or 0) + sum(cs.yards_sold for cs in line.commission_sales))]
+            query = query.filter(InvoiceLine.pending_yards > 0)
         elif stock_status == 'noStock':
-            invoice_lines = [line for line in invoice_lines if (line.yards_sent or 0) <= ((line.yards_consumed or 0) + sum(cs.yards_sold for cs in line.commission_sales))]
-
-        # Format response (full list first for total count)
+            query = query.filter(InvoiceLine.pending_yards <= 0)
+
+        # Exact total from a separate COUNT query (skippable), then one page from the database
+        total = None
+        if include_total:
+            total = query.with_entities(db.func.count(InvoiceLine.id)).scalar() or 0
+        query = query.options(contains_eager(InvoiceLine.invoice).contains_eager(Invoice.customer))
+        next_cursor = None
+        if cursor_mode:
+            rows, next_cursor = keyset_page(
+                apply_keyset(query, Invoice.invoice_date, InvoiceLine.id, cursor_key), limit,
+                lambda line: (line.invoice.invoice_date, line.id)
+            )
+        else:
+            rows = query.order_by(Invoice.invoice_date.desc(), InvoiceLine.id.desc()).limit(limit).offset(offset).all()
+
+        # Commission amount and count for this page only
+        commission_totals = {}
+        line_ids = [line.id for line in rows]
+        if line_ids:
+            commission_totals = {
+                line_id: (amount, count) for line_id, amount, count in db.session.query(
+                    CommissionSale.invoice_line_id,
+                    db.func.sum(CommissionSale.commission_amount),
+                    db.func.count(CommissionSale.id)
+                ).filter(CommissionSale.invoice_line_id.in_(line_ids)).group_by(CommissionSale.invoice_line_id)
+            }
+
+        # Format response
         result = []
-        for line in invoice_lines:
+        for line in rows:
             # Use yards_sent and yards_consumed like the old Qt app
             yards_sent = line.yards_sent or line.quantity or 0
             yards_consumed = line.yards_consumed or 0
-            pending = line.pending_yards
+            pending = line.pending_yards or 0
+            line_commission_yards = line.commission_yards_total or 0
+            line_commission_amount, line_commission_count = commission_totals.get(line.id, (0, 0))
             result.append({
                 'id': line.id,
                 'invoice_id': line.invoice_id,
@@ -165,17 +197,19 @@ def get_invoices():
                 'delivered_location': line.delivered_location,
                 'yards_sent': float(yards_sent),
                 'yards_consumed': float(yards_consumed),
-                'total_used': float(yards_consumed) + sum(float(cs.yards_sold) for cs in line.commission_sales),
+                'total_used': float(yards_consumed) + float(line_commission_yards),
                 'pending_yards': float(pending),
                 'total_value': float(yards_sent * (line.unit_price or 0)),
-                'total_commission_yards': sum(float(cs.yards_sold) for cs in line.commission_sales),
-                'total_commission_amount': sum(float(cs.commission_amount) for cs in line.commission_sales),
-                'commission_sales_count': len(line.commission_sales)
+                'total_commission_yards': float(line_commission_yards),
+                'total_commission_amount': float(line_commission_amount or 0),
+                'commission_sales_count': int(line_commission_count)
             })
-        total = len(result)
-        # Server-side pagination: return one page
-        result = result[offset:offset + limit]
-        return jsonify({'items': result, 'total': total})
+        response = {'items': result, 'total': total}
+        if cursor_mode:
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         if current_app.debug:
             traceback.print_exc()
@@ -188,9 +222,7 @@ def get_invoices_filter_options():
     try:
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
-        base = db.session.query(InvoiceLine).join(Invoice).join(Customer).options(
-            db.joinedload(InvoiceLine.commission_sales)
-        )
+        base = db.session.query(InvoiceLine).join(Invoice).join(Customer)
         if date_from:
             try:
                 s = date_from.strip()
@@ -277,7 +309,9 @@ def create_invoice_line():
             delivery_note=data.get('delivery_note', ''),
             delivered_location=data.get('delivered_location', ''),
             yards_sent=float(data['quantity']),
-            yards_consumed=0.0
+            yards_consumed=0.0,
+            commission_yards_total=0.0,
+            pending_yards=float(data['quantity'])
         )
         
         db.session.add(invoice_line)
@@ -317,6 +351,11 @@ def update_invoice_line(line_id):
             invoice_line.unit_price = data['unit_price']
         if 'delivered_location' in data:
             invoice_line.delivered_location = data['delivered_location']
+        invoice_line.refresh_pending_yards()
+        if 'unit_price' in data:
+            # Main fabric cost of garments made from this line depends on its price
+            StitchingInvoice.refresh_costs_for_invoice_line(invoice_line.id)
+        StitchingInvoiceGroup.invalidate_snapshots_for_invoice_lines([invoice_line.id])
         
         # Update invoice total
         invoice = invoice_line.invoice
@@ -344,6 +383,7 @@ def delete_invoice_line(line_id):
     """Delete an invoice line"""
     try:
         line = InvoiceLine.query.get_or_404(line_id)
+        StitchingInvoiceGroup.invalidate_snapshots_for_invoice_lines([line.id])
         db.session.delete(line)
         db.session.commit()
         return {'message': 'Invoice line deleted successfully'}, 200
@@ -363,6 +403,7 @@ def delete_multiple_invoice_lines():
             return {'error': 'No invoice lines selected'}, 400
         
         # Delete all selected lines
+        StitchingInvoiceGroup.invalidate_snapshots_for_invoice_lines(line_ids)
         deleted_count = InvoiceLine.query.filter(
             InvoiceLine.id.in_(line_ids)
         ).delete(synchronize_session=False)
@@ -489,6 +530,12 @@ def assign_tax_invoice_number():
         if not base_invoice_number:
             return {'error': 'Base invoice number is required'}, 400
         
+        # Group bill snapshots show the fabric tax invoice numbers
+        invoice_ids = [row[0] for row in db.session.query(Invoice.id).filter(
+            Invoice.invoice_number.like(f"{base_invoice_number}%")
+        ).all()]
+        StitchingInvoiceGroup.invalidate_snapshots_for_invoices(invoice_ids)
+        
         # If user entered "0", clear the tax invoice number (set to NULL)
         if tax_invoice_number == "0":
             result = db.session.execute(
@@ -714,13 +761,15 @@ def delete_commission_sale():
         
         commission_yards = commission_sale.yards_sold or 0
         invoice_line = commission_sale.invoice_line
+        if invoice_line:
+            invoice_line.add_commission_yards(-commission_yards)
         
         db.session.delete(commission_sale)
         db.session.commit()
         
         return {
             'message': f'Commission sale deleted successfully. Reverted {commission_yards} yards.',
-            'remaining_pending': float(invoice_line.pending_yards)
+            'remaining_pending': float(invoice_line.pending_yards) if invoice_line else 0
         }, 200
         
     except Exception as e:
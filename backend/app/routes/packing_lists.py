@@ -5,6 +5,13 @@ from app.models.invoice import InvoiceLine, Invoice
 from app.models.customer import Customer
 from app.models.serial_counter import SerialCounter
 from app.models.image import Image
+from app.models.group_bill import StitchingInvoiceGroup, StitchingInvoiceGroupLine
+from app.services.pdf_render_service import (
+    pdf_cache_key, submit_render, discard_renders, pdf_download_response
+)
+from app.utils.pagination import (
+    InvalidCursor, get_pagination_args, apply_keyset, keyset_page
+)
 from datetime import datetime, date
 import json
 import os
@@ -26,7 +33,10 @@ def _parse_multi_value(param):
 
 @packing_lists_bp.route('/', methods=['GET'])
 def get_packing_lists():
-    """Get all packing lists with optional filters. Supports server-side pagination (limit/offset)."""
+    """Get all packing lists with optional filters. Supports server-side pagination (limit/offset,
+    or keyset pagination with cursor ordered by (created_at, id)). Lines are only embedded with
+    include_lines=true; otherwise load them per list from /<id>/lines. first_line carries the
+    first line's fields the list page sorts on."""
     try:
         pl_serial = request.args.get('pl_serial')
         stitch_serial = request.args.get('stitch_serial')
@@ -40,6 +50,8 @@ def get_packing_lists():
         billing_status = request.args.get('billing_status', 'all')
         limit = min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
         offset = max(0, int(request.args.get('offset', 0)))
+        cursor_mode, cursor_key, include_total = get_pagination_args(request.args)
+        include_lines = request.args.get('include_lines', 'false').lower() == 'true'
 
         query = PackingList.query.join(Customer)
 
@@ -106,70 +118,123 @@ def get_packing_lists():
                 )
             )
         
-        # Order by creation date (newest first)
-        query = query.order_by(PackingList.created_at.desc())
-        
-        packing_lists = query.distinct().all()
-        total = len(packing_lists)
-        packing_lists = packing_lists[offset:offset + limit]
+        query = query.distinct()
+        total = None
+        next_cursor = None
+        if not cursor_mode or include_total:
+            total = query.count()
+        
+        # to_dict needs every line's billing group for group_bill_number and line_count,
+        # and first_line the first line's fabric invoice
+        line_stitching = db.selectinload(PackingList.packing_list_lines).selectinload(PackingListLine.stitching_invoice)
+        page_query = query.options(
+            db.selectinload(PackingList.customer),
+            line_stitching.selectinload(StitchingInvoice.billing_group),
+            line_stitching.selectinload(StitchingInvoice.invoice_line).selectinload(InvoiceLine.invoice)
+        )
+        if include_lines:
+            page_query = page_query.options(*_line_load_options(PackingList.packing_list_lines))
+        if cursor_mode:
+            packing_lists, next_cursor = keyset_page(
+                apply_keyset(page_query, PackingList.created_at, PackingList.id, cursor_key), limit,
+                lambda pl: (pl.created_at, pl.id)
+            )
+        else:
+            # Order by creation date (newest first)
+            packing_lists = page_query.order_by(
+                PackingList.created_at.desc(), PackingList.id.desc()
+            ).limit(limit).offset(offset).all()
 
         result = []
         for pl in packing_lists:
             pl_dict = pl.to_dict()
-            
-            # Get detailed packing list lines
-            lines = []
-            for line in pl.packing_list_lines:
-                line_dict = line.to_dict()
-                
-                # Add additional data for treeview display
-                if line.stitching_invoice:
-                    stitching = line.stitching_invoice
-                    
-                    # Add garment fabrics and lining fabrics
-                    line_dict['garment_fabrics'] = [fabric.to_dict() for fabric in stitching.garment_fabrics]
-                    line_dict['lining_fabrics'] = [lining.to_dict() for lining in stitching.lining_fabrics]
-                    
-                    # Calculate garment cost per piece
-                    size_qty = stitching.get_size_qty()
-                    total_qty = sum(size_qty.values())
-                    
-                    if total_qty > 0:
-                        # Main fabric cost
-                        main_fabric_cost = 0
-                        if stitching.yard_consumed and stitching.invoice_line and stitching.invoice_line.unit_price:
-                            main_fabric_cost = float(stitching.yard_consumed) * float(stitching.invoice_line.unit_price)
-                        
-                        # Multi-fabric costs
-                        multi_fabric_cost = sum(float(fabric.total_fabric_cost or 0) for fabric in stitching.garment_fabrics)
-                        
-                        # Lining costs
-                        lining_cost = sum(float(lining.total_cost or 0) for lining in stitching.lining_fabrics)
-                        
-                        # Total fabric cost
-                        total_fabric_cost = main_fabric_cost + multi_fabric_cost + lining_cost
-                        fabric_cost_per_garment = total_fabric_cost / total_qty
-                        
-                        # Sewing cost with VAT if applicable
-                        sewing_price = float(stitching.price or 0)
-                        if stitching.add_vat:
-                            sewing_cost_per_garment = sewing_price * 1.07
-                        else:
-                            sewing_cost_per_garment = sewing_price
-                        
-                        line_dict['garment_cost_per_piece'] = fabric_cost_per_garment + sewing_cost_per_garment
-                    else:
-                        line_dict['garment_cost_per_piece'] = 0
-                
-                lines.append(line_dict)
-            
-            pl_dict['lines'] = lines
+            pl_dict['first_line'] = _first_line_summary(pl)
+            # Lines are fetched per list from /<id>/lines unless include_lines=true
+            if include_lines:
+                pl_dict['lines'] = [_line_detail_dict(line) for line in pl.packing_list_lines]
             result.append(pl_dict)
-        return jsonify({'items': result, 'total': total})
+        response = {'items': result, 'total': total}
+        if cursor_mode:
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@packing_lists_bp.route('/<int:packing_list_id>/lines', methods=['GET'])
+def get_packing_list_lines(packing_list_id):
+    """Get the lines of one packing list with fabric, lining and garment cost details"""
+    try:
+        if not db.session.query(PackingList.id).filter(PackingList.id == packing_list_id).first():
+            return jsonify({'error': 'Packing list not found'}), 404
+        
+        lines = PackingListLine.query.filter(
+            PackingListLine.packing_list_id == packing_list_id
+        ).options(
+            db.selectinload(PackingListLine.packing_list).selectinload(PackingList.customer),
+            db.selectinload(PackingListLine.stitching_invoice).selectinload(StitchingInvoice.billing_group),
+            *_line_load_options()
+        ).order_by(PackingListLine.id).all()
+        
+        items = [_line_detail_dict(line) for line in lines]
+        return jsonify({'items': items, 'total': len(items)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def _line_load_options(lines_attr=None):
+    """Eager-load options for everything _line_detail_dict reads, optionally below a lines relationship"""
+    stitching = db.selectinload(lines_attr).selectinload(PackingListLine.stitching_invoice) if lines_attr is not None \
+        else db.selectinload(PackingListLine.stitching_invoice)
+    return [
+        stitching.selectinload(StitchingInvoice.invoice_line).selectinload(InvoiceLine.invoice),
+        stitching.selectinload(StitchingInvoice.garment_fabrics).selectinload(GarmentFabric.invoice_line).selectinload(InvoiceLine.invoice),
+        stitching.selectinload(StitchingInvoice.lining_fabrics)
+    ]
+
+
+def _first_line_summary(packing_list):
+    """Fields of the first line that the list page shows and sorts on before a list is expanded"""
+    if not packing_list.packing_list_lines:
+        return None
+    stitching = packing_list.packing_list_lines[0].stitching_invoice
+    if not stitching:
+        return None
+    invoice_line = stitching.invoice_line
+    return {
+        'stitching_invoice_number': stitching.stitching_invoice_number,
+        'stitched_item': stitching.stitched_item,
+        'fabric_name': stitching.item_name,
+        'color': invoice_line.color if invoice_line else None,
+        'fabric_invoice_number': invoice_line.invoice.invoice_number if invoice_line and invoice_line.invoice else None,
+        'delivery_note': invoice_line.delivery_note if invoice_line else None,
+        'yards_consumed': float(stitching.yard_consumed or 0),
+        'fabric_unit_price': float(invoice_line.unit_price or 0) if invoice_line else 0,
+        'size_qty_json': stitching.size_qty_json,
+        'price': float(stitching.price or 0),
+        'total_value': float(stitching.total_value or 0)
+    }
+
+
+def _line_detail_dict(line):
+    """Packing list line for the treeview: line fields, fabrics, linings and garment cost per piece"""
+    line_dict = line.to_dict()
+    
+    if line.stitching_invoice:
+        stitching = line.stitching_invoice
+        
+        # Add garment fabrics and lining fabrics
+        line_dict['garment_fabrics'] = [fabric.to_dict() for fabric in stitching.garment_fabrics]
+        line_dict['lining_fabrics'] = [lining.to_dict() for lining in stitching.lining_fabrics]
+        
+        # Stored when the record is created or amended
+        line_dict['garment_cost_per_piece'] = float(stitching.cost_per_piece or 0)
+    
+    return line_dict
+
+
 @packing_lists_bp.route('/filter-options', methods=['GET'])
 def get_packing_lists_filter_options():
     """Return distinct values for filter dropdowns. Used for server-side loading."""
@@ -248,19 +313,21 @@ def create_packing_list():
                 stitching_invoice_id=stitching_record.id
             )
             db.session.add(packing_list_line)
+        StitchingInvoiceGroup.invalidate_snapshots_for_records([record.id for record in stitching_records])
         
         # Calculate and update totals
         packing_list.calculate_totals()
         
         db.session.commit()
         
-        # Generate PDF without garment cost by default
-        pdf_path = generate_packing_list_pdf(packing_list.id, show_garment_cost=False)
+        # Render the PDF without garment cost in the background
+        _, pdf_key = packing_list_pdf_key(packing_list.id)
+        pdf_render = submit_render('packing_list', packing_list.id, False, pdf_key)
         
         return jsonify({
             'message': f'Packing list {packing_list_serial} created with {len(stitching_ids)} records and {packing_list.total_items} items',
             'packing_list': packing_list.to_dict(),
-            'pdf_path': pdf_path
+            'pdf_render': pdf_render
         })
         
     except Exception as e:
@@ -283,7 +350,7 @@ def delete_packing_list(packing_list_id):
                 stitching_records.append(line.stitching_invoice)
         
         # Remove from group bills if any
-        from app.models.group_bill import StitchingInvoiceGroupLine
+        StitchingInvoiceGroup.invalidate_snapshots_for_records([stitching.id for stitching in stitching_records])
         for stitching in stitching_records:
             # Remove from group bill lines
             StitchingInvoiceGroupLine.query.filter_by(stitching_invoice_id=stitching.id).delete()
@@ -309,6 +376,7 @@ def delete_packing_list(packing_list_id):
         # Delete packing list (cascade will handle packing_list_lines)
         db.session.delete(packing_list)
         db.session.commit()
+        discard_renders('packing_list', packing_list_id)
         
         return jsonify({
             'message': f'Packing list {packing_list.packing_list_serial} deleted successfully'
@@ -323,16 +391,18 @@ def delete_packing_list(packing_list_id):
 
 @packing_lists_bp.route('/<int:packing_list_id>/pdf', methods=['GET'])
 def get_packing_list_pdf(packing_list_id):
-    """Generate and return packing list PDF"""
+    """Return the packing list PDF from the PDF cache, queueing a render when its inputs changed"""
     try:
         show_garment_cost = request.args.get('show_cost', 'false').lower() == 'true'
         
-        pdf_path = generate_packing_list_pdf(packing_list_id, show_garment_cost=show_garment_cost)
-        
-        if not pdf_path or not os.path.exists(pdf_path):
-            return jsonify({'error': 'PDF generation failed'}), 500
+        packing_list, pdf_key = packing_list_pdf_key(packing_list_id, show_garment_cost)
+        if not packing_list:
+            return jsonify({'error': 'Packing list not found'}), 404
         
-        return send_file(pdf_path, as_attachment=True, download_name=os.path.basename(pdf_path))
+        return pdf_download_response(
+            'packing_list', packing_list_id, show_garment_cost, pdf_key,
+            packing_list_pdf_name(packing_list, show_garment_cost)
+        )
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -353,6 +423,7 @@ def assign_tax_invoice():
         
         for packing_list in packing_lists:
             packing_list.tax_invoice_number = tax_invoice_number
+        StitchingInvoiceGroup.invalidate_snapshots_for_packing_lists(packing_list_ids)
         
         db.session.commit()
         
@@ -412,16 +483,8 @@ def generate_packing_list_pdf_old(packing_list_id, show_garment_cost=False):
                 }
                 lines.append(line_data)
         
-        # Fetch image paths for all image_ids
-        image_map = {}
-        image_ids = [line['image_id'] for line in lines if line.get('image_id')]
-        if image_ids:
-            images = Image.query.filter(Image.id.in_(image_ids)).all()
-            for image in images:
-                # Use the best available image path (Google Drive preferred)
-                image_path = image.get_image_path_for_pdf()
-                if image_path:
-                    image_map[image.id] = image_path
+        # Fetch all images concurrently (through the shared image cache) before layout
+        image_map = Image.get_image_paths_for_pdf([line['image_id'] for line in lines])
         
         # Generate PDF
         pdf = FPDF('P', 'mm', 'A4')
@@ -592,11 +655,75 @@ def generate_packing_list_pdf_old(packing_list_id, show_garment_cost=False):
     except Exception as e:
         raise Exception(f"PDF generation failed: {str(e)}")
 
-def generate_packing_list_pdf(packing_list_id, show_garment_cost=False):
+def packing_list_pdf_name(packing_list, show_garment_cost=False):
+    """File name of a packing list PDF"""
+    if show_garment_cost:
+        return f"{packing_list.packing_list_serial}_with_cost.pdf"
+    return f"{packing_list.packing_list_serial}.pdf"
+
+def packing_list_pdf_key(packing_list_id, show_garment_cost=False):
+    """
+    Load a packing list with the data its PDF shows and hash that into the PDF cache key.
+    Every field generate_packing_list_pdf prints must be in inputs, or edits to it would
+    keep serving the old PDF. Returns (packing_list, key), or (None, None) if the packing
+    list does not exist.
+    """
+    packing_list = PackingList.query.filter_by(id=packing_list_id).options(
+        db.selectinload(PackingList.customer),
+        *_line_load_options(PackingList.packing_list_lines)
+    ).first()
+    if not packing_list:
+        return None, None
+    
+    lines = []
+    for line in packing_list.packing_list_lines:
+        stitching = line.stitching_invoice
+        if not stitching:
+            continue
+        invoice_line = stitching.invoice_line
+        lines.append({
+            'id': stitching.id,
+            'stitching_invoice_number': stitching.stitching_invoice_number,
+            'stitched_item': stitching.stitched_item,
+            'size_qty_json': stitching.size_qty_json,
+            'price': stitching.price,
+            'add_vat': stitching.add_vat,
+            'yard_consumed': stitching.yard_consumed,
+            'image_id': stitching.image_id,
+            'color': invoice_line.color if invoice_line else None,
+            'fabric_name': invoice_line.item_name if invoice_line else None,
+            'fabric_unit_price': invoice_line.unit_price if invoice_line else None,
+            'costs': [
+                stitching.main_fabric_cost, stitching.total_fabric_cost, stitching.total_lining_cost,
+                stitching.sewing_cost_per_piece, stitching.cost_per_piece
+            ],
+            'garment_fabrics': [
+                [fabric.invoice_line.item_name if fabric.invoice_line else None,
+                 fabric.invoice_line.color if fabric.invoice_line else None,
+                 fabric.consumption_yards, fabric.unit_price, fabric.total_fabric_cost]
+                for fabric in stitching.garment_fabrics
+            ],
+            'lining_fabrics': [
+                [lining.lining_name, lining.consumption_yards, lining.unit_price, lining.total_cost]
+                for lining in stitching.lining_fabrics
+            ]
+        })
+    inputs = {
+        'packing_list_serial': packing_list.packing_list_serial,
+        'customer': packing_list.customer.short_name if packing_list.customer else None,
+        'comments': packing_list.comments,
+        'lines': lines
+    }
+    key = pdf_cache_key('packing_list', show_garment_cost, inputs, [line['image_id'] for line in lines])
+    return packing_list, key
+
+def generate_packing_list_pdf(packing_list_id, show_garment_cost=False, output_path=None):
     """Generate PDF for packing list - APPLE MINIMAL BLACK & WHITE 2-COLUMN DESIGN"""
     try:
-        # Get packing list details
-        packing_list = PackingList.query.get(packing_list_id)
+        # Get packing list details, with everything the rows and cost breakdowns read
+        packing_list = PackingList.query.filter_by(id=packing_list_id).options(
+            *_line_load_options(PackingList.packing_list_lines)
+        ).first()
         if not packing_list:
             raise Exception("Packing list not found")
         
@@ -620,15 +747,8 @@ def generate_packing_list_pdf(packing_list_id, show_garment_cost=False):
                 }
                 lines.append(line_data)
         
-        # Fetch image paths for all image_ids
-        image_map = {}
-        image_ids = [line['image_id'] for line in lines if line.get('image_id')]
-        if image_ids:
-            images = Image.query.filter(Image.id.in_(image_ids)).all()
-            for image in images:
-                image_path = image.get_image_path_for_pdf()
-                if image_path:
-                    image_map[image.id] = image_path
+        # Fetch all images concurrently (through the shared image cache) before layout
+        image_map = Image.get_image_paths_for_pdf([line['image_id'] for line in lines])
         
         # Generate PDF in LANDSCAPE for 2-column layout
         pdf = FPDF('L', 'mm', 'A4')
@@ -944,13 +1064,12 @@ def generate_packing_list_pdf(packing_list_id, show_garment_cost=False):
             # Footer removed as requested
         
         # Save PDF
-        safe_serial = packing_list.packing_list_serial.replace('/', '_')
-        dir_path = os.path.join('packing_lists', safe_serial)
-        os.makedirs(dir_path, exist_ok=True)
-        pdf_name = f"{packing_list.packing_list_serial}.pdf"
-        if show_garment_cost:
-            pdf_name = f"{packing_list.packing_list_serial}_with_cost.pdf"
-        out_path = os.path.join(dir_path, pdf_name)
+        out_path = output_path
+        if not out_path:
+            safe_serial = packing_list.packing_list_serial.replace('/', '_')
+            dir_path = os.path.join('packing_lists', safe_serial)
+            os.makedirs(dir_path, exist_ok=True)
+            out_path = os.path.join(dir_path, packing_list_pdf_name(packing_list, show_garment_cost))
         pdf.output(out_path)
         
         return out_path
@@ -959,35 +1078,11 @@ def generate_packing_list_pdf(packing_list_id, show_garment_cost=False):
         raise Exception(f"PDF generation failed: {str(e)}")
 
 def calculate_garment_cost_per_piece(line, total_qty):
-    """Calculate garment cost per piece including all fabrics and sewing"""
-    # Main fabric cost
-    main_fabric_cost = 0
-    if line.get('yard_consumed') and line.get('fabric_unit_price'):
-        main_fabric_cost = float(line['yard_consumed']) * float(line['fabric_unit_price'])
-    
-    # Get multi-fabric costs
-    multi_fabric_cost = 0
+    """Garment cost per piece (all fabrics and sewing) from the stored cost components"""
     stitching = StitchingInvoice.query.get(line['id'])
-    if stitching:
-        multi_fabric_cost = sum(float(fabric.total_fabric_cost or 0) for fabric in stitching.garment_fabrics)
-        
-        # Get lining costs
-        lining_cost = sum(float(lining.total_cost or 0) for lining in stitching.lining_fabrics)
-    else:
-        lining_cost = 0
-    
-    # Total fabric cost
-    total_fabric_cost = main_fabric_cost + multi_fabric_cost + lining_cost
-    fabric_cost_per_garment = total_fabric_cost / total_qty
-    
-    # Sewing cost with VAT if applicable
-    sewing_price = float(line.get('price', 0))
-    if line.get('add_vat'):
-        sewing_cost_per_garment = sewing_price * 1.07
-    else:
-        sewing_cost_per_garment = sewing_price
-    
-    return fabric_cost_per_garment + sewing_cost_per_garment
+    if not stitching:
+        return 0
+    return stitching.cost_breakdown(total_qty)['cost_per_piece']
 
 def add_cost_breakdown_to_pdf(pdf, line, total_qty):
     """Add detailed cost breakdown to PDF"""
@@ -995,39 +1090,17 @@ def add_cost_breakdown_to_pdf(pdf, line, total_qty):
     if not stitching:
         return
     
-    # Get all fabric costs
+    # Stored cost components (see StitchingInvoice.refresh_costs)
+    costs = stitching.cost_breakdown(total_qty)
     main_fabric_used = float(line.get('yard_consumed', 0))
     main_fabric_price = float(line.get('fabric_unit_price', 0))
-    main_fabric_cost = main_fabric_used * main_fabric_price
-    
-    # Get multi-fabric costs
-    multi_fabric_cost = 0
-    multi_fabrics_list = []
-    for fabric in stitching.garment_fabrics:
-        multi_fabric_cost += float(fabric.total_fabric_cost or 0)
-        multi_fabrics_list.append(fabric)
-    
-    # Get lining fabric costs
-    lining_cost = 0
-    lining_fabrics_list = []
-    for lining in stitching.lining_fabrics:
-        lining_cost += float(lining.total_cost or 0)
-        lining_fabrics_list.append(lining)
+    main_fabric_cost = costs['main_fabric_cost']
+    multi_fabrics_list = stitching.garment_fabrics
+    lining_fabrics_list = stitching.lining_fabrics
     
-    # Calculate total fabric cost
-    total_fabric_cost = main_fabric_cost + multi_fabric_cost + lining_cost
-    fabric_cost_per_garment = total_fabric_cost / total_qty
-    
-    # Calculate sewing cost with VAT if applicable
+    fabric_cost_per_garment = costs['fabric_cost_per_piece']
     sewing_price = float(line.get('price', 0))
-    if line.get('add_vat'):
-        base_sewing_cost = sewing_price
-        vat_amount = base_sewing_cost * 0.07
-        sewing_cost_per_garment = base_sewing_cost + vat_amount
-    else:
-        sewing_cost_per_garment = sewing_price
-    
-    total_cost_per_garment = fabric_cost_per_garment + sewing_cost_per_garment
+    total_cost_per_garment = costs['cost_per_piece']
     
     thb_str = "THB "
     thb = thb_str
@@ -1087,39 +1160,16 @@ def add_cost_breakdown_modern(pdf, line, total_qty, start_y):
     if not stitching:
         return
     
-    # Get all fabric costs
+    # Stored cost components (see StitchingInvoice.refresh_costs)
+    costs = stitching.cost_breakdown(total_qty)
     main_fabric_used = float(line.get('yard_consumed', 0))
     main_fabric_price = float(line.get('fabric_unit_price', 0))
-    main_fabric_cost = main_fabric_used * main_fabric_price
-    
-    # Get multi-fabric costs
-    multi_fabric_cost = 0
-    multi_fabrics_list = []
-    for fabric in stitching.garment_fabrics:
-        multi_fabric_cost += float(fabric.total_fabric_cost or 0)
-        multi_fabrics_list.append(fabric)
-    
-    # Get lining fabric costs
-    lining_cost = 0
-    lining_fabrics_list = []
-    for lining in stitching.lining_fabrics:
-        lining_cost += float(lining.total_cost or 0)
-        lining_fabrics_list.append(lining)
-    
-    # Calculate total fabric cost
-    total_fabric_cost = main_fabric_cost + multi_fabric_cost + lining_cost
-    fabric_cost_per_garment = total_fabric_cost / total_qty
-    
-    # Calculate sewing cost with VAT if applicable
-    sewing_price = float(line.get('price', 0))
-    if line.get('add_vat'):
-        base_sewing_cost = sewing_price
-        vat_amount = base_sewing_cost * 0.07
-        sewing_cost_per_garment = base_sewing_cost + vat_amount
-    else:
-        sewing_cost_per_garment = sewing_price
+    multi_fabrics_list = stitching.garment_fabrics
+    lining_fabrics_list = stitching.lining_fabrics
     
-    total_cost_per_garment = fabric_cost_per_garment + sewing_cost_per_garment
+    fabric_cost_per_garment = costs['fabric_cost_per_piece']
+    sewing_cost_per_garment = costs['sewing_cost_per_piece']
+    total_cost_per_garment = costs['cost_per_piece']
     
     # Modern cost breakdown card
     pdf.set_fill_color(248, 249, 250)  # Very light gray
@@ -1210,39 +1260,15 @@ def add_cost_breakdown_apple_right(pdf, line, total_qty, row_y, page_width):
         if not stitching:
             return
         
-        # Get all fabric costs
+        # Stored cost components (see StitchingInvoice.refresh_costs)
+        costs = stitching.cost_breakdown(total_qty)
         main_fabric_used = float(line.get('yard_consumed', 0))
         main_fabric_price = float(line.get('fabric_unit_price', 0))
-        main_fabric_cost = main_fabric_used * main_fabric_price
-        
-        # Get multi-fabric costs
-        multi_fabric_cost = 0
-        multi_fabrics_list = []
-        for fabric in stitching.garment_fabrics:
-            multi_fabric_cost += float(fabric.total_fabric_cost or 0)
-            multi_fabrics_list.append(fabric)
-        
-        # Get lining fabric costs
-        lining_cost = 0
-        lining_fabrics_list = []
-        for lining in stitching.lining_fabrics:
-            lining_cost += float(lining.total_cost or 0)
-            lining_fabrics_list.append(lining)
-        
-        # Calculate total fabric cost
-        total_fabric_cost = main_fabric_cost + multi_fabric_cost + lining_cost
-        fabric_cost_per_garment = total_fabric_cost / total_qty
-        
-        # Calculate sewing cost with VAT if applicable
-        sewing_price = float(line.get('price', 0))
-        if line.get('add_vat'):
-            base_sewing_cost = sewing_price
-            vat_amount = base_sewing_cost * 0.07
-            sewing_cost_per_garment = base_sewing_cost + vat_amount
-        else:
-            sewing_cost_per_garment = sewing_price
         
-        total_cost_per_garment = fabric_cost_per_garment + sewing_cost_per_garment
+        fabric_cost_per_garment = costs['fabric_cost_per_piece']
+        sewing_price = float(line.get('price', 0))
+        sewing_cost_per_garment = costs['sewing_cost_per_piece']
+        total_cost_per_garment = costs['cost_per_piece']
         
         # Apple-style cost breakdown on the right side
         apple_light_gray = (248, 248, 248)
@@ -1301,39 +1327,18 @@ def add_cost_breakdown_minimal_horizontal(pdf, line, total_qty, row_y, col_x, co
         if not stitching:
             return
         
-        # Get all fabric costs
+        # Stored cost components (see StitchingInvoice.refresh_costs)
+        costs = stitching.cost_breakdown(total_qty)
         main_fabric_used = float(line.get('yard_consumed', 0))
         main_fabric_price = float(line.get('fabric_unit_price', 0))
-        main_fabric_cost = main_fabric_used * main_fabric_price
-        
-        # Get multi-fabric costs
-        multi_fabric_cost = 0
-        multi_fabrics_list = []
-        for fabric in stitching.garment_fabrics:
-            multi_fabric_cost += float(fabric.total_fabric_cost or 0)
-            multi_fabrics_list.append(fabric)
-        
-        # Get lining fabric costs
-        lining_cost = 0
-        lining_fabrics_list = []
-        for lining in stitching.lining_fabrics:
-            lining_cost += float(lining.total_cost or 0)
-            lining_fabrics_list.append(lining)
-        
-        # Calculate total fabric cost
-        total_fabric_cost = main_fabric_cost + multi_fabric_cost + lining_cost
-        fabric_cost_per_garment = total_fabric_cost / total_qty
-        
-        # Calculate sewing cost with VAT if applicable
-        sewing_price = float(line.get('price', 0))
-        if line.get('add_vat'):
-            base_sewing_cost = sewing_price
-            vat_amount = base_sewing_cost * 0.07
-            sewing_cost_per_garment = base_sewing_cost + vat_amount
-        else:
-            sewing_cost_per_garment = sewing_price
+        main_fabric_cost = costs['main_fabric_cost']
+        multi_fabrics_list = stitching.garment_fabrics
+        lining_fabrics_list = stitching.lining_fabrics
         
-        total_cost_per_garment = fabric_cost_per_garment + sewing_cost_per_garment
+        fabric_cost_per_garment = costs['fabric_cost_per_piece']
+        sewing_price = float(line.get('price', 0))
+        sewing_cost_per_garment = costs['sewing_cost_per_piece']
+        total_cost_per_garment = costs['cost_per_piece']
         
         # Minimal horizontal cost breakdown
         light_gray = (245, 245, 245)
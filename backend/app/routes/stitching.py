@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app
-from app.models.stitching import StitchingInvoice, GarmentFabric, LiningFabric
+from app.models.stitching import StitchingInvoice, GarmentFabric, LiningFabric, sum_size_qty
 from app.models.invoice import InvoiceLine, Invoice
 from app.models.customer import Customer
 from app.models.packing_list import PackingList, PackingListLine
@@ -8,6 +8,9 @@ from app.models.serial_counter import SerialCounter
 from app.models.stitched_item import StitchedItem
 from app.models.stitching_cost import StitchingCost
 from app.models.stitching_price import StitchingPrice
+from app.utils.pagination import (
+    InvalidCursor, get_pagination_args, apply_keyset, keyset_page
+)
 from datetime import datetime
 import json
 import os
@@ -30,7 +33,8 @@ def _parse_multi_value(param):
 
 @stitching_bp.route('/', methods=['GET'])
 def get_stitching():
-    """Get all stitching records with optional filters. Supports server-side pagination (limit/offset)."""
+    """Get all stitching records with optional filters. Supports server-side pagination (limit/offset,
+    or keyset pagination with cursor ordered by (created_at, id))."""
     try:
         pl_number = request.args.get('pl_number')
         serial_number = request.args.get('serial_number')
@@ -42,8 +46,9 @@ def get_stitching():
         undelivered_only = request.args.get('undelivered_only', 'false').lower() == 'true'
         limit = min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
         offset = max(0, int(request.args.get('offset', 0)))
+        cursor_mode, cursor_key, include_total = get_pagination_args(request.args)
 
-        query = StitchingInvoice.query.options(db.joinedload(StitchingInvoice.image))
+        query = StitchingInvoice.query
 
         vals = _parse_multi_value(pl_number)
         if vals:
@@ -80,8 +85,29 @@ def get_stitching():
             query = query.filter(~StitchingInvoice.id.in_(
                 db.session.query(PackingListLine.stitching_invoice_id).filter(PackingListLine.stitching_invoice_id.isnot(None))
             ))
-        query = query.distinct().order_by(StitchingInvoice.created_at.desc())
-        stitching_records = query.all()
+        query = query.distinct()
+        total = None
+        next_cursor = None
+        if not cursor_mode or include_total:
+            total = query.count()
+        
+        # Everything to_dict and the treeview fields touch, loaded once per page
+        page_query = query.options(
+            db.selectinload(StitchingInvoice.image),
+            db.selectinload(StitchingInvoice.invoice_line).selectinload(InvoiceLine.invoice).selectinload(Invoice.customer),
+            db.selectinload(StitchingInvoice.packing_list_lines).selectinload(PackingListLine.packing_list),
+            db.selectinload(StitchingInvoice.garment_fabrics).selectinload(GarmentFabric.invoice_line).selectinload(InvoiceLine.invoice),
+            db.selectinload(StitchingInvoice.lining_fabrics)
+        )
+        if cursor_mode:
+            stitching_records, next_cursor = keyset_page(
+                apply_keyset(page_query, StitchingInvoice.created_at, StitchingInvoice.id, cursor_key), limit,
+                lambda record: (record.created_at, record.id)
+            )
+        else:
+            stitching_records = page_query.order_by(
+                StitchingInvoice.created_at.desc(), StitchingInvoice.id.desc()
+            ).limit(limit).offset(offset).all()
 
         result = []
         for record in stitching_records:
@@ -131,9 +157,12 @@ def get_stitching():
                 }
             
             result.append(record_dict)
-        total = len(result)
-        result = result[offset:offset + limit]
-        return jsonify({'items': result, 'total': total})
+        response = {'items': result, 'total': total}
+        if cursor_mode:
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -178,6 +207,8 @@ def generate_stitching_serial():
     """Generate a new stitching record serial number"""
     try:
         serial_number = SerialCounter.generate_serial_number("ST")
+        # Preview only: the reservation is released, the number is taken when the record is created
+        db.session.rollback()
         return jsonify({
             'success': True,
             'serial_number': serial_number
@@ -241,6 +272,7 @@ def create_stitching_record():
             yard_consumed=total_yard_consumed,
             stitched_item=data['stitched_item'],
             size_qty_json=json.dumps(size_qty),
+            total_qty=sum_size_qty(size_qty),
             price=price,
             total_value=total_value,
             add_vat=data['add_vat'],
@@ -254,7 +286,6 @@ def create_stitching_record():
         db.session.flush()  # Get the ID
         
         # Add lining fabrics if provided
-        lining_total_cost = 0
         if data.get('lining_fabrics'):
             for lining_data in data['lining_fabrics']:
                 lining = LiningFabric(
@@ -266,10 +297,8 @@ def create_stitching_record():
                     created_at=datetime.utcnow()
                 )
                 db.session.add(lining)
-                lining_total_cost += lining.total_cost
         
         # Add garment fabrics if provided
-        fabric_total_cost = 0
         if data.get('garment_fabrics'):
             for fabric_data in data['garment_fabrics']:
                 garment_fabric = GarmentFabric(
@@ -281,18 +310,15 @@ def create_stitching_record():
                     created_at=datetime.utcnow()
                 )
                 db.session.add(garment_fabric)
-                fabric_total_cost += garment_fabric.total_fabric_cost
                 
                 # Update the invoice line's yards_consumed
                 invoice_line = InvoiceLine.query.get(fabric_data['invoice_line_id'])
                 if invoice_line:
                     invoice_line.yards_consumed = (invoice_line.yards_consumed or 0) + fabric_data['consumption']
+                    invoice_line.refresh_pending_yards()
         
-        # Update total costs
-        if lining_total_cost > 0:
-            stitching_record.total_lining_cost = lining_total_cost
-        if fabric_total_cost > 0:
-            stitching_record.total_fabric_cost = fabric_total_cost
+        # Store fabric, lining and sewing cost components
+        stitching_record.refresh_costs()
         
         # Update fabric invoice lines (for the main selected lines)
         for line_data in selected_lines:
@@ -300,6 +326,7 @@ def create_stitching_record():
             if invoice_line:
                 consumed = line_data.get('consumed', 0)
                 invoice_line.yards_consumed = (invoice_line.yards_consumed or 0) + consumed
+                invoice_line.refresh_pending_yards()
         
         # Memorize the cost and price if provided
         # Get the invoice line to access delivery location and customer info
@@ -393,7 +420,7 @@ def amend_stitching_record(stitching_id):
         stitching_record.price = float(data.get('price', stitching_record.price))
         stitching_record.stitching_cost = float(data.get('stitching_cost', stitching_record.stitching_cost or 0))
         stitching_record.add_vat = data.get('add_vat', stitching_record.add_vat)
-        stitching_record.size_qty_json = json.dumps(data.get('size_qty', {}))
+        stitching_record.set_size_qty(data.get('size_qty', {}))
         
         # Calculate new total value
         size_qty = data.get('size_qty', {})
@@ -421,6 +448,7 @@ def amend_stitching_record(stitching_id):
             if invoice_line:
                 current_consumed = float(invoice_line.yards_consumed or 0)
                 invoice_line.yards_consumed = current_consumed + consumption_diff
+                invoice_line.refresh_pending_yards()
             
             # Update stitching record consumption
             stitching_record.yard_consumed = new_consumption
@@ -441,6 +469,7 @@ def amend_stitching_record(stitching_id):
                     if fabric_invoice_line:
                         current_consumed = float(fabric_invoice_line.yards_consumed or 0)
                         fabric_invoice_line.yards_consumed = current_consumed + consumption_diff
+                        fabric_invoice_line.refresh_pending_yards()
                 
                 # Update fabric consumption and cost
                 fabric.consumption_yards = new_consumption
@@ -455,6 +484,8 @@ def amend_stitching_record(stitching_id):
                 lining.consumption_yards = new_consumption
                 lining.total_cost = new_consumption * float(lining.unit_price or 0)
         
+        stitching_record.refresh_costs()
+        
         # Commit all changes
         db.session.commit()
         
@@ -470,6 +501,33 @@ def amend_stitching_record(stitching_id):
             pass
         return jsonify({'error': str(e)}), 500
 
+def _release_image(stitching_record):
+    """
+    Detach the image of a record being deleted, and delete the image (row and file) unless
+    another record still uses it: identical uploads share one image
+    """
+    if not stitching_record.image_id:
+        return
+    image_record = Image.query.get(stitching_record.image_id)
+    if image_record and StitchingInvoice.query.filter(
+        StitchingInvoice.image_id == image_record.id, StitchingInvoice.id != stitching_record.id
+    ).first():
+        image_record = None
+    if image_record and image_record.file_path and not Image.is_file_shared(image_record.file_path, image_record.id):
+        try:
+            if os.path.exists(image_record.file_path):
+                os.remove(image_record.file_path)
+        except Exception as e:
+            # Log warning but continue with deletion
+            print(f"Warning: Could not delete image file {image_record.file_path}: {e}")
+    
+    # Set image_id to NULL in stitching record first
+    stitching_record.image_id = None
+    
+    # Delete image database entry
+    if image_record:
+        db.session.delete(image_record)
+
 @stitching_bp.route('/<int:stitching_id>', methods=['DELETE'])
 def delete_stitching_record(stitching_id):
     """Delete a stitching record and revert fabric inventory changes"""
@@ -517,31 +575,15 @@ def delete_stitching_record(stitching_id):
             PackingListLine.query.filter_by(stitching_invoice_id=stitching_record.id).delete()
             
             # 3. Remove from stitching_invoice_group_lines
-            from app.models.group_bill import StitchingInvoiceGroupLine
+            from app.models.group_bill import StitchingInvoiceGroup, StitchingInvoiceGroupLine
+            StitchingInvoiceGroup.invalidate_snapshots_for_records([stitching_record.id])
             StitchingInvoiceGroupLine.query.filter_by(stitching_invoice_id=stitching_record.id).delete()
             
             # 4. Set billing_group_id to NULL
             stitching_record.billing_group_id = None
             
-            # 5. Delete associated image file and database entry
-            if stitching_record.image_id:
-                from app.models.image import Image
-                image_record = Image.query.get(stitching_record.image_id)
-                if image_record and image_record.file_path:
-                    try:
-                        import os
-                        if os.path.exists(image_record.file_path):
-                            os.remove(image_record.file_path)
-                    except Exception as e:
-                        # Log warning but continue with deletion
-                        print(f"Warning: Could not delete image file {image_record.file_path}: {e}")
-                
-                # Set image_id to NULL in stitching record first
-                stitching_record.image_id = None
-                
-                # Delete image database entry
-                if image_record:
-                    db.session.delete(image_record)
+            # 5. Delete associated image file and database entry (unless other records share the image)
+            _release_image(stitching_record)
             
             # 6. Revert secondary fabric consumption from garment_fabrics BEFORE deleting them
             for garment_fabric in stitching_record.garment_fabrics:
@@ -550,6 +592,7 @@ def delete_stitching_record(stitching_id):
                     if fabric_invoice_line:
                         current_consumed = float(fabric_invoice_line.yards_consumed or 0)
                         fabric_invoice_line.yards_consumed = current_consumed - float(garment_fabric.consumption_yards)
+                        fabric_invoice_line.refresh_pending_yards()
             
             # 7. Revert fabric consumed in invoice line
             if stitching_record.yard_consumed and stitching_record.invoice_line_id:
@@ -557,6 +600,7 @@ def delete_stitching_record(stitching_id):
                 if invoice_line:
                     current_consumed = float(invoice_line.yards_consumed or 0)
                     invoice_line.yards_consumed = current_consumed - float(stitching_record.yard_consumed)
+                    invoice_line.refresh_pending_yards()
             
             # 8. Delete child records (garment_fabrics and lining_fabrics) before parent
             for garment_fabric in stitching_record.garment_fabrics:
@@ -645,29 +689,15 @@ def bulk_delete_stitching_records():
                     PackingListLine.query.filter_by(stitching_invoice_id=stitching_record.id).delete()
                     
                     # 3. Remove from stitching_invoice_group_lines
-                    from app.models.group_bill import StitchingInvoiceGroupLine
+                    from app.models.group_bill import StitchingInvoiceGroup, StitchingInvoiceGroupLine
+                    StitchingInvoiceGroup.invalidate_snapshots_for_records([stitching_record.id])
                     StitchingInvoiceGroupLine.query.filter_by(stitching_invoice_id=stitching_record.id).delete()
                     
                     # 4. Set billing_group_id to NULL
                     stitching_record.billing_group_id = None
                     
-                    # 5. Delete associated image file and database entry
-                    if stitching_record.image_id:
-                        image_record = Image.query.get(stitching_record.image_id)
-                        if image_record and image_record.file_path:
-                            try:
-                                if os.path.exists(image_record.file_path):
-                                    os.remove(image_record.file_path)
-                            except Exception as e:
-                                # Log warning but continue with deletion
-                                print(f"Warning: Could not delete image file {image_record.file_path}: {e}")
-                        
-                        # Set image_id to NULL in stitching record first
-                        stitching_record.image_id = None
-                        
-                        # Delete image database entry
-                        if image_record:
-                            db.session.delete(image_record)
+                    # 5. Delete associated image file and database entry (unless other records share the image)
+                    _release_image(stitching_record)
                     
                     # 6. Revert secondary fabric consumption from garment_fabrics BEFORE deleting them
                     for garment_fabric in stitching_record.garment_fabrics:
@@ -676,6 +706,7 @@ def bulk_delete_stitching_records():
                             if fabric_invoice_line:
                                 current_consumed = float(fabric_invoice_line.yards_consumed or 0)
                                 fabric_invoice_line.yards_consumed = current_consumed - float(garment_fabric.consumption_yards)
+                                fabric_invoice_line.refresh_pending_yards()
                     
                     # 7. Revert fabric consumed in invoice line
                     if stitching_record.yard_consumed and stitching_record.invoice_line_id:
@@ -683,6 +714,7 @@ def bulk_delete_stitching_records():
                         if invoice_line:
                             current_consumed = float(invoice_line.yards_consumed or 0)
                             invoice_line.yards_consumed = current_consumed - float(stitching_record.yard_consumed)
+                            invoice_line.refresh_pending_yards()
                     
                     # 8. Delete child records (garment_fabrics and lining_fabrics) before parent
                     for garment_fabric in stitching_record.garment_fabrics:
@@ -728,7 +760,7 @@ def get_available_fabrics():
     """Get available fabrics for multi-fabric selection"""
     try:
         
-        # Get fabrics with pending yardage - FIXED: Now accounts for commission sales
+        # Get fabrics with pending yardage (stored counter already accounts for commission sales)
         query = """
             SELECT 
                 l.id,
@@ -739,19 +771,11 @@ def get_available_fabrics():
                 l.delivered_location,
                 i.invoice_number,
                 c.short_name as customer_name,
-                (l.yards_sent - COALESCE(l.yards_consumed, 0) - COALESCE(commission_yards, 0)) as pending_yards
+                l.pending_yards
             FROM invoice_lines l
             JOIN invoices i ON l.invoice_id = i.id
             JOIN customers c ON i.customer_id = c.id
-            LEFT JOIN (
-                SELECT 
-                    invoice_line_id,
-                    SUM(yards_sold) as commission_yards
-                FROM commission_sales
-                GROUP BY invoice_line_id
-            ) cs ON l.id = cs.invoice_line_id
-            WHERE (l.yards_sent - COALESCE(l.yards_consumed, 0) - COALESCE(commission_yards, 0)) > 0
-            HAVING pending_yards > 0
+            WHERE l.pending_yards > 0
             ORDER BY l.item_name, l.color
         """
         
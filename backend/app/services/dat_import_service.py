@@ -0,0 +1,520 @@
+import gzip
+import hashlib
+import io
+import zipfile
+from datetime import datetime
+from extensions import db
+from app.models.invoice import Invoice, InvoiceLine
+from app.models.customer import Customer
+from app.models.customer_id_mapping import CustomerIdMapping
+
+# Keep IN (...) lists well below MySQL packet limits when preloading
+IN_CLAUSE_BATCH = 1000
+
+# Lines per committed chunk in streaming mode
+DEFAULT_CHUNK_SIZE = 5000
+
+STREAMABLE_EXTENSIONS = ('.dat', '.dat.gz', '.zip')
+
+# Dry-run diffs list at most this many entries per section (counts are always exact)
+DIFF_LIST_LIMIT = 1000
+
+
+def _batched(values, size=IN_CLAUSE_BATCH):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _text_lines(binary_stream):
+    return io.TextIOWrapper(binary_stream, encoding='utf-8', errors='replace', newline='')
+
+
+def iter_dat_lines(file):
+    """
+    Iterate an uploaded .DAT, .DAT.GZ or ZIP (of .DAT files) line by line without
+    reading it into memory. Yields (line label, text); labels include the member
+    name for zip archives.
+    """
+    filename = (file.filename or '').lower()
+    if filename.endswith('.zip'):
+        with zipfile.ZipFile(file.stream) as archive:
+            members = sorted(name for name in archive.namelist() if name.lower().endswith('.dat'))
+            for member in members:
+                with archive.open(member) as member_stream:
+                    for idx, line in enumerate(_text_lines(member_stream)):
+                        yield f"{member}:{idx + 1}", line
+    elif filename.endswith('.gz'):
+        with gzip.GzipFile(fileobj=file.stream) as gz_stream:
+            for idx, line in enumerate(_text_lines(gz_stream)):
+                yield idx + 1, line
+    else:
+        for idx, line in enumerate(_text_lines(file.stream)):
+            yield idx + 1, line
+
+
+def hash_upload(file):
+    """SHA-256 of an uploaded file, read in blocks; the stream is rewound afterwards"""
+    digest = hashlib.sha256()
+    for block in iter(lambda: file.stream.read(1024 * 1024), b''):
+        digest.update(block)
+    file.stream.seek(0)
+    return digest.hexdigest()
+
+
+def parse_dat_line(line):
+    """
+    Parse one .DAT line (14 ';'-separated fields, like the old Qt app).
+    Returns a record dict, or raises ValueError with the reason.
+    """
+    parts = [p.strip() for p in line.split(';')]
+    if len(parts) < 14:
+        raise ValueError(f"Invalid format (expected 14 fields, got {len(parts)})")
+
+    customer_id = parts[2]
+    date_raw = parts[3]
+    item_details = parts[7]
+    fabric_amount = parts[8]
+    price_per_unit = parts[9]
+    # parts[10] (total value) is not parsed, parts[13] is unused
+
+    # .dat file has customer ID as 8-digit padded (e.g., "00000328"), users enter "328"
+    try:
+        customer_id_normalized = str(int(customer_id))
+    except ValueError:
+        customer_id_normalized = customer_id
+
+    # Parse date (YYYYMMDD)
+    invoice_date = None
+    if date_raw and len(date_raw) == 8:
+        try:
+            invoice_date = datetime.strptime(f"{date_raw[:4]}-{date_raw[4:6]}-{date_raw[6:]}", '%Y-%m-%d')
+        except Exception:
+            invoice_date = None
+
+    # Extract color and delivery note from item_details
+    details_parts = [p.strip() for p in item_details.split('/') if p.strip()]
+    color = details_parts[1] if len(details_parts) > 1 else ''
+    delivery_note = ''
+    if len(details_parts) > 2:
+        if details_parts[2] == '0' and len(details_parts) > 3:
+            delivery_note = details_parts[3]
+        else:
+            delivery_note = details_parts[2]
+
+    return {
+        'short_name': parts[1],
+        'customer_id': customer_id_normalized,
+        'invoice_date': invoice_date,
+        'invoice_number': parts[4],
+        'item_code': parts[6],
+        'item_details': item_details,
+        'fabric_amount': fabric_amount,
+        'price_per_unit': price_per_unit,
+        'color': color,
+        'delivery_note': delivery_note,
+        # Identity of the source line for idempotent re-imports
+        'fingerprint_key': '|'.join([parts[4], parts[6], item_details, fabric_amount, price_per_unit])
+    }
+
+
+class DatImportService:
+    """
+    Set-based .DAT import: parses all lines first, preloads customer ID mappings,
+    customers and existing invoices into dictionaries with a handful of queries,
+    then bulk inserts invoices and invoice lines (executemany) in one transaction.
+    import_stream applies the same per chunk for large or compressed uploads.
+    With dry_run=True nothing is written: the same lookups produce a diff instead.
+    """
+
+    def __init__(self, selected_customer_ids=None, dry_run=False):
+        self.selected_customer_ids = set(selected_customer_ids) if selected_customer_ids else None
+        self.dry_run = dry_run
+        self.errors = []
+        self.summary = []
+        self.imported_count = 0
+        self.skipped_count = 0
+        # Line-number suffix per source invoice number (INV-01, INV-02, ...)
+        self.invoice_line_counts = {}
+        # Occurrences of identical source lines, so repeated lines in one file stay distinct;
+        # keyed by a 16-byte digest of the line's fields
+        self.fingerprint_counts = {}
+        # Both counters number lines file-wide (resumed imports rebuild them by replaying), so
+        # unlike the chunks they are not freed: about 100 bytes per distinct invoice number and
+        # per distinct source line stay in memory for the whole import
+        self.duplicate_count = 0
+        self.chunks = []
+        self.lines_processed = 0
+        self.last_committed_chunk = -1
+        self.completed = False
+        # Dry run: what an import would create, and the customers/invoices it has planned so far
+        self.diff = {
+            'new_customers': [],
+            'updated_customers': [],
+            'new_invoices': [],
+            'new_lines': [],
+            'new_customer_count': 0,
+            'new_invoice_count': 0,
+            'new_line_count': 0
+        }
+        self._planned_customers = {}
+        self._planned_invoices = set()
+
+    def result(self, file_path=None):
+        result = {
+            'imported_count': self.imported_count,
+            'skipped_count': self.skipped_count,
+            'duplicate_count': self.duplicate_count,
+            'errors': self.errors,
+            'summary': self.summary,
+            'file_path': file_path
+        }
+        if self.dry_run:
+            result['dry_run'] = True
+            result['diff'] = self.diff
+        return result
+
+    def import_lines(self, lines):
+        """Import an iterable of (line_no, text) pairs. The caller commits."""
+        accepted, mappings = self._accept(self._parse(lines))
+        self._number_invoices(accepted)
+        self._fingerprint(accepted)
+        accepted = self._skip_imported(accepted)
+        if not accepted:
+            return
+        if self.dry_run:
+            self._plan(accepted)
+            return
+
+        self._resolve_customers(accepted, mappings)
+        invoice_ids = self._resolve_invoices(accepted)
+        self._insert_lines(accepted, invoice_ids)
+
+    def import_stream(self, lines, chunk_size=DEFAULT_CHUNK_SIZE, resume_from_chunk=0, progress_callback=None):
+        """
+        Import (line_no, text) pairs in chunks of chunk_size lines, committing after
+        each chunk so memory stays flat. Chunks before resume_from_chunk were
+        committed by an earlier run: they are only replayed to keep the invoice
+        number suffixes consistent. Stops at the first failing chunk; the result's
+        resume_from_chunk tells the caller where to restart.
+        """
+        self.chunks = []
+        self.lines_processed = 0
+        self.last_committed_chunk = resume_from_chunk - 1
+        chunk = []
+        chunk_index = 0
+
+        def flush(chunk_index, chunk):
+            if chunk_index < resume_from_chunk:
+                self._replay(chunk)
+                return True
+            imported_before = self.imported_count
+            skipped_before = self.skipped_count
+            duplicates_before = self.duplicate_count
+            errors_before = len(self.errors)
+            try:
+                self.import_lines(chunk)
+                if self.dry_run:
+                    db.session.rollback()
+                else:
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self.imported_count, self.skipped_count = imported_before, skipped_before
+                self.duplicate_count = duplicates_before
+                self.errors.append(f"Chunk {chunk_index}: {e}")
+                return False
+            self.last_committed_chunk = chunk_index
+            progress = {
+                'chunk': chunk_index,
+                'lines_processed': self.lines_processed,
+                'imported_count': self.imported_count - imported_before,
+                'skipped_count': self.skipped_count - skipped_before,
+                'duplicate_count': self.duplicate_count - duplicates_before,
+                'errors': self.errors[errors_before:]
+            }
+            self.chunks.append(progress)
+            print(f"📦 DAT chunk {chunk_index}: {progress['imported_count']} imported, {progress['skipped_count']} skipped, {len(progress['errors'])} errors ({self.lines_processed} lines read)")
+            if progress_callback:
+                progress_callback(self, progress)
+            return True
+
+        self.completed = False
+        for line in lines:
+            chunk.append(line)
+            self.lines_processed += 1
+            if len(chunk) >= chunk_size:
+                if not flush(chunk_index, chunk):
+                    return False
+                chunk = []
+                chunk_index += 1
+        if chunk and not flush(chunk_index, chunk):
+            return False
+        self.completed = True
+        return True
+
+    def stream_result(self, file_path=None):
+        result = self.result(file_path)
+        result.update({
+            'lines_processed': self.lines_processed,
+            'chunks': self.chunks,
+            'last_committed_chunk': self.last_committed_chunk,
+            'resume_from_chunk': self.last_committed_chunk + 1,
+            'completed': self.completed
+        })
+        return result
+
+    def _replay(self, lines):
+        """Advance the invoice number suffixes for an already committed chunk without writing"""
+        errors, skipped = list(self.errors), self.skipped_count
+        accepted, _ = self._accept(self._parse(lines))
+        self._number_invoices(accepted)
+        self._fingerprint(accepted)
+        self.errors, self.skipped_count = errors, skipped
+
+    def _fingerprint(self, records):
+        """Unique fingerprint per source line: its fields plus the occurrence of identical lines"""
+        for record in records:
+            key = record['fingerprint_key']
+            count_key = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+            occurrence = self.fingerprint_counts.get(count_key, 0) + 1
+            self.fingerprint_counts[count_key] = occurrence
+            record['fingerprint'] = hashlib.sha256(f"{key}|{occurrence}".encode('utf-8')).hexdigest()
+
+    def _skip_imported(self, records):
+        """Drop lines already imported (by this or an overlapping file) via the fingerprint index"""
+        seen = set()
+        for batch in _batched(r['fingerprint'] for r in records):
+            seen.update(row[0] for row in db.session.query(InvoiceLine.source_fingerprint).filter(
+                InvoiceLine.source_fingerprint.in_(batch)
+            ))
+        if not seen:
+            return records
+        fresh = [r for r in records if r['fingerprint'] not in seen]
+        duplicates = len(records) - len(fresh)
+        self.duplicate_count += duplicates
+        self.skipped_count += duplicates
+        return fresh
+
+    def _accept(self, records):
+        """Keep records whose customer ID is in the user's customer ID mapping table"""
+        if not records:
+            return [], {}
+        mappings = self._load_mappings({r['customer_id'] for r in records})
+        accepted = []
+        for record in records:
+            if record['customer_id'] not in mappings:
+                self.skipped_count += 1
+                continue
+            accepted.append(record)
+        return accepted, mappings
+
+    def _parse(self, lines):
+        records = []
+        for line_no, line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = parse_dat_line(line)
+            except ValueError as e:
+                self.errors.append(f"Line {line_no}: {e}")
+                continue
+
+            if self.selected_customer_ids and record['customer_id'] not in self.selected_customer_ids:
+                self.skipped_count += 1
+                continue
+
+            # Calculate total value from price x quantity (like old Qt app)
+            try:
+                record['quantity'] = float(record['fabric_amount'] or 0)
+                record['unit_price'] = float(record['price_per_unit'] or 0)
+            except (ValueError, TypeError):
+                self.errors.append(f"Line {line_no}: Could not calculate total value from fabric_amount={record['fabric_amount']}, price_per_unit={record['price_per_unit']}")
+                continue
+            record['line_no'] = line_no
+            records.append(record)
+        return records
+
+    def _load_mappings(self, customer_ids):
+        """Customer ID mappings (user-entered IDs only) keyed by customer_id"""
+        mappings = {}
+        for batch in _batched(customer_ids):
+            for mapping in CustomerIdMapping.query.filter(CustomerIdMapping.customer_id.in_(batch)).all():
+                mappings[mapping.customer_id] = mapping
+        return mappings
+
+    def _load_customers(self, records):
+        """Existing customers matching the records, keyed by customer_id and by short_name"""
+        customer_ids = {r['customer_id'] for r in records}
+        short_names = {r['short_name'] for r in records}
+        by_customer_id = {}
+        by_short_name = {}
+        for batch in _batched(customer_ids):
+            for customer in Customer.query.filter(Customer.customer_id.in_(batch)).all():
+                by_customer_id[customer.customer_id] = customer
+                by_short_name[customer.short_name] = customer
+        for batch in _batched(short_names - set(by_short_name)):
+            for customer in Customer.query.filter(Customer.short_name.in_(batch)).all():
+                by_customer_id.setdefault(customer.customer_id, customer)
+                by_short_name[customer.short_name] = customer
+        return by_customer_id, by_short_name
+
+    def _plan(self, records):
+        """Dry run: resolve customers and invoices like an import would, recording a diff instead"""
+        by_customer_id, by_short_name = self._load_customers(records)
+        for record in records:
+            key = self._planned_customers.get(record['customer_id'])
+            if key is None:
+                customer = by_customer_id.get(record['customer_id'])
+                if customer:
+                    key = customer.id
+                else:
+                    customer = by_short_name.get(record['short_name'])
+                    if customer:
+                        key = customer.id
+                        self._append_diff('updated_customers', {
+                            'id': customer.id,
+                            'short_name': customer.short_name,
+                            'old_customer_id': customer.customer_id,
+                            'new_customer_id': record['customer_id']
+                        })
+                    else:
+                        key = ('new', record['customer_id'])
+                        self.diff['new_customer_count'] += 1
+                        self._append_diff('new_customers', {
+                            'customer_id': record['customer_id'],
+                            'short_name': record['short_name']
+                        })
+                self._planned_customers[record['customer_id']] = key
+            record['invoice_key'] = (record['modified_invoice_number'], key)
+
+        existing = self._load_invoice_ids({
+            r['modified_invoice_number'] for r in records if not isinstance(r['invoice_key'][1], tuple)
+        })
+        for record in records:
+            key = record['invoice_key']
+            if key not in existing and key not in self._planned_invoices:
+                self._planned_invoices.add(key)
+                self.diff['new_invoice_count'] += 1
+                self._append_diff('new_invoices', {
+                    'invoice_number': key[0],
+                    'customer_id': record['customer_id'],
+                    'invoice_date': record['invoice_date'].strftime('%Y-%m-%d') if record['invoice_date'] else None
+                })
+            self.diff['new_line_count'] += 1
+            self._append_diff('new_lines', {
+                'line': record['line_no'],
+                'invoice_number': key[0],
+                'item_name': record['item_code'],
+                'color': record['color'],
+                'delivery_note': record['delivery_note'],
+                'yards': record['quantity'],
+                'unit_price': record['unit_price']
+            })
+
+    def _append_diff(self, section, entry):
+        if len(self.diff[section]) < DIFF_LIST_LIMIT:
+            self.diff[section].append(entry)
+
+    def _resolve_customers(self, records, mappings):
+        """Attach a Customer to every record, creating or re-keying customers like the old Qt app"""
+        by_customer_id, by_short_name = self._load_customers(records)
+
+        new_customers = []
+        for record in records:
+            customer = by_customer_id.get(record['customer_id'])
+            if not customer:
+                customer = by_short_name.get(record['short_name'])
+                if customer:
+                    # Same name but different ID: update the customer_id to match the .dat file
+                    print(f"⚠️  Found customer with same name but different ID: {customer.customer_id} vs {record['customer_id']}")
+                    by_customer_id.pop(customer.customer_id, None)
+                    customer.customer_id = record['customer_id']
+                else:
+                    customer = Customer(
+                        customer_id=record['customer_id'],
+                        short_name=record['short_name'],
+                        full_name=record['short_name'],
+                        registration_date=datetime.now(),
+                        is_active=True
+                    )
+                    db.session.add(customer)
+                    new_customers.append(customer)
+                    by_short_name[customer.short_name] = customer
+                by_customer_id[record['customer_id']] = customer
+            record['customer'] = customer
+
+            # Update customer ID mapping with short name (only if empty)
+            mapping = mappings[record['customer_id']]
+            if not mapping.short_name:
+                mapping.short_name = record['short_name']
+                mapping.updated_at = datetime.utcnow()
+
+        # One flush assigns ids to all new customers
+        db.session.flush()
+        if new_customers:
+            self.summary.append(f"Created {len(new_customers)} new customers")
+
+    def _resolve_invoices(self, records):
+        """Reuse existing invoices for the suffixed invoice numbers and bulk insert new ones"""
+        for record in records:
+            record['invoice_key'] = (record['modified_invoice_number'], record['customer'].id)
+
+        invoice_ids = self._load_invoice_ids({r['modified_invoice_number'] for r in records})
+        new_invoices = {}
+        for record in records:
+            key = record['invoice_key']
+            if key in invoice_ids or key in new_invoices:
+                continue
+            new_invoices[key] = {
+                'invoice_number': key[0],
+                'customer_id': key[1],
+                'invoice_date': record['invoice_date'],
+                'total_amount': record['quantity'] * record['unit_price'],
+                'status': 'open',
+                'tax_invoice_number': None  # Tax invoice number stays empty, not from .dat file
+            }
+
+        if new_invoices:
+            db.session.execute(Invoice.__table__.insert(), list(new_invoices.values()))
+            invoice_ids.update(self._load_invoice_ids({key[0] for key in new_invoices}))
+            self.summary.append(f"Created {len(new_invoices)} new invoices")
+        return invoice_ids
+
+    def _number_invoices(self, records):
+        """Suffix invoice numbers with their line number in the file (like old Qt app)"""
+        for record in records:
+            number = record['invoice_number']
+            self.invoice_line_counts[number] = self.invoice_line_counts.get(number, 0) + 1
+            record['modified_invoice_number'] = f"{number}-{self.invoice_line_counts[number]:02d}"
+
+    def _load_invoice_ids(self, invoice_numbers):
+        """Map (invoice_number, customer pk) to invoice id"""
+        invoice_ids = {}
+        for batch in _batched(invoice_numbers):
+            rows = db.session.query(Invoice.id, Invoice.invoice_number, Invoice.customer_id).filter(
+                Invoice.invoice_number.in_(batch)
+            ).all()
+            for invoice_id, invoice_number, customer_id in rows:
+                invoice_ids.setdefault((invoice_number, customer_id), invoice_id)
+        return invoice_ids
+
+    def _insert_lines(self, records, invoice_ids):
+        line_rows = [{
+            'invoice_id': invoice_ids[record['invoice_key']],
+            'item_name': record['item_code'],
+            'quantity': record['quantity'],
+            'unit_price': record['unit_price'],
+            'delivered_location': None,
+            'is_defective': False,
+            'color': record['color'],
+            'delivery_note': record['delivery_note'],
+            'yards_sent': record['quantity'],
+            'yards_consumed': 0.0,
+            'commission_yards_total': 0.0,
+            'pending_yards': record['quantity'],
+            'source_fingerprint': record['fingerprint']
+        } for record in records]
+        db.session.execute(InvoiceLine.__table__.insert(), line_rows)
+        self.imported_count += len(line_rows)
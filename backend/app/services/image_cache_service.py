@@ -0,0 +1,125 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+# Storage objects downloaded for PDFs and /api/images/serve are kept in IMAGE_CACHE_FOLDER,
+# named by a hash of their storage key. The folder is bounded to IMAGE_CACHE_MAX_MB: files are
+# touched when used and the least recently used ones are evicted. Downloads go to a private
+# .part file and are renamed into place, so web workers and render processes share the folder.
+
+DEFAULT_CACHE_FOLDER = os.path.join(tempfile.gettempdir(), 'goms_image_cache')
+
+_last_eviction = 0
+
+
+def _cache_folder():
+    folder = current_app.config.get('IMAGE_CACHE_FOLDER') or DEFAULT_CACHE_FOLDER
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _cache_path(folder, file_path):
+    digest = hashlib.sha256(file_path.encode('utf-8')).hexdigest()
+    return os.path.join(folder, f"{digest}{os.path.splitext(file_path)[1].lower()}")
+
+
+def _local_path(storage_service, file_path):
+    """Path of an object in local storage (no copy needed), or None for remote storage"""
+    if hasattr(storage_service, 'base_path'):
+        full_path = storage_service.base_path / file_path
+        return os.path.abspath(full_path) if full_path.exists() else None
+    return None
+
+
+def get_cached_file(storage_service, file_path, folder=None):
+    """Local path of a storage object, downloading it into the cache on a miss. None if unavailable."""
+    if not file_path:
+        return None
+    if hasattr(storage_service, 'base_path'):
+        return _local_path(storage_service, file_path)
+
+    cached_path = _cache_path(folder or _cache_folder(), file_path)
+    try:
+        os.utime(cached_path)
+        return cached_path
+    except OSError:
+        pass
+
+    partial_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        if not storage_service.download_file(file_path, partial_path):
+            return None
+        os.replace(partial_path, cached_path)
+        return cached_path
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+def evict_cached_files(folder=None, min_interval=0):
+    """
+    Remove least recently used files until the cache fits IMAGE_CACHE_MAX_MB. With min_interval,
+    skip the folder scan if this process already evicted within that many seconds.
+    """
+    global _last_eviction
+    now = time.time()
+    if min_interval and now - _last_eviction < min_interval:
+        return
+    _last_eviction = now
+    folder = folder or _cache_folder()
+    max_bytes = current_app.config.get('IMAGE_CACHE_MAX_MB', 512) * 1024 * 1024
+    entries = []
+    total = 0
+    for name in os.listdir(folder):
+        if name.endswith('.part'):
+            continue
+        try:
+            stat = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+        total += stat.st_size
+    if total <= max_bytes:
+        return
+    for _, size, name in sorted(entries):
+        try:
+            os.remove(os.path.join(folder, name))
+        except OSError:
+            continue
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+def prefetch_files(file_paths):
+    """
+    Fetch storage objects concurrently (IMAGE_PREFETCH_WORKERS threads, one storage service)
+    and return {file_path: local path or None}. Cache hits and local storage cost no download.
+    """
+    from app.services.storage_service_factory import StorageServiceFactory
+    file_paths = list(dict.fromkeys(path for path in file_paths if path))
+    if not file_paths:
+        return {}
+
+    storage_service = StorageServiceFactory.get_storage_service()
+    if hasattr(storage_service, 'base_path'):
+        return {path: _local_path(storage_service, path) for path in file_paths}
+
+    folder = _cache_folder()
+
+    def fetch(path):
+        try:
+            return get_cached_file(storage_service, path, folder)
+        except Exception as e:
+            print(f"Error fetching image {path} for PDF: {e}")
+            return None
+
+    workers = max(1, min(current_app.config.get('IMAGE_PREFETCH_WORKERS', 8), len(file_paths)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-prefetch') as executor:
+        local_paths = dict(zip(file_paths, executor.map(fetch, file_paths)))
+    evict_cached_files(folder)
+    return local_paths
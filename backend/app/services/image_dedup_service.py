@@ -0,0 +1,170 @@
+import hashlib
+import os
+import threading
+from datetime import datetime
+from flask import current_app
+from extensions import db
+
+# New uploads are stored under their content hash and reuse an existing image with the same
+# content. Images uploaded before that can hold identical photos under several rows and storage
+# objects; the merge job hashes images without a content_hash, points the stitching records at
+# one image of each duplicate set, deletes the other rows and then removes their storage
+# objects once no row refers to them. Running it again is harmless.
+
+# Images hashed per batch (downloaded concurrently through the image cache)
+HASH_BATCH_SIZE = 50
+
+_dedup_lock = threading.Lock()
+_dedup_thread = None
+# Status of the last merge job started by this process
+_dedup_status = {'status': 'idle'}
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as image_file:
+        for chunk in iter(lambda: image_file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_images(progress=None):
+    """Store content_hash for every image without one. Returns (hashed, missing from storage)."""
+    from app.models.image import Image
+    from app.services.image_cache_service import prefetch_files
+    hashed = missing = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(Image.id, Image.file_path).filter(
+            Image.content_hash.is_(None), Image.id > last_id
+        ).order_by(Image.id).limit(HASH_BATCH_SIZE).all()
+        if not rows:
+            return hashed, missing
+        last_id = rows[-1][0]
+        local_paths = prefetch_files(file_path for _, file_path in rows)
+        for image_id, file_path in rows:
+            local_path = local_paths.get(file_path)
+            if not local_path:
+                missing += 1
+                continue
+            Image.query.filter_by(id=image_id).update({'content_hash': _file_hash(local_path)}, synchronize_session=False)
+            hashed += 1
+        db.session.commit()
+        if progress:
+            progress(hashed=hashed, missing=missing)
+
+
+def merge_duplicates(progress=None):
+    """
+    Merge images with the same content_hash into the oldest one (preferring one with variants).
+    Returns (images merged, stitching records relinked, storage objects removed).
+    """
+    from app.models.image import Image
+    from app.models.stitching import StitchingInvoice
+    from app.models.group_bill import StitchingInvoiceGroup
+    from app.services.storage_service_factory import StorageServiceFactory
+    from app.services.image_variant_service import delete_variants
+
+    content_hashes = [row[0] for row in db.session.query(Image.content_hash).filter(
+        Image.content_hash.isnot(None)
+    ).group_by(Image.content_hash).having(db.func.count(Image.id) > 1)]
+
+    merged = relinked = 0
+    orphaned = {}  # storage key -> variants, of merged rows
+    for content_hash in content_hashes:
+        images = Image.query.filter_by(content_hash=content_hash).order_by(Image.id).all()
+        keeper = next((image for image in images if image.variants), images[0])
+        duplicates = [image for image in images if image.id != keeper.id]
+        duplicate_ids = [image.id for image in duplicates]
+
+        record_ids = [row[0] for row in db.session.query(StitchingInvoice.id).filter(
+            StitchingInvoice.image_id.in_(duplicate_ids)
+        )]
+        if record_ids:
+            StitchingInvoice.query.filter(StitchingInvoice.id.in_(record_ids)).update(
+                {'image_id': keeper.id}, synchronize_session=False
+            )
+            # Snapshots carry the image id
+            StitchingInvoiceGroup.invalidate_snapshots_for_records(record_ids)
+        for image in duplicates:
+            if image.file_path != keeper.file_path:
+                orphaned[image.file_path] = image.get_variants()
+        Image.query.filter(Image.id.in_(duplicate_ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+        merged += len(duplicates)
+        relinked += len(record_ids)
+        if progress:
+            progress(merged=merged, relinked=relinked)
+
+    # Storage objects go only after their rows, and only if no remaining row uses them
+    removed = 0
+    if orphaned:
+        storage_service = StorageServiceFactory.get_storage_service()
+        for file_path, variants in orphaned.items():
+            if db.session.query(Image.id).filter_by(file_path=file_path).first():
+                continue
+            storage_service.delete_file(file_path)
+            delete_variants(storage_service, file_path, variants)
+            removed += 1
+    return merged, relinked, removed
+
+
+def run_dedup(progress=None):
+    """Hash unhashed images, then merge duplicates. Returns a summary dict."""
+    hashed, missing = hash_images(progress)
+    merged, relinked, removed = merge_duplicates(progress)
+    return {
+        'hashed': hashed,
+        'missing': missing,
+        'merged': merged,
+        'relinked': relinked,
+        'removed': removed
+    }
+
+
+def _update_status(**values):
+    with _dedup_lock:
+        _dedup_status.update(values)
+
+
+def _run_dedup_job(app):
+    with app.app_context():
+        try:
+            summary = run_dedup(progress=_update_status)
+            _update_status(status='completed', **summary)
+            print(f"✅ Image dedup job completed: {summary}")
+        except Exception as e:
+            db.session.rollback()
+            _update_status(status='failed', error=str(e))
+            print(f"❌ Image dedup job failed: {e}")
+        finally:
+            _update_status(finished_at=datetime.utcnow().isoformat())
+            db.session.remove()
+
+
+def start_dedup_job():
+    """
+    Start the merge job in a background thread unless this process is already running one.
+    Returns its status; the status is kept per web worker.
+    """
+    global _dedup_thread
+    app = current_app._get_current_object()
+    with _dedup_lock:
+        if _dedup_thread is None or not _dedup_thread.is_alive():
+            _dedup_status.clear()
+            _dedup_status.update({
+                'status': 'running',
+                'worker_pid': os.getpid(),
+                'started_at': datetime.utcnow().isoformat(),
+                'hashed': 0, 'missing': 0, 'merged': 0, 'relinked': 0, 'removed': 0
+            })
+            _dedup_thread = threading.Thread(target=_run_dedup_job, args=(app,), name='image-dedup', daemon=True)
+            _dedup_thread.start()
+        return dict(_dedup_status)
+
+
+def get_dedup_status():
+    """Status of the last merge job started by this process"""
+    with _dedup_lock:
+        return dict(_dedup_status)
@@ -0,0 +1,92 @@
+import io
+import os
+from flask import current_app
+from PIL import Image as PILImage, ImageOps, features
+
+# Uploaded images get pre-sized copies stored next to the original as <name>.<size>.<ext>
+# (images/shirt_20250101.jpg -> images/shirt_20250101.thumb.jpg, ...). The variants an image
+# has are listed in Image.variants; images without them are served from the original.
+
+# variant -> (size it serves, longest edge in px, Pillow format, quality)
+IMAGE_VARIANTS = {
+    'thumb': ('thumb', 320, 'JPEG', 80),
+    'thumb_webp': ('thumb', 320, 'WEBP', 75),
+    'pdf': ('pdf', 1000, 'JPEG', 85),
+}
+
+# Values of the size= parameter of /api/images/serve
+IMAGE_SIZES = ('original', 'thumb', 'pdf')
+
+VARIANT_FORMATS = {
+    'JPEG': ('.jpg', 'image/jpeg'),
+    'WEBP': ('.webp', 'image/webp'),
+}
+
+
+def variant_path(file_path, variant):
+    """Storage key of a variant of the image stored under file_path"""
+    size, _, image_format, _ = IMAGE_VARIANTS[variant]
+    return f"{os.path.splitext(file_path)[0]}.{size}{VARIANT_FORMATS[image_format][0]}"
+
+
+def _enabled_variants():
+    variants = list(IMAGE_VARIANTS)
+    if not (current_app.config.get('IMAGE_VARIANT_WEBP', True) and features.check('webp')):
+        variants.remove('thumb_webp')
+    return variants
+
+
+def render_variants(image_data):
+    """Encode every enabled variant of an image; returns {variant: bytes}"""
+    variants = _enabled_variants()
+    largest_edge = max(IMAGE_VARIANTS[variant][1] for variant in variants)
+    with PILImage.open(io.BytesIO(image_data)) as source:
+        # Decode large JPEGs at a reduced scale; much faster for phone photos
+        source.draft('RGB', (largest_edge * 2, largest_edge * 2))
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = PILImage.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+    rendered = {}
+    for variant in variants:
+        _, edge, image_format, quality = IMAGE_VARIANTS[variant]
+        resized = image.copy()
+        resized.thumbnail((edge, edge), PILImage.LANCZOS)
+        output = io.BytesIO()
+        if image_format == 'JPEG':
+            resized.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+        else:
+            resized.save(output, image_format, quality=quality)
+        rendered[variant] = output.getvalue()
+    return rendered
+
+
+def create_variants(storage_service, file_path, image_data):
+    """
+    Generate and store the variants of an uploaded image. Returns the names of the variants
+    stored (empty if the image could not be decoded).
+    """
+    try:
+        rendered = render_variants(image_data)
+    except Exception as e:
+        print(f"⚠️  Could not generate variants for {file_path}: {e}")
+        return []
+
+    stored = []
+    for variant, data in rendered.items():
+        image_format = IMAGE_VARIANTS[variant][2]
+        if storage_service.upload_bytes(data, variant_path(file_path, variant), VARIANT_FORMATS[image_format][1]):
+            stored.append(variant)
+    return stored
+
+
+def delete_variants(storage_service, file_path, variants):
+    """Remove the stored variants of an image"""
+    for variant in variants:
+        if variant in IMAGE_VARIANTS:
+            storage_service.delete_file(variant_path(file_path, variant))
@@ -32,7 +32,7 @@ class LocalStorageService:
             print(f"Local storage service not available: {e}")
             return False
     
-    def upload_image(self, image_data, filename, mime_type='image/jpeg'):
+    def upload_image(self, image_data, filename, mime_type='image/jpeg', content_hash=None):
         """
         Upload an image to local storage
         
@@ -40,15 +40,17 @@ class LocalStorageService:
             image_data: Image data (bytes or file-like object)
             filename: Name for the file
             mime_type: MIME type of the image
+            content_hash: Optional SHA-256 of the content; the file is then stored as
+                <content_hash><ext> so identical uploads share one object
         
         Returns:
             dict: File metadata including local path and URL
         """
         try:
-            # Generate unique filename with timestamp
+            # Generate unique filename with timestamp (or content-addressed name)
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             name, ext = os.path.splitext(filename)
-            unique_filename = f"{name}_{timestamp}{ext}"
+            unique_filename = f"{content_hash}{ext.lower()}" if content_hash else f"{name}_{timestamp}{ext}"
             
             # Determine storage path based on file type
             if mime_type.startswith('image/'):
@@ -173,6 +175,27 @@ class LocalStorageService:
         
         return cleaned if cleaned else "unknown"
     
+    def upload_bytes(self, data, relative_path, mime_type):
+        """
+        Save bytes to local storage under a given relative path (e.g. a generated image variant)
+        
+        Args:
+            data: File content
+            relative_path: Relative path to store it under
+            mime_type: MIME type of the file (unused for local storage)
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            full_path = self.base_path / relative_path
+            full_path.parent.mkdir(parents=True, exist_ok=True)
+            full_path.write_bytes(data)
+            return True
+        except Exception as e:
+            print(f"Error saving file to local storage: {e}")
+            return False
+    
     def get_file_path(self, relative_path):
         """
         Get local URL from relative path (for backward compatibility)
@@ -0,0 +1,431 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, current_app, jsonify, redirect, request, send_file
+from extensions import db
+
+# Bump when a PDF layout changes so renders of the old layout are not served from the cache
+PDF_LAYOUT_VERSION = 1
+
+# Rendered PDFs are cached in PDF_RENDER_FOLDER as <kind>_<target id>_<flag>_<key>.pdf, where
+# key is a hash of everything the PDF shows. Any change to the inputs gives a new key, so a
+# cached file is never stale. A .pending marker means some web worker has queued the render,
+# and an .error file holds the message of a failed one. All state is in the folder, so every
+# gunicorn worker sees the same cache and the renders queued by the others.
+# With S3_PRESIGNED_URLS on, a finished PDF is uploaded once to pdfs/renders/ in the bucket
+# (recorded by an .s3 marker) and downloads are redirected there.
+
+# A .pending marker older than this belongs to a render that was lost (e.g. the worker restarted)
+RENDER_STALE_SECONDS = 300
+
+# Old cache files are pruned at most this often per process
+CLEANUP_INTERVAL_SECONDS = 300
+
+_render_executor = None
+_render_executor_lock = threading.Lock()
+# file base name -> future for renders queued by this process
+_queued_renders = {}
+_last_cleanup = 0
+
+# Flask app of a pool process, created by _init_render_worker
+_worker_app = None
+
+
+def _render_packing_list(packing_list_id, show_garment_cost, output_path):
+    from app.routes.packing_lists import generate_packing_list_pdf
+    return generate_packing_list_pdf(packing_list_id, show_garment_cost=show_garment_cost, output_path=output_path)
+
+
+def _render_stitching_fee(group_id, apply_withholding_tax, output_path):
+    from app.routes.group_bills import generate_stitching_fee_pdf
+    return generate_stitching_fee_pdf(group_id, apply_withholding_tax, output_path=output_path)
+
+
+def _render_fabric_used(group_id, flag, output_path):
+    from app.routes.group_bills import generate_fabric_used_pdf
+    return generate_fabric_used_pdf(group_id, output_path=output_path)
+
+
+RENDERERS = {
+    'packing_list': _render_packing_list,
+    'stitching_fee': _render_stitching_fee,
+    'fabric_used': _render_fabric_used,
+}
+
+
+def _packing_list_key(packing_list_id, show_garment_cost):
+    from app.routes.packing_lists import packing_list_pdf_key
+    return packing_list_pdf_key(packing_list_id, show_garment_cost)[1]
+
+
+def _group_bill_key(kind):
+    def key(group_id, flag):
+        from app.models.group_bill import StitchingInvoiceGroup
+        from app.routes.group_bills import group_bill_pdf_key
+        group_bill = StitchingInvoiceGroup.query.get(group_id)
+        return group_bill_pdf_key(group_bill, kind, flag) if group_bill else None
+    return key
+
+
+# Content key of the current inputs, as the download endpoints compute it
+RENDER_KEYS = {
+    'packing_list': _packing_list_key,
+    'stitching_fee': _group_bill_key('stitching_fee'),
+    'fabric_used': _group_bill_key('fabric_used'),
+}
+
+DATA_CHANGED_ERROR = 'The data changed while the PDF was being prepared, please download it again'
+
+
+def pdf_cache_key(kind, flag, inputs, image_ids=()):
+    """
+    Content key of a PDF: a SHA-256 over the layout version, the flag, the inputs (any
+    JSON-serialisable data the PDF shows) and the stored images it embeds.
+    """
+    from app.models.image import Image
+    images = []
+    image_ids = sorted({image_id for image_id in image_ids if image_id})
+    if image_ids:
+        images = [
+            [image_id, file_path, uploaded_at.isoformat() if uploaded_at else None, variants]
+            for image_id, file_path, uploaded_at, variants in db.session.query(
+                Image.id, Image.file_path, Image.uploaded_at, Image.variants
+            ).filter(Image.id.in_(image_ids)).order_by(Image.id)
+        ]
+    payload = json.dumps(
+        {'layout': PDF_LAYOUT_VERSION, 'kind': kind, 'flag': bool(flag), 'inputs': inputs, 'images': images},
+        sort_keys=True, default=str, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _worker_config(app):
+    """Plain config values a pool process needs to rebuild the app (must pickle under spawn)"""
+    config = {
+        key: value for key, value in app.config.items()
+        if key.isupper() and isinstance(value, (str, int, float, bool, type(None)))
+    }
+    if isinstance(app.config.get('SQLALCHEMY_ENGINE_OPTIONS'), dict):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+    return config
+
+
+def _init_render_worker(config, cwd):
+    """Pool process initializer: a minimal app with the database, no blueprints"""
+    global _worker_app
+    os.chdir(cwd)
+    _worker_app = Flask(__name__)
+    _worker_app.config.update(config)
+    db.init_app(_worker_app)
+
+
+def _target_prefix(kind, target_id, flag=None):
+    prefix = f"{kind}_{target_id}_"
+    return prefix if flag is None else f"{prefix}{int(bool(flag))}_"
+
+
+def _render_paths(folder, kind, target_id, flag, key):
+    base = os.path.join(folder, f"{_target_prefix(kind, target_id, flag)}{key}")
+    return f"{base}.pdf", f"{base}.error", f"{base}.pending"
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _run_render(kind, target_id, flag, key, folder):
+    """
+    Render one PDF in a pool process; the file appears under its final name only when complete.
+    The key is computed again in the same transaction as the render, so the file is stored
+    under the key of the data it was actually rendered from: if the data changed after the
+    render was queued, the queued key gets an error and the PDF goes under the new key. A
+    second check after rendering catches edits during the render on databases that do not
+    keep one snapshot per transaction (MySQL's REPEATABLE READ does).
+    """
+    pdf_path, error_path, pending_path = _render_paths(folder, kind, target_id, flag, key)
+    partial_path = f"{pdf_path}.{os.getpid()}.part"
+    with _worker_app.app_context():
+        try:
+            rendered_key = RENDER_KEYS[kind](target_id, flag)
+            RENDERERS[kind](target_id, flag, partial_path)
+            if RENDER_KEYS[kind](target_id, flag) != rendered_key:
+                raise Exception(DATA_CHANGED_ERROR)
+            db.session.commit()  # Keep a group bill snapshot if it was rebuilt
+            os.replace(partial_path, _render_paths(folder, kind, target_id, flag, rendered_key)[0])
+            if rendered_key != key:
+                _write_error(error_path, DATA_CHANGED_ERROR)
+        except Exception as e:
+            db.session.rollback()
+            _write_error(error_path, str(e))
+            _remove(partial_path)
+        finally:
+            _remove(pending_path)
+            db.session.remove()
+
+
+def _write_error(error_path, message):
+    with open(error_path, 'w', encoding='utf-8') as error_file:
+        error_file.write(message)
+
+
+def _get_render_executor():
+    """Per-process pool of render processes, created on first use"""
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            _render_executor = ProcessPoolExecutor(
+                max_workers=current_app.config.get('PDF_RENDER_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_render_worker,
+                initargs=(_worker_config(current_app), os.getcwd())
+            )
+        return _render_executor
+
+
+def _reset_broken_executor():
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is not None and getattr(_render_executor, '_broken', False):
+            _render_executor.shutdown(wait=False)
+            _render_executor = None
+
+
+def _render_folder():
+    folder = os.path.abspath(current_app.config.get('PDF_RENDER_FOLDER', 'pdf_renders'))
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def _cleanup_renders(folder):
+    """Remove cache files not used for PDF_RENDER_RETENTION_SECONDS"""
+    global _last_cleanup
+    now = time.time()
+    if now - _last_cleanup < CLEANUP_INTERVAL_SECONDS:
+        return
+    _last_cleanup = now
+    cutoff = now - current_app.config.get('PDF_RENDER_RETENTION_SECONDS', 7 * 24 * 3600)
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _is_pending(pending_path):
+    try:
+        return time.time() - os.path.getmtime(pending_path) < RENDER_STALE_SECONDS
+    except OSError:
+        return False
+
+
+def get_render(kind, target_id, flag, key):
+    """
+    State of the PDF for a content key: {'status': 'done', 'path': ...},
+    {'status': 'failed', 'error': ...}, {'status': 'pending'} or None (not rendered)
+    """
+    pdf_path, error_path, pending_path = _render_paths(_render_folder(), kind, target_id, flag, key)
+    if os.path.exists(pdf_path):
+        return {'status': 'done', 'path': pdf_path}
+    if os.path.exists(error_path):
+        try:
+            with open(error_path, encoding='utf-8') as error_file:
+                return {'status': 'failed', 'error': error_file.read()}
+        except OSError:
+            pass
+    if _is_pending(pending_path):
+        return {'status': 'pending'}
+    return None
+
+
+def submit_render(kind, target_id, flag, key):
+    """
+    Make sure the PDF for a content key gets rendered. Returns {'status': 'done'} if it is
+    cached, {'status': 'pending'} if it is (now) queued here or by another web worker, or
+    {'status': 'busy'} when PDF_RENDER_QUEUE_SIZE renders are already queued here.
+    Every status carries the key as render_id.
+    """
+    folder = _render_folder()
+    pdf_path, error_path, pending_path = _render_paths(folder, kind, target_id, flag, key)
+    base = os.path.basename(pdf_path)[:-len('.pdf')]
+    if os.path.exists(pdf_path):
+        return {'status': 'done', 'render_id': key}
+    with _render_executor_lock:
+        _cleanup_renders(folder)
+        for done_base in [b for b, future in _queued_renders.items() if future.done()]:
+            del _queued_renders[done_base]
+        if base in _queued_renders or _is_pending(pending_path):
+            return {'status': 'pending', 'render_id': key}
+        if len(_queued_renders) >= current_app.config.get('PDF_RENDER_QUEUE_SIZE', 16):
+            return {'status': 'busy', 'render_id': key}
+        # A failed render is retried
+        _remove(error_path)
+        open(pending_path, 'w').close()
+
+    try:
+        future = _get_render_executor().submit(_run_render, kind, target_id, bool(flag), key, folder)
+    except BrokenProcessPool:
+        # A render process died since the last render; start a fresh pool once
+        _reset_broken_executor()
+        future = _get_render_executor().submit(_run_render, kind, target_id, bool(flag), key, folder)
+
+    def _record_crash(done_future):
+        # The pool process died (or the pool is broken); report it instead of pending forever
+        if done_future.exception() is not None:
+            _write_error(error_path, f"PDF render failed: {done_future.exception()}")
+            _remove(pending_path)
+            _reset_broken_executor()
+    future.add_done_callback(_record_crash)
+
+    with _render_executor_lock:
+        _queued_renders[base] = future
+    return {'status': 'pending', 'render_id': key}
+
+
+def iter_renders(documents, poll_interval=0.2):
+    """
+    Render many PDFs and yield (document, path, error) as each one is ready: cached PDFs
+    straight away, the others in the order the pool finishes them. documents yields
+    (kind, target_id, flag, key, name) tuples and is consumed lazily, so the first PDFs are
+    available before every key is computed. Waits while the render queue is full.
+    """
+    waiting = []
+    
+    def collect():
+        ready, still_waiting = [], []
+        for document in waiting:
+            render = get_render(*document[:4])
+            if render is None:
+                ready.append((document, None, 'PDF render was lost, please export again'))
+            elif render['status'] == 'done':
+                ready.append((document, render['path'], None))
+            elif render['status'] == 'failed':
+                _remove(_render_paths(_render_folder(), *document[:4])[1])
+                ready.append((document, None, render['error']))
+            else:
+                still_waiting.append(document)
+        waiting[:] = still_waiting
+        return ready
+    
+    for document in documents:
+        while True:
+            render = submit_render(*document[:4])
+            if render['status'] != 'busy':
+                break
+            # Queue full: hand out what has finished meanwhile, then try again
+            time.sleep(poll_interval)
+            yield from collect()
+        if render['status'] == 'done':
+            yield from collect()
+            yield document, _render_paths(_render_folder(), *document[:4])[0], None
+        else:
+            waiting.append(document)
+            yield from collect()
+    
+    while waiting:
+        time.sleep(poll_interval)
+        yield from collect()
+
+
+def discard_renders(kind, target_id):
+    """Remove every cached render of a deleted packing list or group bill"""
+    folder = _render_folder()
+    prefix = _target_prefix(kind, target_id)
+    for name in os.listdir(folder):
+        if name.startswith(prefix):
+            _remove(os.path.join(folder, name))
+
+
+def _presigned_pdf_url(pdf_path, download_name):
+    """Presigned S3 URL of a rendered PDF in redirect mode (uploading it once), otherwise None"""
+    from app.services.storage_service_factory import StorageServiceFactory
+    storage_service = StorageServiceFactory.get_storage_service()
+    if not getattr(storage_service, 'presigned_urls', False):
+        return None
+    s3_key = f"{storage_service.pdfs_folder}/renders/{os.path.basename(pdf_path)}"
+    marker_path = f"{pdf_path[:-len('.pdf')]}.s3"
+    try:
+        uploaded = time.time() - os.path.getmtime(marker_path) < current_app.config.get('PDF_RENDER_RETENTION_SECONDS', 7 * 24 * 3600)
+    except OSError:
+        uploaded = False
+    if not uploaded:
+        # The bucket copy may have expired with the retention period; upload it again
+        if not storage_service.upload_file(pdf_path, s3_key, 'application/pdf'):
+            return None
+        open(marker_path, 'w').close()
+    return storage_service.generate_presigned_url(s3_key, download_name=download_name)
+
+
+def _prune_superseded(kind, target_id, flag, key):
+    """Remove the renders of earlier inputs of a PDF once its current key is being served"""
+    folder = _render_folder()
+    prefix = _target_prefix(kind, target_id, flag)
+    for name in os.listdir(folder):
+        if name.startswith(prefix) and not name.startswith(f"{prefix}{key}") and name.endswith(('.pdf', '.s3')):
+            _remove(os.path.join(folder, name))
+
+
+def _no_cache(response):
+    # The URL stays the same while the content changes: clients must revalidate with the ETag
+    response.cache_control.public = False
+    response.cache_control.max_age = None
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def render_status_response(render):
+    """202 for a queued render, 503 when the queue is full"""
+    if render['status'] == 'busy':
+        response = jsonify({'status': 'busy', 'error': 'PDF renderer is busy, please try again shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return jsonify(render), 202
+
+
+def pdf_download_response(kind, target_id, flag, key, download_name):
+    """
+    Response for a PDF download endpoint given the content key of the current inputs.
+    A cached PDF is sent with the key as ETag (304 for a matching If-None-Match), or redirected
+    to a presigned S3 URL in redirect mode; otherwise the render is queued and the client polls
+    with ?render_id= until it is done. A failed render is reported once to the client waiting
+    for it and retried on the next request.
+    """
+    if key in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(key)
+        return _no_cache(response)
+
+    render = get_render(kind, target_id, flag, key)
+    if render is None or (render['status'] == 'failed' and request.args.get('render_id') != key):
+        return render_status_response(submit_render(kind, target_id, flag, key))
+    if render['status'] == 'failed':
+        _remove(_render_paths(_render_folder(), kind, target_id, flag, key)[1])
+        return jsonify({'error': render['error']}), 500
+    if render['status'] == 'pending':
+        return jsonify({'status': 'pending', 'render_id': key}), 202
+
+    try:
+        os.utime(render['path'])  # Keep PDFs in use past PDF_RENDER_RETENTION_SECONDS
+    except OSError:
+        # Pruned or replaced since get_render
+        return render_status_response(submit_render(kind, target_id, flag, key))
+    # Only the download endpoints know which key is current, so superseded renders go here
+    _prune_superseded(kind, target_id, flag, key)
+    try:
+        url = _presigned_pdf_url(render['path'], download_name)
+    except Exception as e:
+        print(f"⚠️  Presigned PDF URL failed, sending the file instead: {e}")
+        url = None
+    if url:
+        return _no_cache(redirect(url, 302))
+    return _no_cache(send_file(render['path'], as_attachment=True, download_name=download_name, etag=key))
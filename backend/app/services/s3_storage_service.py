@@ -1,8 +1,11 @@
 import boto3
 import os
+import threading
+import time
 from datetime import datetime
 from PIL import Image as PILImage
 import io
+from urllib.parse import quote
 from botocore.exceptions import ClientError, NoCredentialsError
 
 class S3StorageService:
@@ -25,6 +28,15 @@ class S3StorageService:
         self.images_folder = 'images'
         self.uploads_folder = 'uploads'
         self.pdfs_folder = 'pdfs'
+        
+        # Redirect mode: hand out short-lived presigned GET URLs so clients fetch objects
+        # from S3 directly (the bucket can stay private and no bytes pass through the app)
+        self.presigned_urls = os.environ.get('S3_PRESIGNED_URLS', 'false').lower() == 'true'
+        self.presigned_url_expires = int(os.environ.get('S3_PRESIGNED_URL_EXPIRES', 3600))
+        # (key, download name) -> (url, signed at); a URL is reused for half its lifetime
+        # so browsers can cache the object under it
+        self._presigned_cache = {}
+        self._presigned_lock = threading.Lock()
     
     def is_available(self):
         """Check if S3 storage service is available"""
@@ -36,7 +48,7 @@ class S3StorageService:
             print(f"S3 storage service not available: {e}")
             return False
     
-    def upload_image(self, image_data, filename, mime_type='image/jpeg'):
+    def upload_image(self, image_data, filename, mime_type='image/jpeg', content_hash=None):
         """
         Upload an image to S3
         
@@ -44,15 +56,17 @@ class S3StorageService:
             image_data: Image data (bytes or file-like object)
             filename: Name for the file
             mime_type: MIME type of the image
+            content_hash: Optional SHA-256 of the content; the file is then stored as
+                <content_hash><ext> so identical uploads share one object
         
         Returns:
             dict: File metadata including S3 key and URL
         """
         try:
-            # Generate unique filename with timestamp
+            # Generate unique filename with timestamp (or content-addressed name)
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             name, ext = os.path.splitext(filename)
-            unique_filename = f"{name}_{timestamp}{ext}"
+            unique_filename = f"{content_hash}{ext.lower()}" if content_hash else f"{name}_{timestamp}{ext}"
             
             # Determine S3 key based on file type
             if mime_type.startswith('image/'):
@@ -279,10 +293,85 @@ class S3StorageService:
             s3_key: S3 key stored in database
         
         Returns:
-            str: URL for accessing the file
+            str: URL for accessing the file (presigned in redirect mode)
         """
+        if self.presigned_urls:
+            return self.generate_presigned_url(s3_key)
         return f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
     
+    def generate_presigned_url(self, s3_key, download_name=None):
+        """
+        Generate a presigned GET URL valid for S3_PRESIGNED_URL_EXPIRES seconds
+        
+        Args:
+            s3_key: S3 key stored in database
+            download_name: Optional file name to download the object as (attachment)
+        
+        Returns:
+            str: Presigned URL
+        """
+        cache_key = (s3_key, download_name)
+        now = time.time()
+        with self._presigned_lock:
+            cached = self._presigned_cache.get(cache_key)
+            if cached and now - cached[1] < self.presigned_url_expires / 2:
+                return cached[0]
+        
+        params = {
+            'Bucket': self.bucket_name,
+            'Key': s3_key,
+            # Objects never change under a key, so browsers may keep them as long as the URL is reused
+            'ResponseCacheControl': f'private, max-age={self.presigned_url_expires}'
+        }
+        if download_name:
+            ascii_name = download_name.encode('ascii', 'ignore').decode().replace('"', '') or 'download'
+            params['ResponseContentDisposition'] = f'attachment; filename="{ascii_name}"; filename*=UTF-8\'\'{quote(download_name)}'
+        url = self.s3_client.generate_presigned_url('get_object', Params=params, ExpiresIn=self.presigned_url_expires)
+        
+        with self._presigned_lock:
+            if len(self._presigned_cache) >= 10000:
+                self._presigned_cache.clear()
+            self._presigned_cache[cache_key] = (url, now)
+        return url
+    
+    def upload_bytes(self, data, s3_key, mime_type):
+        """
+        Upload bytes to S3 under a given key (e.g. a generated image variant)
+        
+        Args:
+            data: File content
+            s3_key: S3 key to store it under
+            mime_type: MIME type of the file
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            self.s3_client.upload_fileobj(io.BytesIO(data), self.bucket_name, s3_key, ExtraArgs={'ContentType': mime_type})
+            return True
+        except Exception as e:
+            print(f"Error uploading file to S3: {e}")
+            return False
+    
+    def upload_file(self, local_path, s3_key, mime_type):
+        """
+        Upload a local file to S3 under a given key
+        
+        Args:
+            local_path: Path of the local file
+            s3_key: S3 key to store it under
+            mime_type: MIME type of the file
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            self.s3_client.upload_file(local_path, self.bucket_name, s3_key, ExtraArgs={'ContentType': mime_type})
+            return True
+        except Exception as e:
+            print(f"Error uploading file to S3: {e}")
+            return False
+    
     def download_file(self, s3_key, local_path):
         """
         Download a file from S3 to local path
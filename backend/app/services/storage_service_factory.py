@@ -1,92 +1,131 @@
 import os
+import threading
+import time
+from datetime import datetime
 from .s3_storage_service import S3StorageService
 from .local_storage_service import LocalStorageService
 
 class StorageServiceFactory:
-    """Factory for creating storage services based on availability"""
-    
+    """
+    Factory for the storage service. One service is kept per process (created on first use)
+    and its availability is re-checked by a background thread every
+    STORAGE_HEALTH_CHECK_SECONDS, so callers never pay for a health check.
+    """
+
+    HEALTH_CHECK_SECONDS = int(os.environ.get('STORAGE_HEALTH_CHECK_SECONDS', 60))
+
+    _lock = threading.Lock()
+    _pid = None
+    _service = None
+    _s3_service = None
+    _local_service = None
+    _info = None
+    _health_thread = None
+
     @staticmethod
-    def get_storage_service():
-        """
-        Get the best available storage service
-        
-        Returns:
-            StorageService: S3StorageService if available, otherwise LocalStorageService
-        """
-        # Check if S3 environment variables are set
-        s3_configured = all([
+    def _s3_configured():
+        return all([
             os.environ.get('AWS_ACCESS_KEY_ID'),
             os.environ.get('AWS_SECRET_ACCESS_KEY'),
             os.environ.get('AWS_S3_BUCKET_NAME')
         ])
-        
-        if s3_configured:
-            try:
-                # Try to create S3 service
-                s3_service = S3StorageService()
-                if s3_service.is_available():
-                    print("✅ Using S3 storage service")
-                    return s3_service
-                else:
-                    print("⚠️  S3 configured but not available, falling back to local storage")
-            except Exception as e:
-                print(f"⚠️  S3 service creation failed: {e}, falling back to local storage")
-        
-        # Fall back to local storage
-        try:
-            local_service = LocalStorageService()
-            if local_service.is_available():
-                print("✅ Using local storage service")
-                return local_service
-            else:
-                raise Exception("Local storage service is not available")
-        except Exception as e:
-            print(f"❌ Local storage service creation failed: {e}")
-            raise Exception("No storage service is available")
-    
-    @staticmethod
-    def get_storage_service_info():
+
+    @classmethod
+    def _check(cls):
         """
-        Get information about available storage services
-        
-        Returns:
-            dict: Information about storage services
+        Check the services and select the best available one: S3 if configured and reachable,
+        otherwise local storage. Returns (service or None, info).
         """
         info = {
-            's3_configured': False,
+            's3_configured': cls._s3_configured(),
             's3_available': False,
             'local_available': False,
-            'selected_service': None
+            'selected_service': None,
+            'checked_at': datetime.utcnow().isoformat()
         }
-        
-        # Check S3 configuration
-        s3_configured = all([
-            os.environ.get('AWS_ACCESS_KEY_ID'),
-            os.environ.get('AWS_SECRET_ACCESS_KEY'),
-            os.environ.get('AWS_S3_BUCKET_NAME')
-        ])
-        info['s3_configured'] = s3_configured
-        
-        if s3_configured:
+
+        if info['s3_configured']:
             try:
-                s3_service = S3StorageService()
-                info['s3_available'] = s3_service.is_available()
-            except:
-                info['s3_available'] = False
-        
-        # Check local storage
+                # One client per process; boto3 clients are thread-safe
+                if cls._s3_service is None:
+                    cls._s3_service = S3StorageService()
+                info['s3_available'] = cls._s3_service.is_available()
+            except Exception as e:
+                print(f"⚠️  S3 service creation failed: {e}")
+
         try:
-            local_service = LocalStorageService()
-            info['local_available'] = local_service.is_available()
-        except:
-            info['local_available'] = False
-        
-        # Determine selected service
+            if cls._local_service is None:
+                cls._local_service = LocalStorageService()
+            info['local_available'] = cls._local_service.is_available()
+        except Exception as e:
+            print(f"❌ Local storage service creation failed: {e}")
+
         if info['s3_available']:
             info['selected_service'] = 'S3'
-        elif info['local_available']:
+            return cls._s3_service, info
+        if info['s3_configured']:
+            print("⚠️  S3 configured but not available, falling back to local storage")
+        if info['local_available']:
             info['selected_service'] = 'Local'
-        else:
-            info['selected_service'] = 'None'
-        
-        return info
+            return cls._local_service, info
+        info['selected_service'] = 'None'
+        return None, info
+
+    @classmethod
+    def _health_loop(cls):
+        while True:
+            time.sleep(cls.HEALTH_CHECK_SECONDS)
+            try:
+                service, info = cls._check()
+                with cls._lock:
+                    if service is not None and service is not cls._service:
+                        print(f"🔄 Storage service switched to {info['selected_service']}")
+                    # Keep the last service if nothing is available; requests will report its errors
+                    if service is not None:
+                        cls._service = service
+                    cls._info = info
+            except Exception as e:
+                print(f"⚠️  Storage health check failed: {e}")
+
+    @classmethod
+    def get_storage_service(cls):
+        """
+        Get the best available storage service
+
+        Returns:
+            StorageService: S3StorageService if available, otherwise LocalStorageService
+        """
+        service = cls._service
+        if service is not None and cls._pid == os.getpid():
+            return service
+
+        with cls._lock:
+            if cls._service is None or cls._pid != os.getpid():
+                # First use in this process (or a forked child): clients are not shared across processes
+                cls._s3_service = None
+                cls._local_service = None
+                service, info = cls._check()
+                if service is None:
+                    raise Exception("No storage service is available")
+                print(f"✅ Using {info['selected_service']} storage service")
+                cls._service = service
+                cls._info = info
+                cls._pid = os.getpid()
+                cls._health_thread = threading.Thread(target=cls._health_loop, name='storage-health', daemon=True)
+                cls._health_thread.start()
+            return cls._service
+
+    @classmethod
+    def get_storage_service_info(cls):
+        """
+        Get information about available storage services, as of the last health check
+
+        Returns:
+            dict: Information about storage services
+        """
+        try:
+            cls.get_storage_service()
+        except Exception:
+            _, info = cls._check()
+            return info
+        return dict(cls._info)
@@ -0,0 +1,93 @@
+"""
+Keyset (cursor) pagination helpers shared by the list endpoints.
+
+A cursor encodes the (sort value, id) of the last row on a page. The next page
+filters on that key instead of skipping rows with OFFSET, so any page costs
+the same as the first one. The filter and ORDER BY use the raw sort column so
+the composite (sort column, id) indexes added in railway_start.py serve them.
+"""
+import base64
+import json
+from datetime import datetime, date
+from sqlalchemy import or_, and_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor parameter cannot be decoded"""
+
+
+def get_pagination_args(args):
+    """Read cursor pagination options from request args.
+
+    Returns (cursor_mode, cursor_key, include_total). Cursor mode is enabled by
+    passing ``cursor`` (empty for the first page). The exact total is skipped by
+    default in cursor mode; pass ``include_total=true`` to get it anyway.
+    """
+    cursor_mode = 'cursor' in args
+    cursor_key = decode_cursor(args.get('cursor')) if cursor_mode else None
+    include_total = args.get('include_total', 'false' if cursor_mode else 'true').lower() == 'true'
+    return cursor_mode, cursor_key, include_total
+
+
+def encode_cursor(sort_value, row_id):
+    if sort_value is None:
+        payload = {'t': 'null', 'v': None, 'id': row_id}
+    elif isinstance(sort_value, datetime):
+        payload = {'t': 'dt', 'v': sort_value.isoformat(), 'id': row_id}
+    elif isinstance(sort_value, date):
+        payload = {'t': 'd', 'v': sort_value.isoformat(), 'id': row_id}
+    else:
+        payload = {'t': 'raw', 'v': sort_value, 'id': row_id}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into (sort_value, id); empty cursor means first page"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        value = payload['v']
+        if payload['t'] == 'null':
+            value = None
+        elif payload['t'] == 'dt':
+            value = datetime.fromisoformat(value)
+        elif payload['t'] == 'd':
+            value = date.fromisoformat(value)
+        return value, int(payload['id'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor}') from e
+
+
+def apply_keyset(query, sort_column, id_column, cursor_key):
+    """Order newest first by (sort_column, id) and start after cursor_key.
+
+    Rows with a NULL sort value come after every dated row (MySQL and SQLite
+    sort NULL lowest), ordered by id among themselves.
+    """
+    if cursor_key:
+        sort_value, last_id = cursor_key
+        if sort_value is None:
+            query = query.filter(sort_column.is_(None), id_column < last_id)
+        else:
+            query = query.filter(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, id_column < last_id),
+                sort_column.is_(None)
+            ))
+    return query.order_by(sort_column.desc(), id_column.desc())
+
+
+def keyset_page(query, limit, key_func):
+    """Fetch one page from a keyset-ordered query.
+
+    key_func maps a row to its (sort value, id). Returns (rows, next_cursor);
+    next_cursor is None on the last page.
+    """
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key_func(rows[-1]))
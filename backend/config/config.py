@@ -25,19 +25,47 @@ class Config:
     
     # File upload configuration
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'static/uploads'
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB max file size by default
     
+    # DAT import: lines committed per chunk in streaming mode
+    DAT_IMPORT_CHUNK_SIZE = int(os.environ.get('DAT_IMPORT_CHUNK_SIZE', 5000))
+    # Background DAT import jobs: worker threads per process, and how long a running
+    # job may go without a heartbeat before another worker resumes it
+    DAT_IMPORT_WORKERS = int(os.environ.get('DAT_IMPORT_WORKERS', 2))
+    DAT_IMPORT_JOB_STALE_SECONDS = int(os.environ.get('DAT_IMPORT_JOB_STALE_SECONDS', 600))
+
+    # PDF rendering: render processes per web worker, renders a web worker may have queued
+    # before downloads answer "busy", and the PDF cache folder (files unused for the
+    # retention period are pruned)
+    PDF_RENDER_WORKERS = int(os.environ.get('PDF_RENDER_WORKERS', 2))
+    PDF_RENDER_QUEUE_SIZE = int(os.environ.get('PDF_RENDER_QUEUE_SIZE', 16))
+    PDF_RENDER_FOLDER = os.environ.get('PDF_RENDER_FOLDER') or 'pdf_renders'
+    PDF_RENDER_RETENTION_SECONDS = int(os.environ.get('PDF_RENDER_RETENTION_SECONDS', 7 * 24 * 3600))
+
     # AWS S3 configuration
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
     AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
     AWS_S3_BUCKET_NAME = os.environ.get('AWS_S3_BUCKET_NAME')
+    # Redirect mode: clients get presigned GET URLs (valid S3_PRESIGNED_URL_EXPIRES seconds)
+    # and fetch images and PDFs from S3 directly; read by S3StorageService
+    S3_PRESIGNED_URLS = os.environ.get('S3_PRESIGNED_URLS', 'false').lower() == 'true'
+    S3_PRESIGNED_URL_EXPIRES = int(os.environ.get('S3_PRESIGNED_URL_EXPIRES', 3600))
     
     # PDF storage configuration (now in S3)
     PDF_FOLDER = 'pdfs'
     
     # Image storage configuration (now in S3)
     IMAGE_FOLDER = 'images'
+    # Images fetched for PDFs: threads per document, and a local cache of S3 objects
+    # bounded to IMAGE_CACHE_MAX_MB (least recently used files are evicted)
+    IMAGE_PREFETCH_WORKERS = int(os.environ.get('IMAGE_PREFETCH_WORKERS', 8))
+    IMAGE_CACHE_FOLDER = os.environ.get('IMAGE_CACHE_FOLDER')  # Defaults to <tmp>/goms_image_cache
+    IMAGE_CACHE_MAX_MB = int(os.environ.get('IMAGE_CACHE_MAX_MB', 512))
+    # Uploads also store a WebP thumbnail (served to browsers that accept it) next to the JPEG variants
+    IMAGE_VARIANT_WEBP = os.environ.get('IMAGE_VARIANT_WEBP', 'true').lower() == 'true'
+    # Browser cache lifetime of /api/images/serve responses (revalidated with ETag/Last-Modified after)
+    IMAGE_SERVE_MAX_AGE = int(os.environ.get('IMAGE_SERVE_MAX_AGE', 30 * 24 * 3600))
     
     # Application settings
     ITEMS_PER_PAGE = 50
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Hash images uploaded before content-addressed storage and merge the ones with identical
+content (stitching records are pointed at the kept image, unused storage objects removed)
+"""
+
+from main import create_app, db
+from app.services.image_dedup_service import run_dedup
+
+def dedup_images():
+    """Hash unhashed images and merge duplicates"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            summary = run_dedup()
+            print(f"✅ Hashed {summary['hashed']} images ({summary['missing']} missing from storage), "
+                  f"merged {summary['merged']} duplicates into existing images, relinked {summary['relinked']} "
+                  f"stitching records, removed {summary['removed']} storage objects")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error merging duplicate images: {e}")
+            raise
+
+if __name__ == '__main__':
+    dedup_images()
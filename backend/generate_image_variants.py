@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Generate the pre-sized variants (list thumbnail, PDF size) of images uploaded before
+variants existed, or whose variants failed at upload
+"""
+
+from main import create_app, db
+from app.models.image import Image
+from app.services.storage_service_factory import StorageServiceFactory
+from app.services.image_cache_service import get_cached_file
+from app.services.image_variant_service import create_variants
+
+def generate_image_variants():
+    """Generate variants for every image that has none"""
+    app = create_app()
+    
+    with app.app_context():
+        storage_service = StorageServiceFactory.get_storage_service()
+        image_ids = [row[0] for row in db.session.query(Image.id).filter(Image.variants.is_(None)).order_by(Image.id)]
+        generated = 0
+        for image_id in image_ids:
+            image = Image.query.get(image_id)
+            try:
+                local_path = get_cached_file(storage_service, image.file_path)
+                if not local_path:
+                    print(f"⚠️  Image {image_id}: {image.file_path} not found in storage")
+                    continue
+                with open(local_path, 'rb') as image_file:
+                    variants = create_variants(storage_service, image.file_path, image_file.read())
+                if variants:
+                    image.variants = ','.join(variants)
+                    db.session.commit()
+                    generated += 1
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error generating variants for image {image_id}: {e}")
+        print(f"✅ Generated variants for {generated} of {len(image_ids)} images")
+
+if __name__ == '__main__':
+    generate_image_variants()
@@ -47,7 +47,7 @@ def create_app(config_class=Config):
          supports_credentials=True, 
          methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
          allow_headers=['Content-Type', 'Authorization', 'X-Requested-With', 'Accept', 'Cache-Control', 'Pragma'],
-         expose_headers=['Content-Type', 'Authorization'])
+         expose_headers=['Content-Type', 'Authorization', 'Content-Disposition'])
     
     # Register blueprints
     from app.routes.main import main_bp
@@ -60,6 +60,7 @@ def create_app(config_class=Config):
     from app.routes.images import images_bp
     from app.routes.dashboard import dashboard_bp
     from app.routes.cost_price_lists import cost_price_bp
+    from app.routes.exports import exports_bp
     
     print("🔧 Registering blueprints...")
     
@@ -92,6 +93,9 @@ def create_app(config_class=Config):
     
     app.register_blueprint(cost_price_bp, url_prefix='/api/cost-price')
     print("   ✅ cost_price_bp registered")
+    
+    app.register_blueprint(exports_bp, url_prefix='/api/exports')
+    print("   ✅ exports_bp registered")
     print("   ✅ dashboard_bp registered")
     
     print("🔧 All blueprints registered successfully!")
@@ -22,6 +22,7 @@ from app.models.customer_id_mapping import CustomerIdMapping
 from app.models.delivery_location import DeliveryLocation
 from app.models.stitching_cost import StitchingCost
 from app.models.stitching_price import StitchingPrice
+from app.models.dat_import_job import DatImportJob, DatImportFile
 
 def fix_serial_counters():
     """Fix serial_counters table structure if needed"""
@@ -58,6 +59,26 @@ def fix_serial_counters():
                 db.session.commit()
                 print("✅ Initialized serial counters with default values")
                 
+            elif 'period' not in columns:
+                # Counters are now kept per (type, period) instead of one row per type
+                print("📝 Adding period column to serial_counters table...")
+                result = db.session.execute(text(
+                    "SHOW INDEX FROM serial_counters WHERE Column_name = 'serial_type' AND Non_unique = 0"
+                ))
+                old_indexes = {row[2] for row in result.fetchall()}
+                db.session.execute(text("""
+                    ALTER TABLE serial_counters 
+                    ADD COLUMN period VARCHAR(10) NOT NULL DEFAULT ''
+                """))
+                for index_name in old_indexes:
+                    db.session.execute(text(f"ALTER TABLE serial_counters DROP INDEX `{index_name}`"))
+                db.session.execute(text("""
+                    ALTER TABLE serial_counters 
+                    ADD UNIQUE INDEX uq_serial_counters_type_period (serial_type, period)
+                """))
+                db.session.commit()
+                print("✅ Successfully added period column to serial_counters")
+                
             else:
                 print("✅ Table structure is correct")
                 
@@ -78,7 +99,7 @@ def fix_serial_counters():
         counters = SerialCounter.query.all()
         print(f"✅ Verification: Found {len(counters)} serial counters")
         for counter in counters:
-            print(f"   - {counter.serial_type}: {counter.last_value}")
+            print(f"   - {counter.serial_type} {counter.period}: {counter.last_value}")
             
     except Exception as e:
         print(f"❌ Error fixing serial counters: {e}")
@@ -163,7 +184,12 @@ def main():
                         delivery_note VARCHAR(255),
                         yards_sent NUMERIC(10, 2) DEFAULT 0,
                         yards_consumed NUMERIC(10, 2) DEFAULT 0,
+                        commission_yards_total NUMERIC(10, 2) DEFAULT 0,
+                        pending_yards NUMERIC(10, 2) DEFAULT 0,
+                        source_fingerprint VARCHAR(64),
                         PRIMARY KEY (id),
+                        UNIQUE (source_fingerprint),
+                        INDEX ix_invoice_lines_pending_yards (pending_yards),
                         FOREIGN KEY(invoice_id) REFERENCES invoices (id)
                     )
                 """))
@@ -211,6 +237,8 @@ def main():
                     CustomerIdMapping.__table__,
                     DeliveryLocation.__table__,
                     FabricInventory.__table__,
+                    DatImportJob.__table__,
+                    DatImportFile.__table__,
                 ],
                 # Level 2: Depend on customers
                 [
@@ -273,6 +301,200 @@ def main():
             print(f"⚠️ Error adding stitching_cost column: {e}")
             print("   Continuing without stitching_cost column fix...")
         
+        # Run invoice line stock counter migration
+        try:
+            print("🔍 Checking stock counter columns in invoice_lines table...")
+            result = db.session.execute(text("DESCRIBE invoice_lines"))
+            columns = [row[0] for row in result.fetchall()]
+            
+            if 'commission_yards_total' not in columns or 'pending_yards' not in columns:
+                print("📝 Adding stock counter columns to invoice_lines table...")
+                if 'commission_yards_total' not in columns:
+                    db.session.execute(text("""
+                        ALTER TABLE invoice_lines 
+                        ADD COLUMN commission_yards_total DECIMAL(10,2) DEFAULT 0.00
+                    """))
+                if 'pending_yards' not in columns:
+                    db.session.execute(text("""
+                        ALTER TABLE invoice_lines 
+                        ADD COLUMN pending_yards DECIMAL(10,2) DEFAULT 0.00,
+                        ADD INDEX ix_invoice_lines_pending_yards (pending_yards)
+                    """))
+                updated = InvoiceLine.rebuild_stock_counters()
+                db.session.commit()
+                print(f"✅ Successfully added stock counter columns (backfilled {updated} lines)")
+            else:
+                print("✅ Stock counter columns already exist")
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Error adding stock counter columns: {e}")
+            print("   Continuing without stock counter fix...")
+        
+        # Run DAT line fingerprint migration
+        try:
+            print("🔍 Checking source_fingerprint column in invoice_lines table...")
+            result = db.session.execute(text("DESCRIBE invoice_lines"))
+            columns = [row[0] for row in result.fetchall()]
+            
+            if 'source_fingerprint' not in columns:
+                print("📝 Adding source_fingerprint column to invoice_lines table...")
+                db.session.execute(text("""
+                    ALTER TABLE invoice_lines 
+                    ADD COLUMN source_fingerprint VARCHAR(64) NULL,
+                    ADD UNIQUE INDEX uq_invoice_lines_source_fingerprint (source_fingerprint)
+                """))
+                db.session.commit()
+                print("✅ Successfully added source_fingerprint column")
+            else:
+                print("✅ source_fingerprint column already exists")
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Error adding source_fingerprint column: {e}")
+            print("   Continuing without source_fingerprint column fix...")
+        
+        # Run stitching total quantity migration
+        try:
+            print("🔍 Checking total_qty column in stitching_invoices table...")
+            result = db.session.execute(text("DESCRIBE stitching_invoices"))
+            columns = [row[0] for row in result.fetchall()]
+            
+            if 'total_qty' not in columns:
+                print("📝 Adding total_qty column to stitching_invoices table...")
+                db.session.execute(text("""
+                    ALTER TABLE stitching_invoices 
+                    ADD COLUMN total_qty INT DEFAULT 0,
+                    ADD INDEX ix_stitching_invoices_total_qty (total_qty)
+                """))
+                updated = StitchingInvoice.rebuild_total_qty()
+                db.session.commit()
+                print(f"✅ Successfully added total_qty column (backfilled {updated} records)")
+            else:
+                print("✅ total_qty column already exists")
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Error adding total_qty column: {e}")
+            print("   Continuing without total_qty column fix...")
+        
+        # Run stitching garment cost migration
+        try:
+            print("🔍 Checking garment cost columns in stitching_invoices table...")
+            result = db.session.execute(text("DESCRIBE stitching_invoices"))
+            columns = [row[0] for row in result.fetchall()]
+            
+            missing = [c for c in ('main_fabric_cost', 'sewing_cost_per_piece', 'cost_per_piece') if c not in columns]
+            if missing:
+                print("📝 Adding garment cost columns to stitching_invoices table...")
+                if 'main_fabric_cost' in missing:
+                    db.session.execute(text("ALTER TABLE stitching_invoices ADD COLUMN main_fabric_cost DECIMAL(12,2) DEFAULT 0.00"))
+                if 'sewing_cost_per_piece' in missing:
+                    db.session.execute(text("ALTER TABLE stitching_invoices ADD COLUMN sewing_cost_per_piece DECIMAL(10,2) DEFAULT 0.00"))
+                if 'cost_per_piece' in missing:
+                    db.session.execute(text("ALTER TABLE stitching_invoices ADD COLUMN cost_per_piece DECIMAL(12,4) DEFAULT 0.0000"))
+                updated = StitchingInvoice.rebuild_costs()
+                db.session.commit()
+                print(f"✅ Successfully added garment cost columns (backfilled {updated} records)")
+            else:
+                print("✅ Garment cost columns already exist")
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Error adding garment cost columns: {e}")
+            print("   Continuing without garment cost columns fix...")
+        
+        # Run group bill snapshot migration
+        try:
+            print("🔍 Checking snapshot columns in stitching_invoice_groups table...")
+            result = db.session.execute(text("DESCRIBE stitching_invoice_groups"))
+            columns = [row[0] for row in result.fetchall()]
+            
+            missing = [c for c in ('summary_json', 'snapshot_json', 'snapshot_version', 'snapshot_built_at') if c not in columns]
+            if missing:
+                print("📝 Adding snapshot columns to stitching_invoice_groups table...")
+                if 'summary_json' in missing:
+                    db.session.execute(text("ALTER TABLE stitching_invoice_groups ADD COLUMN summary_json TEXT"))
+                if 'snapshot_json' in missing:
+                    db.session.execute(text("ALTER TABLE stitching_invoice_groups ADD COLUMN snapshot_json MEDIUMTEXT"))
+                if 'snapshot_version' in missing:
+                    db.session.execute(text("ALTER TABLE stitching_invoice_groups ADD COLUMN snapshot_version INT NOT NULL DEFAULT 0"))
+                if 'snapshot_built_at' in missing:
+                    db.session.execute(text("ALTER TABLE stitching_invoice_groups ADD COLUMN snapshot_built_at DATETIME"))
+                db.session.commit()
+                # Existing group bills get their snapshot on first view (or run rebuild_group_bill_snapshots.py)
+                print("✅ Successfully added snapshot columns")
+            else:
+                print("✅ Snapshot columns already exist")
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Error adding snapshot columns: {e}")
+            print("   Continuing without snapshot columns fix...")
+        
+        # Run image variants migration
+        try:
+            print("🔍 Checking variants column in images table...")
+            result = db.session.execute(text("DESCRIBE images"))
+            columns = [row[0] for row in result.fetchall()]
+            
+            if 'variants' not in columns:
+                print("📝 Adding variants column to images table...")
+                db.session.execute(text("ALTER TABLE images ADD COLUMN variants VARCHAR(100) NULL"))
+                db.session.commit()
+                # Existing images are served from the original until generate_image_variants.py runs
+                print("✅ Successfully added variants column")
+            else:
+                print("✅ Variants column already exists")
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Error adding variants column: {e}")
+            print("   Continuing without variants column fix...")
+        
+        # Run image content hash migration
+        try:
+            print("🔍 Checking content_hash column in images table...")
+            result = db.session.execute(text("DESCRIBE images"))
+            columns = [row[0] for row in result.fetchall()]
+            
+            if 'content_hash' not in columns:
+                print("📝 Adding content_hash column to images table...")
+                db.session.execute(text("""
+                    ALTER TABLE images 
+                    ADD COLUMN content_hash VARCHAR(64) NULL,
+                    ADD INDEX ix_images_content_hash (content_hash)
+                """))
+                db.session.commit()
+                # Existing images are hashed and merged by dedup_images.py (or POST /api/images/dedup)
+                print("✅ Successfully added content_hash column")
+            else:
+                print("✅ content_hash column already exists")
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Error adding content_hash column: {e}")
+            print("   Continuing without content_hash column fix...")
+        
+        # Run keyset pagination index migration
+        try:
+            print("🔍 Checking keyset pagination indexes...")
+            # List endpoints page on (sort column, id) newest first; these indexes serve
+            # both the cursor filter and the ORDER BY
+            keyset_indexes = [
+                ('stitching_invoices', 'ix_stitching_invoices_created_at_id', 'created_at, id'),
+                ('packing_lists', 'ix_packing_lists_created_at_id', 'created_at, id'),
+                ('stitching_invoice_groups', 'ix_stitching_invoice_groups_created_at_id', 'created_at, id'),
+                ('invoices', 'ix_invoices_invoice_date_id', 'invoice_date, id'),
+                ('commission_sales', 'ix_commission_sales_sale_date_id', 'sale_date, id'),
+            ]
+            for table_name, index_name, index_columns in keyset_indexes:
+                result = db.session.execute(text(f"SHOW INDEX FROM {table_name} WHERE Key_name = '{index_name}'"))
+                if result.fetchone():
+                    print(f"✅ {index_name} index already exists")
+                    continue
+                print(f"📝 Adding {index_name} index to {table_name} table...")
+                db.session.execute(text(f"ALTER TABLE {table_name} ADD INDEX {index_name} ({index_columns})"))
+                db.session.commit()
+                print(f"✅ Successfully added {index_name} index")
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Error adding keyset pagination indexes: {e}")
+            print("   Continuing without keyset pagination index fix...")
+        
         print("✅ Railway startup completed successfully!")
 
 if __name__ == '__main__':
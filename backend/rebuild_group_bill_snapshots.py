@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Rebuild the stored aggregate snapshot (totals, size totals, per-packing-list breakdown
+and per-record details) of every group bill
+"""
+
+from main import create_app, db
+from app.models.group_bill import StitchingInvoiceGroup
+
+def rebuild_group_bill_snapshots():
+    """Rebuild snapshots for every group bill"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            rebuilt = StitchingInvoiceGroup.rebuild_snapshots()
+            db.session.commit()
+            print(f"✅ Rebuilt snapshots for {rebuilt} group bills")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error rebuilding group bill snapshots: {e}")
+            raise
+
+if __name__ == '__main__':
+    rebuild_group_bill_snapshots()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Rebuild the stored stock counters (commission_yards_total, pending_yards) on invoice_lines
+from yards sent, yards consumed and the commission_sales table
+"""
+
+from main import create_app, db
+from app.models.invoice import InvoiceLine
+
+def rebuild_stock_counters():
+    """Recompute stock counters for every invoice line"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            updated = InvoiceLine.rebuild_stock_counters()
+            db.session.commit()
+            print(f"✅ Rebuilt stock counters for {updated} invoice lines")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error rebuilding stock counters: {e}")
+            raise
+
+if __name__ == '__main__':
+    rebuild_stock_counters()
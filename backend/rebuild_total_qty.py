@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Rebuild the stored total_qty column on stitching_invoices from size_qty_json
+"""
+
+from main import create_app, db
+from app.models.stitching import StitchingInvoice
+
+def rebuild_total_qty():
+    """Recompute total_qty for every stitching record"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            updated = StitchingInvoice.rebuild_total_qty()
+            db.session.commit()
+            print(f"✅ Rebuilt total quantity for {updated} stitching records")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error rebuilding total quantity: {e}")
+            raise
+
+if __name__ == '__main__':
+    rebuild_total_qty()
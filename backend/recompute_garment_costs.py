@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Recompute the stored garment cost components (main fabric, secondary fabric, lining,
+sewing and cost per piece) on every stitching record
+"""
+
+from main import create_app, db
+from app.models.stitching import StitchingInvoice
+
+def recompute_garment_costs():
+    """Recompute garment costs for every stitching record"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            updated = StitchingInvoice.rebuild_costs()
+            db.session.commit()
+            print(f"✅ Recomputed garment costs for {updated} stitching records")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error recomputing garment costs: {e}")
+            raise
+
+if __name__ == '__main__':
+    recompute_garment_costs()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# The app modules import each other from the backend folder (main, extensions, app.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import TestingConfig  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    from main import create_app
+    from extensions import db
+
+    class Config(TestingConfig):
+        PDF_RENDER_FOLDER = str(tmp_path / 'pdf_renders')
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
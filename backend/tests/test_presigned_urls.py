@@ -0,0 +1,158 @@
+"""Redirect mode (S3_PRESIGNED_URLS): presigned image and PDF URLs, against a moto S3 bucket"""
+import os
+from urllib.parse import urlparse, parse_qs
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from app.services import s3_storage_service
+from app.services.s3_storage_service import S3StorageService
+from app.services.storage_service_factory import StorageServiceFactory
+
+BUCKET = 'goms-test'
+EXPIRES = 3600
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_S3_BUCKET_NAME', BUCKET)
+    monkeypatch.setenv('S3_PRESIGNED_URLS', 'true')
+    monkeypatch.setenv('S3_PRESIGNED_URL_EXPIRES', str(EXPIRES))
+    with mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        yield S3StorageService()
+
+
+@pytest.fixture
+def storage(s3, monkeypatch):
+    """Make the S3 service the one every route and service gets from the factory"""
+    monkeypatch.setattr(StorageServiceFactory, 'get_storage_service', classmethod(lambda cls: s3))
+    return s3
+
+
+def _count_calls(monkeypatch, obj, name):
+    calls = []
+    original = getattr(obj, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(obj, name, wrapper)
+    return calls
+
+
+def _query(url):
+    return {name: values[0] for name, values in parse_qs(urlparse(url).query).items()}
+
+
+def test_presigned_url_is_reused_for_half_its_lifetime(s3, monkeypatch):
+    signed = _count_calls(monkeypatch, s3.s3_client, 'generate_presigned_url')
+    now = [1_000_000.0]
+    monkeypatch.setattr(s3_storage_service.time, 'time', lambda: now[0])
+
+    url = s3.generate_presigned_url('images/shirt.jpg')
+    now[0] += EXPIRES / 2 - 1
+    assert s3.generate_presigned_url('images/shirt.jpg') == url
+    assert len(signed) == 1
+
+    # Other keys and download names are signed separately
+    s3.generate_presigned_url('images/shirt.jpg', download_name='shirt.jpg')
+    assert len(signed) == 2
+
+    now[0] += 2
+    s3.generate_presigned_url('images/shirt.jpg')
+    assert len(signed) == 3
+
+
+def test_presigned_url_parameters(s3):
+    params = _query(s3.generate_presigned_url('pdfs/renders/a.pdf', download_name='Packing "List" ü.pdf'))
+    assert params['response-cache-control'] == f'private, max-age={EXPIRES}'
+    # ASCII fallback without quotes, plus the RFC 5987 UTF-8 name
+    assert params['response-content-disposition'] == (
+        'attachment; filename="Packing List .pdf"; '
+        "filename*=UTF-8''Packing%20%22List%22%20%C3%BC.pdf"
+    )
+
+    params = _query(s3.generate_presigned_url('images/shirt.jpg'))
+    assert 'response-content-disposition' not in params
+
+
+def test_serve_image_redirects_to_presigned_url(app, storage):
+    from extensions import db
+    from app.models.image import Image
+
+    image = Image(file_path='images/shirt.jpg', variants='thumb,thumb_webp,pdf')
+    db.session.add(image)
+    db.session.commit()
+    client = app.test_client()
+
+    response = client.get(f'/api/images/serve/{image.id}')
+    assert response.status_code == 302
+    location = urlparse(response.headers['Location'])
+    assert location.hostname.startswith(BUCKET)
+    assert location.path.endswith('/images/shirt.jpg')
+    assert response.cache_control.private
+    assert response.cache_control.max_age == EXPIRES // 4
+    assert 'Accept' in response.vary
+
+    response = client.get(f'/api/images/serve/{image.id}?size=thumb', headers={'Accept': 'image/webp,*/*'})
+    assert response.status_code == 302
+    assert urlparse(response.headers['Location']).path.endswith('/images/shirt.thumb.webp')
+
+
+def _cached_pdf(app, key):
+    from app.services.pdf_render_service import _render_folder, _render_paths
+    pdf_path = _render_paths(_render_folder(), 'packing_list', 1, None, key)[0]
+    with open(pdf_path, 'wb') as pdf_file:
+        pdf_file.write(b'%PDF-1.4 test')
+    return pdf_path
+
+
+def test_pdf_is_uploaded_once_and_redirected(app, storage, monkeypatch):
+    from app.services.pdf_render_service import _presigned_pdf_url
+
+    pdf_path = _cached_pdf(app, 'k1')
+    uploads = _count_calls(monkeypatch, storage, 'upload_file')
+
+    url = _presigned_pdf_url(pdf_path, 'PL-1.pdf')
+    assert urlparse(url).path.endswith('/pdfs/renders/packing_list_1_k1.pdf')
+    assert _query(url)['response-content-disposition'].startswith('attachment; filename="PL-1.pdf"')
+    assert len(uploads) == 1
+    assert os.path.exists(pdf_path[:-len('.pdf')] + '.s3')
+    head = storage.s3_client.head_object(Bucket=BUCKET, Key='pdfs/renders/packing_list_1_k1.pdf')
+    assert head['ContentType'] == 'application/pdf'
+
+    _presigned_pdf_url(pdf_path, 'PL-1.pdf')
+    assert len(uploads) == 1
+
+    with app.test_request_context('/api/packing-lists/1/pdf'):
+        from app.services.pdf_render_service import pdf_download_response
+        response = pdf_download_response('packing_list', 1, None, 'k1', 'PL-1.pdf')
+    assert response.status_code == 302
+    assert 'no-cache' in response.headers['Cache-Control']
+    assert len(uploads) == 1
+
+
+@pytest.mark.parametrize('failure', ['returns False', 'raises'])
+def test_pdf_falls_back_to_send_file_when_upload_fails(app, storage, monkeypatch, failure):
+    from app.services.pdf_render_service import pdf_download_response
+
+    def upload_file(local_path, s3_key, mime_type):
+        if failure == 'raises':
+            raise RuntimeError('S3 is down')
+        return False
+    monkeypatch.setattr(storage, 'upload_file', upload_file)
+    pdf_path = _cached_pdf(app, 'k2')
+
+    with app.test_request_context('/api/packing-lists/1/pdf'):
+        response = pdf_download_response('packing_list', 1, None, 'k2', 'PL-1.pdf')
+        response.direct_passthrough = False
+        assert response.status_code == 200
+        assert response.get_data() == b'%PDF-1.4 test'
+        assert response.headers['Content-Disposition'].startswith('attachment')
+        response.close()
+    assert not os.path.exists(pdf_path[:-len('.pdf')] + '.s3')
@@ -4,7 +4,7 @@
  * 
  * Function #1: Theme Management (toggleTheme, loadTheme)
  * Function #2: Formatting Utilities (formatDate, formatNumber, formatInteger, formatDateInput)
- * Function #3: API Utilities (getApiBaseUrl)
+ * Function #3: API Utilities (getApiBaseUrl, downloadPdf)
  * Function #4: Authentication Utilities (checkAuth, logout)
  * Function #5: Date Utilities (isDateInRange, parseDDMMYY, formatForAPI)
  * Function #6: Pagination Utilities (getTotalPages, goToPage, updatePaginationControls)
@@ -162,6 +162,64 @@ const GOMS = {
                 // Force HTTPS for production
                 return origin.replace('http://', 'https://');
             }
+        },
+        
+        // PDFs are rendered in the background: the download endpoint answers 202 with a
+        // render_id until the file is ready, so poll it and then save the returned PDF
+        downloadPdf: async function(url, fallbackName, options = {}) {
+            const { pollInterval = 1000, timeout = 120000 } = options;
+            const startedAt = Date.now();
+            let pollUrl = url;
+            
+            while (true) {
+                const response = await fetch(pollUrl, { redirect: 'manual' });
+                if (response.type === 'opaqueredirect') {
+                    // Redirect mode: the PDF is served from S3 as an attachment, so let the
+                    // browser follow the redirect itself (no CORS needed on the bucket)
+                    const a = document.createElement('a');
+                    a.href = pollUrl;
+                    document.body.appendChild(a);
+                    a.click();
+                    document.body.removeChild(a);
+                    return;
+                }
+                if (response.status === 202) {
+                    const render = await response.json();
+                    if (Date.now() - startedAt > timeout) {
+                        throw new Error('PDF is still rendering, please try again later');
+                    }
+                    if (render.render_id && !pollUrl.includes('render_id=')) {
+                        pollUrl = `${url}${url.includes('?') ? '&' : '?'}render_id=${render.render_id}`;
+                    }
+                    await new Promise(resolve => setTimeout(resolve, pollInterval));
+                    continue;
+                }
+                if (!response.ok) {
+                    let message = `PDF download failed (${response.status})`;
+                    try {
+                        const error = await response.json();
+                        if (error.error) message = error.error;
+                    } catch (e) {
+                        // Not a JSON error body
+                    }
+                    throw new Error(message);
+                }
+                
+                const disposition = response.headers.get('Content-Disposition') || '';
+                const match = disposition.match(/filename\*?=(?:UTF-8'')?"?([^";]+)"?/i);
+                const filename = match ? decodeURIComponent(match[1]) : fallbackName;
+                
+                const blob = await response.blob();
+                const blobUrl = window.URL.createObjectURL(blob);
+                const a = document.createElement('a');
+                a.href = blobUrl;
+                a.download = filename;
+                document.body.appendChild(a);
+                a.click();
+                window.URL.revokeObjectURL(blobUrl);
+                document.body.removeChild(a);
+                return;
+            }
         }
     },
     
@@ -359,6 +417,7 @@ window.formatNumber = GOMS.format.number;
 window.formatInteger = GOMS.format.integer;
 window.formatDateInput = GOMS.format.dateInput;
 window.getApiBaseUrl = GOMS.api.getBaseUrl;
+window.downloadPdf = GOMS.api.downloadPdf;
 window.checkAuth = GOMS.auth.check;
 window.logout = GOMS.auth.logout;
 window.isDateInRange = GOMS.date.isInRange;